@@ -165,3 +165,42 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Aumentar el límite de tamaño de carga para permitir imágenes grandes
 DATA_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024  # 20 MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024  # 20 MB
+
+# Ejecución de los filtros por bandas en un pool de hilos compartido. Con varios procesos
+# de gunicorn conviene repartir los núcleos entre ellos (por ejemplo, 16 núcleos y 4
+# procesos -> 4 hilos por proceso). Por defecto, un hilo por núcleo.
+VIEWER_PARALLEL_WORKERS = int(os.environ.get('VIEWER_PARALLEL_WORKERS', 0)) or None
+# Subpíxeles mínimos por banda: por debajo, el reparto cuesta más de lo que se gana
+VIEWER_PARALLEL_MIN_BAND_SIZE = 1 << 20
+
+# Almacén de imágenes subidas con /upload-image/: las peticiones siguientes envían solo el
+# id. Las imágenes decodificadas se guardan en memoria hasta este presupuesto y las menos
+# usadas se vuelcan a disco (por defecto, en el directorio temporal del sistema)
+VIEWER_IMAGE_STORE_MAX_BYTES = 512 * 1024 * 1024
+VIEWER_IMAGE_STORE_SPILL_DIR = os.environ.get('VIEWER_IMAGE_STORE_SPILL_DIR') or None
+VIEWER_IMAGE_STORE_SPILL_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+# Cachés de Django. 'viewer-results' guarda las respuestas ya codificadas de
+# /process-image/ por (imagen, filtros, codificación). Puede ser cualquier backend: con
+# varios procesos conviene uno compartido, por ejemplo
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': '/var/tmp/visor_resultados',
+# o 'django.core.cache.backends.memcached.PyMemcacheCache' con 'LOCATION': '127.0.0.1:11211'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'viewer-results': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'viewer-results',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# Alias de CACHES para los resultados ('' desactiva la caché), presupuesto en bytes de las
+# entradas de cada proceso (los backends de Django solo limitan el número de entradas) y
+# tamaño máximo de una entrada
+VIEWER_RESULT_CACHE_ALIAS = 'viewer-results'
+VIEWER_RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+VIEWER_RESULT_CACHE_MAX_ENTRY_BYTES = 32 * 1024 * 1024
@@ -154,6 +154,8 @@ document.addEventListener('DOMContentLoaded', function() {
       
       // Generate histogram when image is loaded
       previewImage.onload = function() {
+          // Las previsualizaciones de los controles no cambian la imagen actual
+          if (previewImage.dataset.preview) return;
           console.log("Image loaded successfully");
           generateHistogram(imageData)
               .then(() => console.log("Histogram generated successfully"))
@@ -189,6 +191,9 @@ document.addEventListener('DOMContentLoaded', function() {
   }
   
   function showFilterControls(filterType) {
+      // Descartar la previsualización del control anterior si no se aplicó
+      restoreCommittedImage();
+      
       // Hide all predefined filter controls
       const predefinedControls = document.querySelectorAll('.filter-controls');
       predefinedControls.forEach(control => {
@@ -361,6 +366,45 @@ document.addEventListener('DOMContentLoaded', function() {
               `;
               break;
               
+          case 'hue':
+              controlsContainer.innerHTML = `
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Hue Shift</span>
+                          <span id="hueValue">0</span>
+                      </div>
+                      <input type="range" id="hueSlider" min="-180" max="180" step="1" value="0">
+                  </div>
+                  <button id="applyHueBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
+          case 'saturation':
+              controlsContainer.innerHTML = `
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Saturation</span>
+                          <span id="saturationValue">1.0</span>
+                      </div>
+                      <input type="range" id="saturationSlider" min="0" max="3" step="0.1" value="1.0">
+                  </div>
+                  <button id="applySaturationBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
+          case 'vibrance':
+              controlsContainer.innerHTML = `
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Vibrance</span>
+                          <span id="vibranceValue">0.0</span>
+                      </div>
+                      <input type="range" id="vibranceSlider" min="-1" max="1" step="0.05" value="0.0">
+                  </div>
+                  <button id="applyVibranceBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
           case 'binary':
               controlsContainer.innerHTML = `
                   <div class="mb-3">
@@ -370,10 +414,142 @@ document.addEventListener('DOMContentLoaded', function() {
                       </div>
                       <input type="range" id="thresholdSlider" min="0" max="255" step="1" value="128">
                   </div>
+                  <div class="mb-3">
+                      <div class="flex flex-col space-y-2">
+                          <label class="flex items-center">
+                              <input type="radio" name="thresholdMethod" value="manual" checked>
+                              <span class="ml-2">Manual</span>
+                          </label>
+                          <label class="flex items-center">
+                              <input type="radio" name="thresholdMethod" value="otsu">
+                              <span class="ml-2">Otsu</span>
+                          </label>
+                          <label class="flex items-center">
+                              <input type="radio" name="thresholdMethod" value="adaptive">
+                              <span class="ml-2">Adaptive</span>
+                          </label>
+                      </div>
+                  </div>
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Otsu Classes</span>
+                          <span id="thresholdClassesValue">2</span>
+                      </div>
+                      <input type="range" id="thresholdClassesSlider" min="2" max="5" step="1" value="2">
+                  </div>
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Adaptive Radius</span>
+                          <span id="adaptiveRadiusValue">15</span>
+                      </div>
+                      <input type="range" id="adaptiveRadiusSlider" min="1" max="100" step="1" value="15">
+                  </div>
                   <button id="applyBinaryBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
               `;
               break;
               
+          case 'blur':
+              controlsContainer.innerHTML = `
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Radius</span>
+                          <span id="blurValue">2</span>
+                      </div>
+                      <input type="range" id="blurSlider" min="0.5" max="50" step="0.5" value="2">
+                  </div>
+                  <div class="mb-3">
+                      <div class="flex flex-col space-y-2">
+                          <label class="flex items-center">
+                              <input type="radio" name="blurMode" value="gaussian" checked>
+                              <span class="ml-2">Gaussian</span>
+                          </label>
+                          <label class="flex items-center">
+                              <input type="radio" name="blurMode" value="box">
+                              <span class="ml-2">Box</span>
+                          </label>
+                      </div>
+                  </div>
+                  <button id="applyBlurBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
+          case 'sharpen':
+              controlsContainer.innerHTML = `
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Amount</span>
+                          <span id="sharpenValue">1.0</span>
+                      </div>
+                      <input type="range" id="sharpenSlider" min="0" max="3" step="0.1" value="1.0">
+                  </div>
+                  <button id="applySharpenBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
+          case 'edges':
+              controlsContainer.innerHTML = `
+                  <div class="mb-3">
+                      <div class="flex flex-col space-y-2">
+                          <label class="flex items-center">
+                              <input type="radio" name="edgeOperator" value="sobel" checked>
+                              <span class="ml-2">Sobel</span>
+                          </label>
+                          <label class="flex items-center">
+                              <input type="radio" name="edgeOperator" value="laplacian">
+                              <span class="ml-2">Laplacian</span>
+                          </label>
+                      </div>
+                  </div>
+                  <button id="applyEdgesBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
+          case 'auto_levels':
+              controlsContainer.innerHTML = `
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Clip (%)</span>
+                          <span id="levelsClipValue">0.5</span>
+                      </div>
+                      <input type="range" id="levelsClipSlider" min="0" max="5" step="0.1" value="0.5">
+                  </div>
+                  <div class="mb-3">
+                      <label class="flex items-center">
+                          <input type="checkbox" id="levelsPerChannel">
+                          <span class="ml-2">Per channel</span>
+                      </label>
+                  </div>
+                  <button id="applyAutoLevelsBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
+          case 'equalize':
+              controlsContainer.innerHTML = `
+                  <p class="text-sm mb-3">Spread the luminance histogram over the full range.</p>
+                  <button id="applyEqualizeBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
+          case 'clahe':
+              controlsContainer.innerHTML = `
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Clip Limit</span>
+                          <span id="claheClipValue">2.0</span>
+                      </div>
+                      <input type="range" id="claheClipSlider" min="1" max="8" step="0.1" value="2.0">
+                  </div>
+                  <div class="mb-3">
+                      <div class="slider-label">
+                          <span>Tiles</span>
+                          <span id="claheTilesValue">8</span>
+                      </div>
+                      <input type="range" id="claheTilesSlider" min="2" max="16" step="1" value="8">
+                  </div>
+                  <button id="applyClaheBtn" class="w-full bg-sky-600 hover:bg-sky-700 text-white py-2 rounded">Apply</button>
+              `;
+              break;
+              
           case 'merge':
               controlsContainer.innerHTML = `
                   <h3 class="text-md font-semibold mb-3">Merge Images</h3>
@@ -739,6 +915,7 @@ document.addEventListener('DOMContentLoaded', function() {
               
               brightnessSlider.addEventListener('input', function() {
                   brightnessValue.textContent = this.value;
+                  requestPreview('brightness', { brightness_factor: this.value });
               });
               
               applyBrightnessBtn.addEventListener('click', function() {
@@ -753,6 +930,7 @@ document.addEventListener('DOMContentLoaded', function() {
               
               contrastSlider.addEventListener('input', function() {
                   contrastValue.textContent = this.value;
+                  requestPreview('contrast', { contrast_factor: this.value });
               });
               
               applyContrastBtn.addEventListener('click', function() {
@@ -767,6 +945,7 @@ document.addEventListener('DOMContentLoaded', function() {
               
               rotationSlider.addEventListener('input', function() {
                   rotationValue.textContent = `${this.value}°`;
+                  requestPreview('rotate', { rotation_angle: this.value });
               });
               
               applyRotationBtn.addEventListener('click', function() {
@@ -781,6 +960,8 @@ document.addEventListener('DOMContentLoaded', function() {
               
               zoomSlider.addEventListener('input', function() {
                   zoomValue.textContent = `${this.value}x`;
+                  // Sin zoom_x/zoom_y el servidor usa el centro de la imagen
+                  requestPreview('zoom', { zoom_scale: this.value, ...viewerSize() });
               });
               
               applyZoomBtn.addEventListener('click', function() {
@@ -790,7 +971,8 @@ document.addEventListener('DOMContentLoaded', function() {
                   applyFilter('zoom', { 
                       zoom_scale: scale,
                       zoom_x: img.naturalWidth / 2,
-                      zoom_y: img.naturalHeight / 2
+                      zoom_y: img.naturalHeight / 2,
+                      ...viewerSize()
                   });
               });
               break;
@@ -847,17 +1029,187 @@ document.addEventListener('DOMContentLoaded', function() {
               });
               break;
               
+          case 'hue':
+              const hueSlider = document.getElementById('hueSlider');
+              const hueValue = document.getElementById('hueValue');
+              const applyHueBtn = document.getElementById('applyHueBtn');
+              
+              hueSlider.addEventListener('input', function() {
+                  hueValue.textContent = this.value;
+                  requestPreview('hue', { hue_shift: this.value });
+              });
+              
+              applyHueBtn.addEventListener('click', function() {
+                  applyFilter('hue', { hue_shift: hueSlider.value });
+              });
+              break;
+              
+          case 'saturation':
+              const saturationSlider = document.getElementById('saturationSlider');
+              const saturationValue = document.getElementById('saturationValue');
+              const applySaturationBtn = document.getElementById('applySaturationBtn');
+              
+              saturationSlider.addEventListener('input', function() {
+                  saturationValue.textContent = this.value;
+                  requestPreview('saturation', { saturation_factor: this.value });
+              });
+              
+              applySaturationBtn.addEventListener('click', function() {
+                  applyFilter('saturation', { saturation_factor: saturationSlider.value });
+              });
+              break;
+              
+          case 'vibrance':
+              const vibranceSlider = document.getElementById('vibranceSlider');
+              const vibranceValue = document.getElementById('vibranceValue');
+              const applyVibranceBtn = document.getElementById('applyVibranceBtn');
+              
+              vibranceSlider.addEventListener('input', function() {
+                  vibranceValue.textContent = this.value;
+                  requestPreview('vibrance', { vibrance_amount: this.value });
+              });
+              
+              applyVibranceBtn.addEventListener('click', function() {
+                  applyFilter('vibrance', { vibrance_amount: vibranceSlider.value });
+              });
+              break;
+              
           case 'binary':
               const thresholdSlider = document.getElementById('thresholdSlider');
               const thresholdValue = document.getElementById('thresholdValue');
               const applyBinaryBtn = document.getElementById('applyBinaryBtn');
+              const thresholdClassesSlider = document.getElementById('thresholdClassesSlider');
+              const thresholdClassesValue = document.getElementById('thresholdClassesValue');
+              const adaptiveRadiusSlider = document.getElementById('adaptiveRadiusSlider');
+              const adaptiveRadiusValue = document.getElementById('adaptiveRadiusValue');
+              const binaryParams = () => ({
+                  threshold: thresholdSlider.value,
+                  threshold_method: document.querySelector('input[name="thresholdMethod"]:checked').value,
+                  threshold_classes: thresholdClassesSlider.value,
+                  adaptive_radius: adaptiveRadiusSlider.value
+              });
               
               thresholdSlider.addEventListener('input', function() {
                   thresholdValue.textContent = this.value;
+                  requestPreview('binary', binaryParams());
+              });
+              thresholdClassesSlider.addEventListener('input', function() {
+                  thresholdClassesValue.textContent = this.value;
+                  requestPreview('binary', binaryParams());
+              });
+              adaptiveRadiusSlider.addEventListener('input', function() {
+                  adaptiveRadiusValue.textContent = this.value;
+                  requestPreview('binary', binaryParams());
+              });
+              document.querySelectorAll('input[name="thresholdMethod"]').forEach(radio => {
+                  radio.addEventListener('change', () => requestPreview('binary', binaryParams()));
               });
               
               applyBinaryBtn.addEventListener('click', function() {
-                  applyFilter('binary', { threshold: thresholdSlider.value });
+                  applyFilter('binary', binaryParams());
+              });
+              break;
+              
+          case 'blur':
+              const blurSlider = document.getElementById('blurSlider');
+              const blurValue = document.getElementById('blurValue');
+              const applyBlurBtn = document.getElementById('applyBlurBtn');
+              const blurParams = () => ({
+                  blur_radius: blurSlider.value,
+                  blur_mode: document.querySelector('input[name="blurMode"]:checked').value
+              });
+              
+              blurSlider.addEventListener('input', function() {
+                  blurValue.textContent = this.value;
+                  requestPreview('blur', blurParams());
+              });
+              document.querySelectorAll('input[name="blurMode"]').forEach(radio => {
+                  radio.addEventListener('change', () => requestPreview('blur', blurParams()));
+              });
+              
+              applyBlurBtn.addEventListener('click', function() {
+                  applyFilter('blur', blurParams());
+              });
+              break;
+              
+          case 'sharpen':
+              const sharpenSlider = document.getElementById('sharpenSlider');
+              const sharpenValue = document.getElementById('sharpenValue');
+              const applySharpenBtn = document.getElementById('applySharpenBtn');
+              
+              sharpenSlider.addEventListener('input', function() {
+                  sharpenValue.textContent = this.value;
+                  requestPreview('sharpen', { sharpen_amount: this.value });
+              });
+              
+              applySharpenBtn.addEventListener('click', function() {
+                  applyFilter('sharpen', { sharpen_amount: sharpenSlider.value });
+              });
+              break;
+              
+          case 'edges':
+              const applyEdgesBtn = document.getElementById('applyEdgesBtn');
+              
+              applyEdgesBtn.addEventListener('click', function() {
+                  const edgeOperator = document.querySelector('input[name="edgeOperator"]:checked').value;
+                  
+                  applyFilter('edges', { 
+                      edge_operator: edgeOperator
+                  });
+              });
+              break;
+              
+          case 'auto_levels':
+              const levelsClipSlider = document.getElementById('levelsClipSlider');
+              const levelsClipValue = document.getElementById('levelsClipValue');
+              const levelsPerChannel = document.getElementById('levelsPerChannel');
+              const applyAutoLevelsBtn = document.getElementById('applyAutoLevelsBtn');
+              const levelsParams = () => ({
+                  levels_clip: levelsClipSlider.value,
+                  levels_per_channel: levelsPerChannel.checked
+              });
+              
+              levelsClipSlider.addEventListener('input', function() {
+                  levelsClipValue.textContent = this.value;
+                  requestPreview('auto_levels', levelsParams());
+              });
+              levelsPerChannel.addEventListener('change', () => requestPreview('auto_levels', levelsParams()));
+              
+              applyAutoLevelsBtn.addEventListener('click', function() {
+                  applyFilter('auto_levels', levelsParams());
+              });
+              break;
+              
+          case 'equalize':
+              const applyEqualizeBtn = document.getElementById('applyEqualizeBtn');
+              
+              applyEqualizeBtn.addEventListener('click', function() {
+                  applyFilter('equalize', {});
+              });
+              break;
+              
+          case 'clahe':
+              const claheClipSlider = document.getElementById('claheClipSlider');
+              const claheClipValue = document.getElementById('claheClipValue');
+              const claheTilesSlider = document.getElementById('claheTilesSlider');
+              const claheTilesValue = document.getElementById('claheTilesValue');
+              const applyClaheBtn = document.getElementById('applyClaheBtn');
+              const claheParams = () => ({
+                  clahe_clip: claheClipSlider.value,
+                  clahe_tiles: claheTilesSlider.value
+              });
+              
+              claheClipSlider.addEventListener('input', function() {
+                  claheClipValue.textContent = this.value;
+                  requestPreview('clahe', claheParams());
+              });
+              claheTilesSlider.addEventListener('input', function() {
+                  claheTilesValue.textContent = this.value;
+                  requestPreview('clahe', claheParams());
+              });
+              
+              applyClaheBtn.addEventListener('click', function() {
+                  applyFilter('clahe', claheParams());
               });
               break;
               
@@ -997,76 +1349,213 @@ document.addEventListener('DOMContentLoaded', function() {
       }
   }
   
-  function applyFilter(filterType, params) {
-      // Show loading spinner
-      showLoading(true);
-      
-      // Comprimir la imagen actual si es necesario
-      const compressImage = (dataUrl) => {
-          return new Promise((resolve, reject) => {
-              const img = new Image();
-              img.onload = function() {
-                  // Si la imagen es pequeña, no la comprimimos
-                  if (img.width <= 1200 && img.height <= 1200) {
-                      resolve(dataUrl);
-                      return;
-                  }
-                  
-                  // Crear un canvas para comprimir la imagen
-                  const canvas = document.createElement('canvas');
-                  
-                  // Calcular el nuevo tamaño manteniendo la proporción
-                  let width = img.width;
-                  let height = img.height;
-                  const maxSize = 1200; // Tamaño máximo para cualquier dimensión
-                  
-                  if (width > height && width > maxSize) {
-                      height = Math.round(height * (maxSize / width));
-                      width = maxSize;
-                  } else if (height > maxSize) {
-                      width = Math.round(width * (maxSize / height));
-                      height = maxSize;
-                  }
-                  
-                  // Establecer el tamaño del canvas
-                  canvas.width = width;
-                  canvas.height = height;
-                  
-                  // Dibujar la imagen en el canvas con el nuevo tamaño
-                  const ctx = canvas.getContext('2d');
-                  ctx.drawImage(img, 0, 0, width, height);
-                  
-                  // Obtener la imagen comprimida como Data URL (calidad 0.85)
-                  resolve(canvas.toDataURL('image/jpeg', 0.85));
-              };
+  // Comprimir la imagen actual si es necesario. El último resultado se reutiliza, así
+  // las previsualizaciones y el "Apply" envían los mismos bytes (y el servidor reconoce
+  // la imagen en sus cachés)
+  let lastCompressed = { source: null, result: null };
+  
+  function compressImage(dataUrl) {
+      if (lastCompressed.source === dataUrl) {
+          return Promise.resolve(lastCompressed.result);
+      }
+      return new Promise((resolve, reject) => {
+          const img = new Image();
+          img.onload = function() {
+              // Si la imagen es pequeña, no la comprimimos
+              if (img.width <= 1200 && img.height <= 1200) {
+                  resolve(dataUrl);
+                  return;
+              }
               
-              img.onerror = function() {
-                  reject(new Error('Error al cargar la imagen para compresión'));
-              };
+              // Crear un canvas para comprimir la imagen
+              const canvas = document.createElement('canvas');
+              
+              // Calcular el nuevo tamaño manteniendo la proporción
+              let width = img.width;
+              let height = img.height;
+              const maxSize = 1200; // Tamaño máximo para cualquier dimensión
+              
+              if (width > height && width > maxSize) {
+                  height = Math.round(height * (maxSize / width));
+                  width = maxSize;
+              } else if (height > maxSize) {
+                  width = Math.round(width * (maxSize / height));
+                  height = maxSize;
+              }
+              
+              // Establecer el tamaño del canvas
+              canvas.width = width;
+              canvas.height = height;
+              
+              // Dibujar la imagen en el canvas con el nuevo tamaño
+              const ctx = canvas.getContext('2d');
+              ctx.drawImage(img, 0, 0, width, height);
               
-              img.src = dataUrl;
+              // Obtener la imagen comprimida como Data URL (calidad 0.85)
+              resolve(canvas.toDataURL('image/jpeg', 0.85));
+          };
+          
+          img.onerror = function() {
+              reject(new Error('Error al cargar la imagen para compresión'));
+          };
+          
+          img.src = dataUrl;
+      }).then(result => {
+          lastCompressed = { source: dataUrl, result: result };
+          return result;
+      });
+  }
+  
+  // Previsualización mientras se mueve un control: el servidor aplica el filtro sobre una
+  // versión reducida de la imagen (acotada por el tamaño del visor) y la respuesta solo
+  // cambia la vista previa. La imagen actual solo cambia al pulsar "Apply".
+  let previewTimer = null;
+  let previewSequence = 0;
+  let previewObjectUrl = null;
+  
+  // La vista previa viaja en binario: la imagen se sube como fichero multipart y la
+  // respuesta es el propio PNG (sin base64 en ninguno de los dos sentidos)
+  function dataUrlToBlob(dataUrl) {
+      return fetch(dataUrl).then(response => response.blob());
+  }
+  
+  // Almacén de imágenes del servidor: cada imagen se sube una sola vez (/upload-image/) y
+  // las peticiones siguientes solo envían su id. Se recuerdan las últimas imágenes usadas
+  // (la actual, las del mosaico y la de la fusión), por su data URL
+  const imageIds = new Map();
+  const MAX_IMAGE_IDS = 8;
+  
+  function rememberImageId(dataUrl, imageId) {
+      imageIds.delete(dataUrl);
+      imageIds.set(dataUrl, imageId);
+      while (imageIds.size > MAX_IMAGE_IDS) {
+          imageIds.delete(imageIds.keys().next().value);
+      }
+  }
+  
+  function uploadImage(dataUrl) {
+      if (imageIds.has(dataUrl)) return imageIds.get(dataUrl);
+      const upload = compressImage(dataUrl)
+          .then(dataUrlToBlob)
+          .then(blob => {
+              const formData = new FormData();
+              formData.append('image_data', blob, 'image');
+              return fetch('/upload-image/', { method: 'POST', body: formData });
+          })
+          .then(response => response.json())
+          .then(data => {
+              if (data.error) throw new Error(data.error);
+              return data.image_id;
           });
-      };
-      
-      // Comprimir la imagen actual antes de enviarla
-      compressImage(currentImageData)
-          .then(compressedImageData => {
-              // Create form data
+      // Se guarda la promesa: dos peticiones seguidas comparten la misma subida
+      rememberImageId(dataUrl, upload);
+      upload.catch(() => imageIds.delete(dataUrl));
+      return upload;
+  }
+  
+  // Envía un filtro a /process-image/ con las imágenes (la actual y las data URL de los
+  // parámetros, como image_data_1 o second_image_data) sustituidas por sus ids
+  function postFilter(imageData, filterType, params, fields, headers, retried) {
+      const images = [['image_data', imageData]];
+      for (const key in params) {
+          if (typeof params[key] === 'string' && params[key].startsWith('data:image')) {
+              images.push([key, params[key]]);
+          }
+      }
+      return Promise.all(images.map(([, dataUrl]) => uploadImage(dataUrl)))
+          .then(ids => {
               const formData = new FormData();
-              formData.append('image_data', compressedImageData);
+              images.forEach(([key], i) => formData.append(key.replace('image_data', 'image_id'), ids[i]));
               formData.append('filter_type', filterType);
-              
-              // Add parameters to form data
               for (const key in params) {
-                  formData.append(key, params[key]);
+                  if (!images.some(([name]) => name === key)) formData.append(key, params[key]);
               }
-              
-              // Call API to process image
-              return fetch('/process-image/', {
-                  method: 'POST',
-                  body: formData
-              });
+              for (const key in fields) {
+                  formData.append(key, fields[key]);
+              }
+              return fetch('/process-image/', { method: 'POST', body: formData, headers: headers });
+          })
+          .then(response => {
+              // El servidor ya no tiene alguna de las imágenes (reinicio o presupuesto
+              // agotado): se vuelven a subir una vez
+              if (response.status === 404 && !retried) {
+                  images.forEach(([, dataUrl]) => imageIds.delete(dataUrl));
+                  return postFilter(imageData, filterType, params, fields, headers, true);
+              }
+              return response;
+          });
+  }
+  
+  function showPreviewBlob(blob) {
+      if (previewObjectUrl) URL.revokeObjectURL(previewObjectUrl);
+      previewObjectUrl = URL.createObjectURL(blob);
+      previewImage.src = previewObjectUrl;
+  }
+  
+  // Tamaño en píxeles físicos del visor, para que el zoom se calcule directamente a esa
+  // resolución (vacío si el visor aún no tiene tamaño: el servidor conserva el de la imagen)
+  function viewerSize() {
+      const ratio = window.devicePixelRatio || 1;
+      const width = Math.round(previewImage.clientWidth * ratio);
+      const height = Math.round(previewImage.clientHeight * ratio);
+      return width && height ? { zoom_width: width, zoom_height: height } : {};
+  }
+  
+  function requestPreview(filterType, params) {
+      clearTimeout(previewTimer);
+      previewTimer = setTimeout(() => sendPreview(filterType, params), 120);
+  }
+  
+  function sendPreview(filterType, params) {
+      if (!currentImageData) return;
+      const sequence = ++previewSequence;
+      const maxSide = Math.round(
+          Math.max(previewImage.clientWidth, previewImage.clientHeight) * (window.devicePixelRatio || 1)
+      );
+      
+      postFilter(
+          currentImageData, filterType, params,
+          { mode: 'preview', preview_max_side: maxSide || 1280 },
+          // Cualquier formato de imagen: el perfil de previsualización elige el más rápido
+          { 'Accept': 'image/*' }
+      )
+          .then(response => {
+              if (!response.ok) throw new Error('HTTP ' + response.status);
+              return response.blob();
           })
+          .then(blob => {
+              // Se descartan las respuestas de movimientos anteriores del control
+              if (sequence !== previewSequence) return;
+              previewImage.dataset.preview = '1';
+              showPreviewBlob(blob);
+          })
+          .catch(error => console.error('Error generating preview:', error));
+  }
+  
+  function restoreCommittedImage() {
+      clearTimeout(previewTimer);
+      previewSequence++;
+      if (previewImage && previewImage.dataset.preview) {
+          delete previewImage.dataset.preview;
+          previewImage.src = currentImageData;
+      }
+      if (previewObjectUrl) {
+          URL.revokeObjectURL(previewObjectUrl);
+          previewObjectUrl = null;
+      }
+  }
+  
+  function applyFilter(filterType, params) {
+      // Cancelar las previsualizaciones pendientes: la respuesta completa las sustituye
+      clearTimeout(previewTimer);
+      previewSequence++;
+      
+      // Show loading spinner
+      showLoading(true);
+      
+      // La imagen actual se sube (comprimida) solo la primera vez; con store=1 el
+      // resultado queda en el servidor y el siguiente filtro parte de su id
+      postFilter(currentImageData, filterType, params, { store: '1' }, {})
           .then(response => response.json())
           .then(data => {
               if (data.error) {
@@ -1078,6 +1567,10 @@ document.addEventListener('DOMContentLoaded', function() {
               
               // Update current image data and preview
               currentImageData = data.processed_image;
+              if (data.image_id) {
+                  rememberImageId(data.processed_image, Promise.resolve(data.image_id));
+              }
+              delete previewImage.dataset.preview;
               previewImage.src = data.processed_image;
               
               // Generate new histogram
@@ -1214,6 +1707,7 @@ document.addEventListener('DOMContentLoaded', function() {
   
   function resetToOriginalImage() {
       // Reset to original image
+      delete previewImage.dataset.preview;
       previewImage.src = originalImageData;
       currentImageData = originalImageData;
       
@@ -1259,6 +1753,7 @@ document.addEventListener('DOMContentLoaded', function() {
   function resetToOriginalImage() {
       if (originalImageData) {
           currentImageData = originalImageData;
+          delete previewImage.dataset.preview;
           previewImage.src = originalImageData;
           generateHistogram(originalImageData);
       }
@@ -0,0 +1,227 @@
+import numpy as np
+
+from .Cache import LRUCache, image_digest
+from .Dtypes import convert, normalize, white, widest
+from .Parallel import run_in_bands
+from .Resample import resize
+
+# Precisión del factor de mezcla en punto fijo (alpha * 256)
+ALPHA_BITS = 8
+ALPHA_ONE = 1 << ALPHA_BITS
+
+# Subpíxeles por bloque al mezclar: acota el temporal de trabajo a unos pocos MB
+BLEND_CHUNK = 1 << 18
+
+# Imágenes superpuestas ya redimensionadas, por (huella de contenido, forma destino)
+OVERLAY_CACHE = LRUCache(max_items=8, max_bytes=256 * 1024 * 1024)
+
+
+# Tipo acumulador de la mezcla en punto fijo: el valor máximo por 256 debe caber
+_BLEND_WORK = {np.dtype(np.uint8): np.uint16, np.dtype(np.uint16): np.uint32}
+
+
+def match_channels(image, channels):
+    """
+    Adapta el número de canales de una imagen al de otra (conserva el tipo de dato).
+    :param image: Imagen (H, W) o (H, W, C)
+    :param channels: Canales deseados (0 para escala de grises 2D)
+    :return: Imagen con los canales pedidos (vista si no hace falta copiar)
+    """
+    current = image.shape[2] if image.ndim == 3 else 0
+    if current == channels:
+        return image
+    if channels == 0:
+        # Escala de grises: media de RGB (entera para uint8 y uint16)
+        if image.dtype.kind == 'f':
+            return image[..., :3].mean(axis=2, dtype=np.float32)
+        return (image[..., :3].sum(axis=2, dtype=np.uint32) // 3).astype(image.dtype)
+    opaque = white(image.dtype)
+    if current == 0:
+        gray = np.broadcast_to(image[..., None], image.shape + (min(channels, 3),))
+        if channels == 4:
+            return np.dstack((gray, np.full(image.shape, opaque, dtype=image.dtype)))
+        return gray
+    if channels < current:
+        return image[..., :channels]
+    # RGB -> RGBA: canal alfa opaco
+    return np.dstack((image, np.full(image.shape[:2], opaque, dtype=image.dtype)))
+
+
+def fit_overlay(overlay, shape, key=None, dtype=np.uint8):
+    """
+    Devuelve la imagen superpuesta con la forma (alto, ancho, canales) y el tipo de la base.
+
+    El resultado se guarda en caché por huella de contenido y forma destino, de modo que
+    al mover el deslizador de transparencia la segunda imagen no se vuelve a redimensionar.
+    :param overlay: Imagen a superponer
+    :param shape: Forma de la imagen base
+    :param key: Clave de contenido de `overlay` (por ejemplo, la huella del fichero
+                subido); si no se indica se calcula a partir de sus píxeles
+    :param dtype: Tipo de la imagen base
+    :return: Array de solo lectura con la forma `shape` y el tipo `dtype`
+    """
+    shape = tuple(shape)
+    dtype = np.dtype(dtype)
+    if overlay.shape == shape and overlay.dtype == dtype:
+        return overlay
+
+    def build():
+        fitted = match_channels(convert(overlay, dtype), shape[2] if len(shape) == 3 else 0)
+        if fitted.shape[:2] != shape[:2]:
+            reduce = fitted.shape[0] > shape[0] and fitted.shape[1] > shape[1]
+            fitted = resize(fitted, shape[:2], mode='area' if reduce else 'bilinear')
+        fitted = np.ascontiguousarray(fitted)
+        fitted.flags.writeable = False
+        return fitted
+
+    key = image_digest(overlay) if key is None else key
+    return OVERLAY_CACHE.get_or_create(('overlay', key, shape, dtype.str), build)
+
+
+def blend(base, overlay, alpha, out=None):
+    """
+    Mezcla base * (1 - alpha) + overlay * alpha, en punto fijo con redondeo para uint8 y
+    uint16 y en float32 para imágenes float.
+    :param base: Imagen base
+    :param overlay: Imagen con la misma forma que `base` (se convierte a su tipo)
+    :param alpha: Factor de transparencia (0-1)
+    :param out: Array opcional con la forma y el tipo de `base` (puede ser la propia base)
+    :return: Imagen mezclada (del tipo de `base`)
+    """
+    if base.shape != overlay.shape:
+        raise ValueError(f"Las imágenes a mezclar tienen formas distintas: {base.shape} y {overlay.shape}")
+    alpha = min(1.0, max(0.0, float(alpha)))
+    weight = int(round(alpha * ALPHA_ONE))
+    base = normalize(base)
+    overlay = convert(overlay, base.dtype)
+    if out is None:
+        out = np.empty(base.shape, dtype=base.dtype)
+
+    flat_base = base.reshape(-1)
+    flat_overlay = overlay.reshape(-1)
+    # Si `out` no es contiguo se mezcla en un temporal y se copia al final
+    contiguous = out.flags.c_contiguous
+    flat_out = out.reshape(-1) if contiguous else np.empty(base.size, dtype=base.dtype)
+    work = _BLEND_WORK.get(base.dtype, np.float32)
+
+    def band(band_start, band_stop):
+        # Temporales propios de cada banda, reutilizados entre bloques
+        acc = np.empty(min(BLEND_CHUNK, band_stop - band_start), dtype=work)
+        tmp = np.empty_like(acc)
+        for start in range(band_start, band_stop, BLEND_CHUNK):
+            stop = min(band_stop, start + BLEND_CHUNK)
+            a = acc[:stop - start]
+            t = tmp[:stop - start]
+            if work is np.float32:
+                np.multiply(flat_base[start:stop], np.float32(1 - alpha), out=a)
+                np.multiply(flat_overlay[start:stop], np.float32(alpha), out=t)
+                a += t
+                flat_out[start:stop] = a
+                continue
+            # Todo cabe en el acumulador: 255 * 256 + 128 < 2^16, 65535 * 256 + 128 < 2^32
+            np.multiply(flat_base[start:stop], ALPHA_ONE - weight, out=a, dtype=work)
+            np.multiply(flat_overlay[start:stop], weight, out=t, dtype=work)
+            a += t
+            a += ALPHA_ONE // 2
+            a >>= ALPHA_BITS
+            flat_out[start:stop] = a
+
+    run_in_bands(band, base.size)
+
+    if not contiguous:
+        out[...] = flat_out.reshape(base.shape)
+    return out
+
+
+def _rgb_with_alpha(image):
+    """Separa una imagen en RGB (difundiendo la escala de grises) y alfa opcional."""
+    if image.ndim == 2:
+        return np.broadcast_to(image[..., None], image.shape + (3,)), None
+    if image.shape[2] == 4:
+        return image[..., :3], image[..., 3]
+    if image.shape[2] == 1:
+        return np.broadcast_to(image, image.shape[:2] + (3,)), None
+    return image[..., :3], None
+
+
+def composite_add(canvas, overlay, offset=(0, 0)):
+    """
+    Suma saturada de `overlay` sobre `canvas`, solo en el rectángulo de intersección.
+
+    Si `overlay` tiene canal alfa, cada píxel aporta su color ponderado por ese alfa.
+    :param canvas: Array (H, W, 3) uint8, uint16 o float32 que se modifica en el sitio
+    :param overlay: Imagen (h, w), (h, w, 3) o (h, w, 4); se convierte al tipo de `canvas`
+    :param offset: Posición (fila, columna) de la esquina superior izquierda de `overlay`
+                   dentro de `canvas`; puede ser negativa o sobresalir del lienzo
+    :return: `canvas`
+    """
+    top, left = int(offset[0]), int(offset[1])
+    height, width = canvas.shape[:2]
+    y0, x0 = max(0, top), max(0, left)
+    y1, x1 = min(height, top + overlay.shape[0]), min(width, left + overlay.shape[1])
+    if y1 <= y0 or x1 <= x0:
+        return canvas
+
+    full = white(canvas.dtype)
+    rgb, alpha = _rgb_with_alpha(convert(overlay[y0 - top:y1 - top, x0 - left:x1 - left],
+                                         canvas.dtype))
+    if alpha is not None:
+        if canvas.dtype.kind == 'f':
+            rgb = rgb * alpha[..., None]
+        else:
+            # Color premultiplicado por alfa con redondeo: (c * a + max/2) // max
+            # (65535 * 65535 + 32767 aún cabe en uint32)
+            wide = np.uint16 if canvas.dtype == np.uint8 else np.uint32
+            weighted = rgb * alpha[..., None].astype(wide)
+            weighted += full // 2
+            weighted //= full
+            rgb = weighted.astype(canvas.dtype)
+
+    # Suma saturada sin ensanchar: dst + min(src, blanco - dst)
+    region = canvas[y0:y1, x0:x1]
+    headroom = full - region
+    np.minimum(headroom, rgb, out=headroom)
+    region += headroom
+    return canvas
+
+
+def watermark_shape(image1, image2):
+    """Forma del lienzo de la marca de agua: el máximo de ambas imágenes, en RGB."""
+    return (max(image1.shape[0], image2.shape[0]), max(image1.shape[1], image2.shape[1]), 3)
+
+
+def watermark(image1, image2, offset=None, out=None):
+    """
+    Marca de agua aditiva: la imagen de mayor área se coloca en la esquina superior
+    izquierda de un lienzo negro y la menor se suma (con saturación) encima.
+
+    Si `out` es la propia imagen grande, solo se tocan los píxeles bajo la imagen pequeña.
+    El lienzo usa el tipo más preciso de las dos imágenes.
+    :param image1: Primera imagen
+    :param image2: Segunda imagen
+    :param offset: Posición (fila, columna) de la imagen pequeña; centrada por defecto
+    :param out: Array opcional con la forma de `watermark_shape` y el tipo común
+    :return: Imagen resultante (H, W, 3)
+    """
+    dtype = widest(image1.dtype, image2.dtype)
+    image1, image2 = convert(image1, dtype), convert(image2, dtype)
+    if image1.shape[0] * image1.shape[1] >= image2.shape[0] * image2.shape[1]:
+        large, small = image1, image2
+    else:
+        large, small = image2, image1
+
+    shape = watermark_shape(large, small)
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    if out.shape != shape or out.dtype != dtype:
+        raise ValueError(f"El buffer de la marca de agua debe ser {dtype} con forma {shape}")
+
+    if not np.may_share_memory(out, large):
+        height, width = large.shape[:2]
+        out[:height, :width] = _rgb_with_alpha(large)[0]
+        out[height:] = 0
+        out[:height, width:] = 0
+
+    if offset is None:
+        offset = (shape[0] // 2 - small.shape[0] // 2, shape[1] // 2 - small.shape[1] // 2)
+    return composite_add(out, small, offset)
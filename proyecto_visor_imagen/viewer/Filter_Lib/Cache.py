@@ -0,0 +1,158 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def image_digest(image):
+    """
+    Huella de contenido de un array (datos, forma y tipo) para usarla como clave de caché.
+    :param image: Array numpy
+    :return: Cadena hexadecimal
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.shape}{image.dtype}".encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def bytes_digest(data):
+    """
+    Huella de contenido de unos bytes (por ejemplo, el fichero subido sin decodificar).
+    :param data: bytes
+    :return: Cadena hexadecimal
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def sizeof(value):
+    """
+    Estima los bytes que ocupa un valor cacheado (arrays numpy, bytes o tuplas/listas de ellos).
+    :param value: Valor a medir
+    :return: Tamaño aproximado en bytes
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(sizeof(item) for item in value.values())
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return 0
+
+
+class LRUCache:
+    """
+    Caché LRU segura entre hilos con límite de entradas y de bytes.
+
+    Las entradas que por sí solas superan el presupuesto de bytes no se guardan.
+    """
+
+    def __init__(self, max_items=None, max_bytes=None, on_evict=None):
+        """
+        :param max_items: Número máximo de entradas (None para no limitar)
+        :param max_bytes: Presupuesto total en bytes (None para no limitar)
+        :param on_evict: Función opcional llamada con (clave, valor) por cada entrada
+                         expulsada por los límites, fuera del cerrojo
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        """Devuelve el valor de `key` (marcándolo como reciente) o `default`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=None):
+        """
+        Guarda un valor y expulsa las entradas menos usadas si se supera algún límite.
+        :return: True si el valor quedó en la caché
+        """
+        nbytes = sizeof(value) if nbytes is None else int(nbytes)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                return False
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            evicted = self._evict()
+            stored = key in self._entries
+        if self.on_evict is not None:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+        return stored
+
+    def get_or_create(self, key, factory):
+        """
+        Devuelve el valor cacheado o lo calcula con `factory()` y lo guarda.
+        El cálculo se hace fuera del cerrojo para no bloquear a otros hilos.
+        """
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.current_bytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Contadores de uso de la caché."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _evict(self):
+        # Se llama con el cerrojo tomado; devuelve las entradas expulsadas
+        evicted = []
+        while self._entries and (
+            (self.max_items is not None and len(self._entries) > self.max_items)
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            key, (value, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+            evicted.append((key, value))
+        return evicted
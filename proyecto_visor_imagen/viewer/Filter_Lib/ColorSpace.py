@@ -0,0 +1,504 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .Cache import LRUCache
+from .Dtypes import white
+from .Parallel import run_in_bands
+
+# Pesos de luminancia BT.601 (0.2989, 0.5870, 0.1140) en punto fijo de 16 bits
+LUMA_WEIGHTS = (19589, 38470, 7471)
+LUMA_SHIFT = 16
+
+# Píxeles procesados por bloque en las conversiones y filtros de color
+COLOR_CHUNK = 1 << 18
+
+# Tablas 3D completas (2^24 colores x 3 bytes = 48 MB cada una) por (operación, parámetros)
+LUT3D_CACHE = LRUCache(max_items=4, max_bytes=256 * 1024 * 1024)
+# A partir de este número de píxeles construir la tabla 3D cuesta menos que convertir
+# la imagen directamente
+LUT3D_MIN_PIXELS = 1 << 24
+
+# Blanco de referencia D65 y matrices sRGB <-> XYZ
+_D65 = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+], dtype=np.float32)
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ).astype(np.float32)
+
+
+def to_float(image):
+    """
+    Convierte una imagen a float32 en [0, 1] (uint8 se divide entre 255 y uint16 entre 65535).
+    :param image: Array uint8, uint16 o en coma flotante
+    :return: Array float32
+    """
+    if image.dtype in (np.uint8, np.uint16):
+        return image.astype(np.float32) * np.float32(1 / white(image.dtype))
+    return image.astype(np.float32, copy=False)
+
+
+def from_float(image, dtype):
+    """
+    Convierte valores float en [0, 1] al tipo de una imagen, con redondeo y saturación.
+    :param image: Array en coma flotante
+    :param dtype: uint8, uint16 o float32
+    :return: Array del tipo pedido
+    """
+    top = white(dtype)
+    if top == 1.0:
+        return np.clip(image, 0, 1).astype(np.float32, copy=False)
+    scaled = image * np.float32(top)
+    scaled += np.float32(0.5)
+    np.clip(scaled, 0, top, out=scaled)
+    return scaled.astype(dtype)
+
+
+def to_uint8(image):
+    """Convierte valores float en [0, 1] a uint8 con redondeo y saturación."""
+    return from_float(image, np.uint8)
+
+
+def _channels(image):
+    return image[..., 0], image[..., 1], image[..., 2]
+
+
+# --- Luminancia y YCbCr en enteros -------------------------------------------------------
+
+def luma_accumulate(rgb):
+    """
+    Luminancia en punto fijo 16.16 (sin desplazar) de píxeles RGB enteros.
+    Los pesos suman menos de 65536, así que también cabe en uint32 con 16 bits por canal.
+    :param rgb: Array uint8 o uint16 (..., 3)
+    :return: Array uint32 con 65536 * Y
+    """
+    acc = rgb[..., 0] * np.uint32(LUMA_WEIGHTS[0])
+    acc += rgb[..., 1] * np.uint32(LUMA_WEIGHTS[1])
+    acc += rgb[..., 2] * np.uint32(LUMA_WEIGHTS[2])
+    return acc
+
+
+def luma(rgb):
+    """
+    Luminancia de píxeles RGB: (19589R + 38470G + 7471B) >> 16 (truncada) para uint8 y
+    uint16, y la misma suma ponderada en float32.
+    :param rgb: Array uint8, uint16 o float32 (..., 3)
+    :return: Array del tipo de `rgb`
+    """
+    if rgb.dtype.kind == 'f':
+        weights = np.array(LUMA_WEIGHTS, dtype=np.float32) / np.float32(1 << LUMA_SHIFT)
+        return rgb[..., :3].astype(np.float32, copy=False) @ weights
+    acc = luma_accumulate(rgb)
+    acc >>= LUMA_SHIFT
+    return acc.astype(rgb.dtype)
+
+
+def grayscale(image):
+    """
+    Luminancia de cualquier imagen: `luma` si tiene canales de color y el propio canal
+    si está en escala de grises (el alfa no interviene).
+    :param image: Array (H, W) o (H, W, C) uint8, uint16 o float32
+    :return: Array (H, W) del tipo de la imagen (una vista si ya es de un canal)
+    """
+    if image.ndim == 2:
+        return image
+    if image.shape[2] >= 3:
+        return luma(image)
+    return image[..., 0]
+
+
+def rgb_to_ycbcr_u8(rgb):
+    """
+    RGB -> YCbCr de rango completo (JPEG) en enteros de 16 bits.
+    :param rgb: Array uint8 (..., 3)
+    :return: Array uint8 (..., 3) con Y, Cb, Cr (Cb y Cr centrados en 128)
+    """
+    r, g, b = (c.astype(np.int32) for c in _channels(rgb))
+    half = 1 << 15
+    y = (19595 * r + 38470 * g + 7471 * b + half) >> 16
+    cb = ((-11059 * r - 21709 * g + 32768 * b + half) >> 16) + 128
+    cr = ((32768 * r - 27439 * g - 5329 * b + half) >> 16) + 128
+    return np.clip(np.stack((y, cb, cr), axis=-1), 0, 255).astype(np.uint8)
+
+
+def ycbcr_to_rgb_u8(ycc):
+    """
+    YCbCr de rango completo -> RGB en enteros de 16 bits.
+    :param ycc: Array uint8 (..., 3)
+    :return: Array uint8 (..., 3)
+    """
+    y = ycc[..., 0].astype(np.int32) << 16
+    cb = ycc[..., 1].astype(np.int32) - 128
+    cr = ycc[..., 2].astype(np.int32) - 128
+    half = 1 << 15
+    r = (y + 91881 * cr + half) >> 16
+    g = (y - 22554 * cb - 46802 * cr + half) >> 16
+    b = (y + 116130 * cb + half) >> 16
+    return np.clip(np.stack((r, g, b), axis=-1), 0, 255).astype(np.uint8)
+
+
+# --- Conversiones en float32 (valores en [0, 1]) -------------------------------------------
+
+def rgb_to_hsv(rgb):
+    """
+    RGB -> HSV.
+    :param rgb: Array uint8, uint16 o float en [0, 1] (..., 3)
+    :return: Array float32 (..., 3) con H en [0, 1), S y V en [0, 1]
+    """
+    rgb = to_float(rgb)
+    r, g, b = _channels(rgb)
+    v = np.maximum(np.maximum(r, g), b)
+    delta = v - np.minimum(np.minimum(r, g), b)
+    safe = np.where(delta > 0, delta, np.float32(1))
+    hue = np.where(v == r, (g - b) / safe,
+                   np.where(v == g, 2 + (b - r) / safe, 4 + (r - g) / safe))
+    hue = np.where(delta > 0, hue / np.float32(6), 0) % np.float32(1)
+    sat = np.where(v > 0, delta / np.where(v > 0, v, np.float32(1)), 0)
+    return np.stack((hue, sat, v), axis=-1).astype(np.float32)
+
+
+def hsv_to_rgb(hsv):
+    """
+    HSV -> RGB.
+    :param hsv: Array float (..., 3) con H en [0, 1), S y V en [0, 1]
+    :return: Array float32 (..., 3) en [0, 1]
+    """
+    hsv = hsv.astype(np.float32, copy=False)
+    h, s, v = _channels(hsv)
+    h6 = (h % np.float32(1)) * np.float32(6)
+    sector = np.floor(h6)
+    frac = h6 - sector
+    sector = sector.astype(np.int8) % 6
+    p = v * (1 - s)
+    q = v * (1 - s * frac)
+    t = v * (1 - s * (1 - frac))
+    r = np.choose(sector, (v, q, p, p, t, v))
+    g = np.choose(sector, (t, v, v, q, p, p))
+    b = np.choose(sector, (p, p, t, v, v, q))
+    return np.stack((r, g, b), axis=-1)
+
+
+def rgb_to_hsl(rgb):
+    """
+    RGB -> HSL.
+    :param rgb: Array uint8, uint16 o float en [0, 1] (..., 3)
+    :return: Array float32 (..., 3) con H en [0, 1), S y L en [0, 1]
+    """
+    rgb = to_float(rgb)
+    hsv = rgb_to_hsv(rgb)
+    v = hsv[..., 2]
+    r, g, b = _channels(rgb)
+    low = np.minimum(np.minimum(r, g), b)
+    light = (v + low) / 2
+    denom = 1 - np.abs(2 * light - 1)
+    sat = np.where(denom > 0, (v - low) / np.where(denom > 0, denom, np.float32(1)), 0)
+    return np.stack((hsv[..., 0], sat, light), axis=-1).astype(np.float32)
+
+
+def hsl_to_rgb(hsl):
+    """
+    HSL -> RGB.
+    :param hsl: Array float (..., 3) con H en [0, 1), S y L en [0, 1]
+    :return: Array float32 (..., 3) en [0, 1]
+    """
+    hsl = hsl.astype(np.float32, copy=False)
+    h, s, light = _channels(hsl)
+    v = light + s * np.minimum(light, 1 - light)
+    sat_v = np.where(v > 0, 2 * (1 - light / np.where(v > 0, v, np.float32(1))), 0)
+    return hsv_to_rgb(np.stack((h, sat_v, v), axis=-1))
+
+
+def rgb_to_ycbcr(rgb):
+    """
+    RGB -> YCbCr BT.601 de rango completo.
+    :param rgb: Array uint8, uint16 o float en [0, 1] (..., 3)
+    :return: Array float32 (..., 3) con Y en [0, 1] y Cb, Cr en [-0.5, 0.5]
+    """
+    r, g, b = _channels(to_float(rgb))
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    cb = (b - y) * np.float32(0.5 / 0.886)
+    cr = (r - y) * np.float32(0.5 / 0.701)
+    return np.stack((y, cb, cr), axis=-1).astype(np.float32)
+
+
+def ycbcr_to_rgb(ycc):
+    """
+    YCbCr BT.601 de rango completo -> RGB.
+    :param ycc: Array float (..., 3) con Y en [0, 1] y Cb, Cr en [-0.5, 0.5]
+    :return: Array float32 (..., 3) en [0, 1]
+    """
+    y, cb, cr = _channels(ycc.astype(np.float32, copy=False))
+    r = y + np.float32(1.402) * cr
+    b = y + np.float32(1.772) * cb
+    g = (y - 0.299 * r - 0.114 * b) / np.float32(0.587)
+    return np.stack((r, g, b), axis=-1).astype(np.float32)
+
+
+def _srgb_to_linear(values):
+    return np.where(values <= 0.04045, values / np.float32(12.92),
+                    ((values + np.float32(0.055)) / np.float32(1.055)) ** np.float32(2.4))
+
+
+def _linear_to_srgb(values):
+    values = np.clip(values, 0, 1)
+    return np.where(values <= 0.0031308, values * np.float32(12.92),
+                    np.float32(1.055) * values ** np.float32(1 / 2.4) - np.float32(0.055))
+
+
+def rgb_to_lab(rgb):
+    """
+    sRGB -> CIE L*a*b* (iluminante D65).
+    :param rgb: Array uint8, uint16 o float en [0, 1] (..., 3)
+    :return: Array float32 (..., 3) con L en [0, 100] y a, b aproximadamente en [-128, 127]
+    """
+    xyz = _srgb_to_linear(to_float(rgb)) @ _RGB_TO_XYZ.T / _D65
+    epsilon, kappa = 216 / 24389, 24389 / 27
+    f = np.where(xyz > epsilon, np.cbrt(xyz), (kappa * xyz + 16) / 116).astype(np.float32)
+    fx, fy, fz = _channels(f)
+    return np.stack((116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)), axis=-1).astype(np.float32)
+
+
+def lab_to_rgb(lab):
+    """
+    CIE L*a*b* (D65) -> sRGB.
+    :param lab: Array float (..., 3)
+    :return: Array float32 (..., 3) en [0, 1]
+    """
+    light, a, b = _channels(lab.astype(np.float32, copy=False))
+    fy = (light + 16) / 116
+    f = np.stack((fy + a / 500, fy, fy - b / 200), axis=-1)
+    epsilon, kappa = 216 / 24389, 24389 / 27
+    xyz = np.where(f ** 3 > epsilon, f ** 3, (116 * f - 16) / kappa) * _D65
+    return _linear_to_srgb(xyz.astype(np.float32) @ _XYZ_TO_RGB.T).astype(np.float32)
+
+
+# Conversiones disponibles para `convert`
+CONVERSIONS = {
+    ('rgb', 'hsv'): rgb_to_hsv,
+    ('hsv', 'rgb'): hsv_to_rgb,
+    ('rgb', 'hsl'): rgb_to_hsl,
+    ('hsl', 'rgb'): hsl_to_rgb,
+    ('rgb', 'ycbcr'): rgb_to_ycbcr,
+    ('ycbcr', 'rgb'): ycbcr_to_rgb,
+    ('rgb', 'lab'): rgb_to_lab,
+    ('lab', 'rgb'): lab_to_rgb,
+}
+
+
+def convert(image, source, target):
+    """
+    Convierte una imagen entre espacios de color, pasando por RGB si hace falta.
+    :param image: Array (..., 3)
+    :param source: 'rgb', 'hsv', 'hsl', 'ycbcr' o 'lab'
+    :param target: Espacio destino
+    :return: Array float32 (..., 3)
+    """
+    if source == target:
+        return to_float(image) if source == 'rgb' else image.astype(np.float32)
+    if (source, target) in CONVERSIONS:
+        return CONVERSIONS[(source, target)](image)
+    if (source, 'rgb') not in CONVERSIONS or ('rgb', target) not in CONVERSIONS:
+        raise ValueError(f"Conversión de color no soportada: {source} -> {target}")
+    return CONVERSIONS[('rgb', target)](CONVERSIONS[(source, 'rgb')](image))
+
+
+# --- Filtros de color -----------------------------------------------------------------------
+
+@lru_cache(maxsize=64)
+def chroma_lut(kind, amount):
+    """
+    Tabla 2D (V, min) -> factor de escala de la saturación HSV en punto fijo de 8 bits.
+
+    Escalar la saturación HSV conservando V lleva cada canal a V - k * (V - c), y tanto k
+    como su límite (S' <= 1) solo dependen del máximo y el mínimo del píxel, así que una
+    tabla de 65536 entradas resuelve el filtro sin convertir a HSV.
+    :param kind: 'saturation' (k = amount) o 'vibrance' (k = 1 + amount * (1 - S))
+    :param amount: Factor de saturación o intensidad de la vibrancia
+    :return: Array uint16 de 65536 entradas (índice V * 256 + min), de solo lectura
+    """
+    v = np.arange(256, dtype=np.float64)[:, None]
+    low = np.arange(256, dtype=np.float64)[None, :]
+    delta = v - low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sat = np.where(v > 0, delta / v, 0)
+        limit = np.where(delta > 0, v / delta, 0)
+    if kind == 'saturation':
+        factor = np.full_like(sat, max(0.0, amount))
+    elif kind == 'vibrance':
+        factor = np.maximum(0.0, 1 + amount * (1 - sat))
+    else:
+        raise ValueError(f"Tipo de ajuste de croma desconocido: {kind}")
+    factor = np.minimum(factor, limit)
+    # Truncando, k * (V - c) * 256 <= 256 * V: el producto cabe en uint16 y nunca pasa de V
+    table = np.floor(factor * 256).astype(np.uint16).reshape(-1)
+    table.flags.writeable = False
+    return table
+
+
+def map_pixels(image, kernel, out):
+    """
+    Aplica un kernel puntual de color a una imagen RGB(A) por bloques de píxeles,
+    repartidos en bandas del pool compartido. El canal alfa se conserva.
+    :param image: Imagen (H, W, 3) o (H, W, 4) uint8, uint16 o float32
+    :param kernel: Función (N, 3) -> (N, 3) que conserva el tipo de la imagen
+    :param out: Array con la forma y el tipo de la imagen (puede ser la propia imagen)
+    :return: `out`
+    """
+    channels = image.shape[2]
+    rgb = image.reshape(-1, channels)
+    # Si `out` no es contiguo se trabaja en un temporal y se copia al final
+    contiguous = out.flags.c_contiguous
+    flat_out = out.reshape(-1, channels) if contiguous else np.empty_like(rgb)
+    copy_alpha = channels == 4 and not (contiguous and np.may_share_memory(out, image))
+
+    def band(band_start, band_stop):
+        for start in range(band_start, band_stop, COLOR_CHUNK):
+            stop = min(band_stop, start + COLOR_CHUNK)
+            flat_out[start:stop, :3] = kernel(rgb[start:stop, :3])
+            if copy_alpha:
+                flat_out[start:stop, 3] = rgb[start:stop, 3]
+
+    run_in_bands(band, len(rgb), channels)
+    if not contiguous:
+        out[...] = flat_out.reshape(image.shape)
+    return out
+
+
+def chroma_kernel(table):
+    """
+    Kernel de `map_pixels` que aplica una tabla de `chroma_lut`.
+    :param table: Tabla uint16 (V, min) -> factor
+    :return: Función (N, 3) uint8 -> (N, 3) uint8
+    """
+    def kernel(block):
+        # max/min por pares: mucho más rápido que reducir sobre un eje de longitud 3
+        red, green, blue = block[:, 0], block[:, 1], block[:, 2]
+        high = np.maximum(np.maximum(red, green), blue)
+        index = high.astype(np.uint16) << 8
+        index |= np.minimum(np.minimum(red, green), blue)
+        # c' = V - round(k * (V - c))
+        diff = np.multiply(high[:, None] - block, table.take(index)[:, None], dtype=np.uint16)
+        diff += 128
+        diff >>= 8
+        return high[:, None] - diff.astype(np.uint8)
+
+    return kernel
+
+
+def chroma_float_kernel(kind, amount, dtype):
+    """
+    Kernel de `map_pixels` equivalente a `chroma_kernel` calculado en float32, para
+    imágenes uint16 (donde la tabla (V, min) tendría 2^32 entradas) y float32.
+    :param kind: 'saturation' o 'vibrance'
+    :param amount: Factor de saturación o intensidad de la vibrancia
+    :param dtype: Tipo de la imagen
+    :return: Función (N, 3) -> (N, 3) del tipo `dtype`
+    """
+    if kind not in ('saturation', 'vibrance'):
+        raise ValueError(f"Tipo de ajuste de croma desconocido: {kind}")
+
+    def kernel(block):
+        values = to_float(block)
+        red, green, blue = values[:, 0], values[:, 1], values[:, 2]
+        high = np.maximum(np.maximum(red, green), blue)
+        delta = high - np.minimum(np.minimum(red, green), blue)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if kind == 'saturation':
+                factor = np.full_like(high, max(0.0, amount))
+            else:
+                sat = np.where(high > 0, delta / high, 0)
+                factor = np.maximum(np.float32(0), 1 + np.float32(amount) * (1 - sat))
+            factor = np.minimum(factor, np.where(delta > 0, high / delta, 0))
+        # c' = V - k * (V - c)
+        high = high[:, None]
+        result = values - high
+        result *= factor[:, None]
+        result += high
+        return from_float(result, dtype)
+
+    return kernel
+
+
+def adjust_chroma(image, kind, amount, out):
+    """
+    Ajusta la saturación o la vibrancia de una imagen RGB(A) conservando V (HSV).
+    uint8 usa la tabla de `chroma_lut`; uint16 y float32 calculan el factor en float32.
+    :param image: Imagen (H, W, 3) o (H, W, 4) uint8, uint16 o float32
+    :param kind: 'saturation' o 'vibrance'
+    :param amount: Factor de saturación o intensidad de la vibrancia
+    :param out: Array con la forma y el tipo de la imagen (puede ser la propia imagen)
+    :return: `out`
+    """
+    amount = round(float(amount), 4)
+    if image.dtype == np.uint8:
+        return map_pixels(image, chroma_kernel(chroma_lut(kind, amount)), out)
+    return map_pixels(image, chroma_float_kernel(kind, amount, image.dtype), out)
+
+
+def _hue_shift_float(rgb, degrees, dtype=np.uint8):
+    """Giro de tono exacto en HSV (float32)."""
+    hsv = rgb_to_hsv(rgb)
+    hsv[..., 0] += np.float32(degrees / 360.0)
+    return from_float(hsv_to_rgb(hsv), dtype)
+
+
+def build_lut3d(func):
+    """
+    Construye una tabla 3D completa aplicando `func` a los 2^24 colores RGB.
+    :param func: Función (N, 3) uint8 -> (N, 3) uint8
+    :return: Array uint8 (2^24, 3) de solo lectura, indexado por R << 16 | G << 8 | B
+    """
+    table = np.empty((1 << 24, 3), dtype=np.uint8)
+    values = np.arange(256, dtype=np.uint8)
+    green, blue = np.meshgrid(values, values, indexing='ij')
+    plane = np.empty((1 << 16, 3), dtype=np.uint8)
+    plane[:, 1] = green.reshape(-1)
+    plane[:, 2] = blue.reshape(-1)
+    for red in range(256):
+        plane[:, 0] = red
+        table[red << 16:(red + 1) << 16] = func(plane)
+    table.flags.writeable = False
+    return table
+
+
+def lut3d_kernel(table):
+    """
+    Kernel de `map_pixels` que consulta una tabla 3D completa (exacta, sin interpolar).
+    :param table: Tabla de `build_lut3d`
+    :return: Función (N, 3) uint8 -> (N, 3) uint8
+    """
+    def kernel(block):
+        index = block[:, 0].astype(np.uint32) << 16
+        index |= block[:, 1].astype(np.uint32) << 8
+        index |= block[:, 2]
+        return table.take(index, axis=0)
+
+    return kernel
+
+
+def shift_hue(image, degrees, out):
+    """
+    Gira el tono (HSV) de una imagen RGB(A).
+
+    Con imágenes uint8 muy grandes, o si la tabla ya está en caché, se usa una tabla 3D
+    completa de 2^24 colores; en otro caso (y siempre con uint16 y float32) se convierte
+    la imagen a HSV en float32 por bloques.
+    :param image: Imagen (H, W, 3) o (H, W, 4) uint8, uint16 o float32
+    :param degrees: Giro en grados
+    :param out: Array con la forma y el tipo de la imagen (puede ser la propia imagen)
+    :return: `out`
+    """
+    degrees = round(float(degrees) % 360, 3)
+    if image.dtype != np.uint8:
+        return map_pixels(image, lambda block: _hue_shift_float(block, degrees, image.dtype), out)
+    key = ('hue', degrees)
+    table = LUT3D_CACHE.get(key)
+    if table is None and image.shape[0] * image.shape[1] >= LUT3D_MIN_PIXELS:
+        table = LUT3D_CACHE.get_or_create(
+            key, lambda: build_lut3d(lambda block: _hue_shift_float(block, degrees))
+        )
+    if table is not None:
+        return map_pixels(image, lut3d_kernel(table), out)
+    return map_pixels(image, lambda block: _hue_shift_float(block, degrees), out)
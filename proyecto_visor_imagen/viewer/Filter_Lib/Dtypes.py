@@ -0,0 +1,130 @@
+"""
+Tipos de dato admitidos por los filtros y conversiones entre ellos.
+
+Los filtros trabajan sobre tres representaciones sin convertir entre ellas:
+uint8 (0-255), uint16 (0-65535, escaneos y PNG de 16 bits) y float32 en [0, 1].
+Los parámetros de la interfaz (umbrales, zonas de resaltado...) siguen expresados en la
+escala 0-255 y cada implementación los lleva a la suya.
+"""
+import numpy as np
+
+SUPPORTED = (np.dtype(np.uint8), np.dtype(np.uint16), np.dtype(np.float32))
+
+# Valor del blanco en cada tipo
+WHITE = {np.dtype(np.uint8): 255, np.dtype(np.uint16): 65535, np.dtype(np.float32): 1.0}
+
+# Tipo acumulador de la interpolación en punto fijo con pesos de 8 bits:
+# el valor máximo por 256 (más el redondeo) debe caber sin desbordar
+WORK_DTYPES = {np.dtype(np.uint8): np.dtype(np.uint16), np.dtype(np.uint16): np.dtype(np.uint32)}
+
+
+def white(dtype):
+    """Valor del blanco para un tipo admitido (255, 65535 o 1.0)."""
+    return WHITE[np.dtype(dtype)]
+
+
+def scale(dtype):
+    """Factor que lleva un valor de la escala 0-255 a la del tipo (1, 257 o 1/255)."""
+    return white(dtype) / 255
+
+
+def lut_size(dtype):
+    """Entradas de una tabla de consulta indexada por el valor del píxel (256 o 65536)."""
+    return 1 << (8 * np.dtype(dtype).itemsize)
+
+
+def is_float(dtype):
+    return np.dtype(dtype).kind == 'f'
+
+
+def normalize(image):
+    """
+    Lleva un array de cualquier tipo a uno de los tipos admitidos, copiando solo si hace falta.
+
+    bool pasa a uint8 (0/255), los enteros con signo o de más de 16 bits (modo 'I' de PIL)
+    a uint16 con recorte, y float64/float16 a float32 sin cambiar la escala.
+    :param image: Array numpy
+    :return: Array uint8, uint16 o float32
+    """
+    dtype = image.dtype
+    if dtype in SUPPORTED:
+        return image
+    if dtype == np.bool_:
+        # 0/1 -> 0/255 multiplicando la vista uint8 del array booleano
+        return image.view(np.uint8) * np.uint8(255)
+    if dtype.kind == 'f':
+        return image.astype(np.float32)
+    if dtype.kind in 'ui':
+        if dtype.itemsize == 1:
+            return np.clip(image, 0, 255).astype(np.uint8)
+        return np.clip(image, 0, 65535).astype(np.uint16)
+    raise ValueError(f"Tipo de dato de imagen no admitido: {dtype}")
+
+
+def widest(*dtypes):
+    """Tipo admitido más preciso de una lista (uint8 < uint16 < float32)."""
+    return max((normalize(np.empty(0, dtype=dtype)).dtype for dtype in dtypes),
+               key=SUPPORTED.index)
+
+
+def convert(image, dtype):
+    """
+    Convierte una imagen a otro tipo admitido reescalando sus valores.
+    Devuelve la propia imagen (sin copia) si ya tiene ese tipo.
+    :param image: Imagen de cualquier tipo (ver `normalize`)
+    :param dtype: uint8, uint16 o float32
+    :return: Imagen del tipo pedido
+    """
+    image = normalize(image)
+    dtype = np.dtype(dtype)
+    if image.dtype == dtype:
+        return image
+    if dtype == np.uint16 and image.dtype == np.uint8:
+        # x * 257 replica el byte: 0 -> 0 y 255 -> 65535 exactos
+        return image.astype(np.uint16) * np.uint16(257)
+    if dtype == np.uint8 and image.dtype == np.uint16:
+        # Redondeo de x / 257 en enteros: (x * 255 + 32895) >> 16
+        wide = image.astype(np.uint32)
+        wide *= 255
+        wide += 32895
+        wide >>= 16
+        return wide.astype(np.uint8)
+    if dtype.kind == 'f':
+        return image.astype(np.float32) / np.float32(white(image.dtype))
+    values = np.clip(image, 0, 1) * np.float32(white(dtype))
+    values += 0.5
+    return values.astype(dtype)
+
+
+# Modos de PIL que se decodifican tal cual: 8 bits, 16 bits, enteros de 32 bits (se
+# recortan a uint16), float y bilevel (bool, pasa a 0/255)
+_NATIVE_MODES = ('L', 'RGB', 'RGBA', 'I', 'I;16', 'I;16B', 'I;16L', 'F', '1')
+
+
+def pil_to_array(img):
+    """
+    Convierte una imagen PIL en un array de un tipo admitido sin perder profundidad:
+    los PNG/TIFF de 16 bits quedan en uint16. Paletas, CMYK, LA y demás modos se
+    convierten a RGB o RGBA.
+    :param img: Imagen PIL
+    :return: Array uint8, uint16 o float32
+    """
+    if img.mode not in _NATIVE_MODES:
+        img = img.convert('RGBA' if 'transparency' in img.info or 'A' in img.mode else 'RGB')
+    return normalize(np.array(img))
+
+
+def array_to_pil(array, high_depth=True):
+    """
+    Convierte un resultado en imagen PIL para codificarlo.
+    PIL solo guarda 16 bits en escala de grises ('I;16'); el resto se lleva a uint8.
+    :param array: Array uint8, uint16 o float32
+    :param high_depth: Si es False, también la escala de grises de 16 bits pasa a 8 bits
+                       (JPEG o WebP no admiten 16 bits)
+    :return: Imagen PIL
+    """
+    from PIL import Image
+    array = normalize(array)
+    if not (high_depth and array.dtype == np.uint16 and array.ndim == 2):
+        array = convert(array, np.uint8)
+    return Image.fromarray(array)
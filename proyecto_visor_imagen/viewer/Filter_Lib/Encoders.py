@@ -0,0 +1,190 @@
+"""
+Codificación de los resultados en PNG, JPEG o WebP según lo que acepte el cliente y un
+perfil: 'preview' prima la velocidad (mientras se mueve un control) y 'export' la
+fidelidad (sin pérdidas salvo que se pida expresamente un formato con pérdidas).
+"""
+import threading
+import time
+from io import BytesIO
+
+from .Dtypes import array_to_pil
+
+# Formato -> (nombre en PIL, tipo MIME)
+FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+# Formatos por orden de preferencia de cada perfil (el primero que acepte el cliente)
+PROFILE_ORDER = {
+    'preview': ('jpeg', 'webp', 'png'),
+    'export': ('png', 'webp', 'jpeg'),
+}
+
+# Opciones de PIL de cada formato por perfil
+PROFILES = {
+    'preview': {
+        'png': {'compress_level': 1},
+        'jpeg': {'quality': 85},
+        'webp': {'quality': 80, 'method': 0},
+    },
+    'export': {
+        'png': {'compress_level': 6},
+        'jpeg': {'quality': 95, 'subsampling': 0},
+        # En WebP sin pérdidas, 'quality' es el esfuerzo: con method >= 2 tarda segundos
+        # en fotos de pocos megapíxeles sin ganar apenas tamaño
+        'webp': {'lossless': True, 'quality': 50, 'method': 1},
+    },
+}
+
+# Estrategias de zlib para PNG (el filtrado por filas de PIL es siempre adaptativo)
+PNG_STRATEGIES = {'default': -1, 'filtered': 1, 'huffman': 2, 'rle': 3, 'fixed': 4}
+
+# Formatos que no admiten canal alfa (se descarta al codificar)
+OPAQUE_FORMATS = ('jpeg',)
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _accepted_quality(mime_type, ranges):
+    # q del rango más específico que incluye el tipo (image/png > image/* > */*)
+    main = mime_type.split('/')[0]
+    best, specificity = 0.0, -1
+    for media_range, quality in ranges:
+        if media_range == mime_type:
+            level = 2
+        elif media_range == f'{main}/*':
+            level = 1
+        elif media_range == '*/*':
+            level = 0
+        else:
+            continue
+        if level > specificity:
+            best, specificity = quality, level
+    return best
+
+
+def parse_accept(header):
+    """
+    Interpreta una cabecera Accept.
+    :param header: Valor de la cabecera (por ejemplo, 'image/webp,image/*;q=0.8')
+    :return: Lista de tuplas (rango de tipos en minúsculas, q)
+    """
+    ranges = []
+    for item in (header or '').split(','):
+        media_range, *parameters = [part.strip() for part in item.split(';')]
+        if not media_range:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = min(1.0, max(0.0, float(value)))
+                except ValueError:
+                    quality = 0.0
+        ranges.append((media_range.lower(), quality))
+    return ranges
+
+
+def negotiate(accept=None, profile='export', alpha=False):
+    """
+    Elige el formato de salida.
+    :param accept: Cabecera Accept del cliente (None si la respuesta no es la imagen, por
+                   ejemplo un data URL dentro de un JSON: manda el perfil)
+    :param profile: 'preview' o 'export'
+    :param alpha: Si la imagen tiene canal alfa (se evitan los formatos opacos)
+    :return: Clave de FORMATS
+    """
+    order = [fmt for fmt in PROFILE_ORDER[profile] if not (alpha and fmt in OPAQUE_FORMATS)]
+    if accept is None:
+        return order[0]
+    ranges = parse_accept(accept)
+    # Mayor q del cliente; a igualdad, el orden del perfil
+    scored = [(_accepted_quality(FORMATS[fmt][1], ranges), -index, fmt)
+              for index, fmt in enumerate(order)]
+    quality, _, fmt = max(scored)
+    # Si no acepta ninguno se responde con el preferido del perfil (mejor que un 406)
+    return fmt if quality > 0 else order[0]
+
+
+def encoder_options(fmt, profile='export', compress_level=None, strategy=None, quality=None):
+    """
+    Opciones de PIL para un formato y perfil, con los ajustes pedidos por el cliente.
+    :param fmt: Clave de FORMATS
+    :param profile: 'preview' o 'export'
+    :param compress_level: Nivel de zlib de PNG (0-9)
+    :param strategy: Estrategia de zlib de PNG (clave de PNG_STRATEGIES)
+    :param quality: Calidad de JPEG/WebP (1-100); en WebP desactiva el modo sin pérdidas
+    :return: Diccionario de opciones
+    """
+    options = dict(PROFILES[profile][fmt])
+    if fmt == 'png':
+        if compress_level not in (None, ''):
+            options['compress_level'] = min(9, max(0, int(compress_level)))
+        if strategy not in (None, ''):
+            if strategy not in PNG_STRATEGIES:
+                raise ValueError(f"Estrategia PNG desconocida: {strategy}")
+            options['compress_type'] = PNG_STRATEGIES[strategy]
+    elif quality not in (None, ''):
+        options['quality'] = min(100, max(1, int(quality)))
+        options.pop('lossless', None)
+    return options
+
+
+def encode(array, fmt='png', profile='export', **settings):
+    """
+    Codifica un resultado.
+    :param array: Array uint8, uint16 o float32 (H, W) o (H, W, C)
+    :param fmt: Clave de FORMATS
+    :param profile: 'preview' o 'export'
+    :param settings: Ajustes de `encoder_options` (compress_level, strategy, quality)
+    :return: (bytes del fichero, tipo MIME, segundos de codificación)
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de salida desconocido: {fmt}")
+    if profile not in PROFILES:
+        raise ValueError(f"Perfil de codificación desconocido: {profile}")
+    options = encoder_options(fmt, profile, **settings)
+    started = time.perf_counter()
+    if fmt in OPAQUE_FORMATS and array.ndim == 3 and array.shape[2] in (2, 4):
+        array = array[..., :array.shape[2] - 1]
+        if array.shape[2] == 1:
+            array = array[..., 0]
+    # Solo PNG conserva la escala de grises de 16 bits
+    image = array_to_pil(array, high_depth=fmt == 'png')
+    buffered = BytesIO()
+    image.save(buffered, format=FORMATS[fmt][0], **options)
+    data = buffered.getvalue()
+    seconds = time.perf_counter() - started
+    _record(f'{fmt}/{profile}', array, len(data), seconds)
+    return data, FORMATS[fmt][1], seconds
+
+
+def _record(name, array, nbytes, seconds):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {'count': 0, 'seconds': 0.0, 'megapixels': 0.0, 'bytes': 0})
+        entry['count'] += 1
+        entry['seconds'] += seconds
+        entry['megapixels'] += array.shape[0] * array.shape[1] / 1e6
+        entry['bytes'] += nbytes
+
+
+def encoder_stats():
+    """
+    Tiempos acumulados por codificador ('formato/perfil') en este proceso.
+    :return: Diccionario {codificador: {count, seconds, mean_ms, mp_per_s, bytes}}
+    """
+    with _stats_lock:
+        stats = {name: dict(entry) for name, entry in _stats.items()}
+    for entry in stats.values():
+        entry['mean_ms'] = 1000 * entry['seconds'] / entry['count']
+        entry['mp_per_s'] = entry['megapixels'] / entry['seconds'] if entry['seconds'] > 0 else None
+    return stats
+
+
+def reset_encoder_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,158 @@
+"""
+Mejora automática del contraste a partir de histogramas acumulados: niveles automáticos,
+ecualización global y CLAHE (ecualización adaptativa por teselas con contraste limitado).
+"""
+import numpy as np
+
+from .ColorSpace import luma
+from .Dtypes import convert, normalize, scale, white
+from .Parallel import run_in_bands
+
+# Niveles de entrada de una curva (escala 0-255)
+LEVELS = np.arange(256, dtype=np.float64)
+
+# Subpíxeles por bloque al contar los histogramas de las teselas (acota los índices int32)
+TILE_HIST_CHUNK = 1 << 20
+
+# Filas por bloque al interpolar las tablas de CLAHE
+CLAHE_ROWS = 32
+
+
+def levels_curve(counts, clip=0.5):
+    """
+    Curva de niveles automáticos: estira el rango [bajo, alto] del histograma a [0, 255],
+    saturando el `clip` % de los píxeles en cada extremo.
+    :param counts: Histograma de 256 niveles
+    :param clip: Porcentaje de píxeles que se satura en cada extremo (0-49)
+    :return: Curva float64 de 256 valores en la escala 0-255
+    """
+    cdf = np.cumsum(counts, dtype=np.float64)
+    total = cdf[-1]
+    cut = total * min(49.0, max(0.0, float(clip))) / 100
+    # Primer nivel con más de `cut` píxeles por debajo y primero que deja `cut` por encima
+    low = int(np.searchsorted(cdf, cut, side='right'))
+    high = int(np.searchsorted(cdf, total - cut, side='left'))
+    if total == 0 or high <= low:
+        return LEVELS.copy()
+    return np.clip((LEVELS - low) * (255 / (high - low)), 0, 255)
+
+
+def equalize_curve(counts):
+    """
+    Curva de ecualización global: (cdf(v) - cdf_min) / (N - cdf_min) * 255.
+    :param counts: Histograma de 256 niveles
+    :return: Curva float64 de 256 valores en la escala 0-255
+    """
+    cdf = np.cumsum(counts, dtype=np.float64)
+    present = np.flatnonzero(counts)
+    if len(present) < 2:
+        return LEVELS.copy()
+    first = cdf[present[0]]
+    return np.clip((cdf - first) * (255 / (cdf[-1] - first)), 0, 255)
+
+
+def _tile_bounds(length, tiles):
+    return (np.arange(tiles + 1, dtype=np.int64) * length) // tiles
+
+
+def clahe_tables(levels, tiles=8, clip_limit=2.0):
+    """
+    Tablas de ecualización de cada tesela, con el histograma recortado a `clip_limit`
+    veces la media y el exceso repartido por igual entre los 256 niveles.
+    :param levels: Niveles uint8 (H, W) de la imagen (luminancia)
+    :param tiles: Teselas por lado (como mucho una por píxel)
+    :param clip_limit: Límite de contraste (1 equivale a no ecualizar)
+    :return: (tablas float32 (teselas_y, teselas_x, 256), límites de filas, límites de columnas)
+    """
+    height, width = levels.shape
+    tiles_y, tiles_x = max(1, min(int(tiles), height)), max(1, min(int(tiles), width))
+    rows, cols = _tile_bounds(height, tiles_y), _tile_bounds(width, tiles_x)
+
+    # Un único bincount por bloque de filas: el código de cada píxel es tesela_x * 256 + nivel
+    column_code = (np.repeat(np.arange(tiles_x, dtype=np.int32), np.diff(cols)) << 8)[None, :]
+    counts = np.zeros((tiles_y, tiles_x * 256), dtype=np.int64)
+    step = max(1, TILE_HIST_CHUNK // width)
+    for ty in range(tiles_y):
+        for start in range(rows[ty], rows[ty + 1], step):
+            block = levels[start:min(rows[ty + 1], start + step)]
+            codes = column_code + block
+            counts[ty] += np.bincount(codes.reshape(-1), minlength=tiles_x * 256)
+
+    hist = counts.reshape(tiles_y, tiles_x, 256).astype(np.float64)
+    area = (np.diff(rows)[:, None] * np.diff(cols)[None, :]).astype(np.float64)
+    limit = np.maximum(1.0, float(clip_limit) * area / 256)[..., None]
+    excess = np.maximum(hist - limit, 0).sum(axis=2, keepdims=True)
+    np.minimum(hist, limit, out=hist)
+    hist += excess / 256
+    tables = np.cumsum(hist, axis=2) * (255 / area[..., None])
+    return np.clip(tables, 0, 255).astype(np.float32), rows, cols
+
+
+def _axis_weights(length, bounds):
+    """Teselas vecinas (índices de tabla) y peso de la segunda para cada fila o columna."""
+    centers = (bounds[:-1] + bounds[1:] - 1) / 2
+    position = np.interp(np.arange(length), centers, np.arange(len(centers)))
+    first = np.floor(position).astype(np.int32)
+    second = np.minimum(first + 1, len(centers) - 1)
+    return first, second, (position - first).astype(np.float32)
+
+
+def clahe(image, out, tiles=8, clip_limit=2.0):
+    """
+    CLAHE sobre la luminancia: cada píxel interpola bilinealmente las tablas de las cuatro
+    teselas más cercanas, y la diferencia entre la luminancia nueva y la original se suma
+    a los tres canales (conserva Cb y Cr, como sustituir Y en YCbCr).
+    :param image: Imagen (H, W), (H, W, 3) o (H, W, 4) uint8, uint16 o float32
+    :param out: Array con la forma y el tipo de la imagen (no puede ser la propia imagen)
+    :param tiles: Teselas por lado
+    :param clip_limit: Límite de contraste
+    :return: `out`
+    """
+    image = normalize(image)
+    color = image.ndim == 3 and image.shape[2] >= 3
+    if image.ndim == 3 and not color:
+        image, out = image[..., 0], out[..., 0]
+    gray = luma(image) if color else image
+    levels = convert(gray, np.uint8)
+    tables, rows, cols = clahe_tables(levels, tiles, clip_limit)
+    tiles_x = tables.shape[1]
+    flat = tables.reshape(-1)
+
+    row_a, row_b, weight_y = _axis_weights(image.shape[0], rows)
+    col_a, col_b, weight_x = _axis_weights(image.shape[1], cols)
+    # Desplazamientos en la tabla plana: (tesela_y * teselas_x + tesela_x) * 256 + nivel
+    row_a, row_b = row_a * (tiles_x << 8), row_b * (tiles_x << 8)
+    col_a, col_b = col_a << 8, col_b << 8
+    unit = np.float32(scale(image.dtype))
+    top_value = white(image.dtype)
+    rounding = np.float32(0.5 if image.dtype.kind in 'ui' else 0)
+
+    def band(band_start, band_stop):
+        for start in range(band_start, band_stop, CLAHE_ROWS):
+            stop = min(band_stop, start + CLAHE_ROWS)
+            v = levels[start:stop].astype(np.int32)
+            base = row_a[start:stop, None] + v
+            upper = flat.take(base + col_a)
+            upper += (flat.take(base + col_b) - upper) * weight_x
+            base = row_b[start:stop, None] + v
+            lower = flat.take(base + col_a)
+            lower += (flat.take(base + col_b) - lower) * weight_x
+            lower -= upper
+            lower *= weight_y[start:stop, None]
+            upper += lower
+            # Diferencia de luminancia en la escala de la imagen (más el redondeo)
+            upper -= v
+            upper *= unit
+            upper += rounding
+            source = image[start:stop]
+            target = out[start:stop]
+            if not color:
+                target[...] = np.clip(source + upper, 0, top_value)
+                continue
+            for channel in range(3):
+                target[..., channel] = np.clip(source[..., channel] + upper, 0, top_value)
+            if image.shape[2] == 4:
+                target[..., 3] = source[..., 3]
+
+    run_in_bands(band, image.shape[0], max(1, image[:1].size))
+    return out
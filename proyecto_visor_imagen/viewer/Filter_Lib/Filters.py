@@ -1,116 +1,419 @@
+from functools import lru_cache
+
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import rgb_to_hsv, hsv_to_rgb
+
+from .Dtypes import convert, is_float, normalize, scale, white, widest
+
+# Número de subpíxeles procesados por bloque al aplicar una LUT. np.take convierte
+# los índices a enteros de 64 bits, así que trabajar por bloques acota ese temporal
+# a unos pocos MB independientemente del tamaño de la imagen.
+LUT_CHUNK = 1 << 18
+
+
+def _lut_brightness(values, factor=1.0):
+    return np.clip(values.astype(np.float32) * factor, 0, 255)
+
+
+def _lut_contrast(values, factor=1.0):
+    mean = 128
+    return np.clip((values.astype(np.float32) - mean) * factor + mean, 0, 255)
+
+
+def _lut_negative(values):
+    return 255 - values
+
+
+def _lut_highlight(values, mode='light'):
+    result = values.copy()
+    if mode == 'light':
+        mask = values > 128
+        result[mask] = np.clip(values[mask] * 1.5, 0, 255)
+    elif mode == 'dark':
+        mask = values < 128
+        result[mask] = np.clip(values[mask] * 2, 0, 255)
+    return result
+
+
+def _lut_binary(values, threshold=128):
+    return np.where(values > threshold, 255, 0)
+
+
+def _lut_identity(values):
+    return values
+
+
+def _lut_curve(values, points=()):
+    # Curva tabulada en los 256 niveles enteros e interpolada entre ellos; sobre los
+    # niveles enteros de la tabla de 8 bits se redondea en lugar de truncar
+    result = np.interp(values, np.arange(len(points)), points)
+    return np.rint(result) if values.dtype.kind in 'iu' else result
+
+
+# Operaciones puntuales conocidas: cada una recibe valores de subpíxel en la escala 0-255
+# (los 256 enteros posibles para uint8, 65536 valores fraccionarios para uint16 o los
+# propios píxeles float32 reescalados) y devuelve el valor transformado para cada uno.
+_LUT_BUILDERS = {
+    'identity': _lut_identity,
+    'brightness': _lut_brightness,
+    'contrast': _lut_contrast,
+    'negative': _lut_negative,
+    'highlight': _lut_highlight,
+    'binary': _lut_binary,
+    'curve': _lut_curve,
+}
+
+
+def _output_buffer(image, shape, dtype, out=None, inplace=False):
+    """
+    Devuelve el buffer donde un filtro debe escribir su resultado.
+    :param image: Imagen de entrada (se reutiliza si inplace=True)
+    :param shape: Forma del resultado
+    :param dtype: Tipo de dato del resultado
+    :param out: Array opcional proporcionado por quien llama
+    :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+    :return: Array de salida
+    """
+    shape = tuple(shape)
+    dtype = np.dtype(dtype)
+    if inplace and out is not None:
+        raise ValueError("No se pueden usar out e inplace a la vez")
+    target = image if inplace else out
+    if target is None:
+        return np.empty(shape, dtype=dtype)
+    if target.shape != shape or target.dtype != dtype:
+        raise ValueError(
+            f"El buffer de salida debe tener forma {shape} y tipo {dtype}, "
+            f"pero tiene forma {target.shape} y tipo {target.dtype}"
+        )
+    if not target.flags.writeable:
+        raise ValueError("El buffer de salida es de solo lectura")
+    return target
+
+
+def _store(result, image, out=None, inplace=False):
+    """Copia un resultado ya calculado en out/image cuando se pidió; si no, lo devuelve tal cual."""
+    if out is None and not inplace:
+        return result
+    target = _output_buffer(image, result.shape, result.dtype, out, inplace)
+    if target is not result:
+        np.copyto(target, result)
+    return target
+
+
+def _passthrough(image, out=None, inplace=False):
+    """Resultado de un filtro que no modifica la imagen, respetando out."""
+    if out is None:
+        return image
+    return _store(image, image, out)
+
+
+def _convolve_into(image, convolve, out=None, inplace=False):
+    """
+    Aplica un filtro de vecindad a los canales de color (el alfa se conserva).
+    Los filtros de vecindad leen filas vecinas, así que nunca escriben sobre su entrada:
+    con inplace=True el resultado se calcula aparte y se copia.
+    :param image: Imagen (H, W) o (H, W, C)
+    :param convolve: Función (entrada, salida) que rellena `salida`
+    :return: Imagen filtrada
+    """
+    image = normalize(image)
+    target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+    direct = not np.may_share_memory(target, image)
+    result = target if direct else np.empty_like(image)
+    color = result[..., :3] if image.ndim == 3 and image.shape[2] == 4 else result
+    if color is result:
+        convolve(image, result)
+    else:
+        convolve(image[..., :3], color)
+        result[..., 3] = image[..., 3]
+    if is_float(image.dtype):
+        # Los enteros ya se saturan al guardar; en float32 el rango es [0, 1]
+        np.clip(color, 0, 1, out=color)
+    if not direct:
+        np.copyto(target, result)
+    return target
+
+
+@lru_cache(maxsize=256)
+def _cached_lut(op, params, dtype=np.dtype(np.uint8)):
+    if dtype == np.uint8:
+        values = np.arange(256, dtype=np.int64)
+        lut = _LUT_BUILDERS[op](values, **dict(params)).astype(np.uint8)
+    else:
+        # 16 bits: los 65536 valores en la escala 0-255 (x / 257) y vuelta con redondeo
+        values = np.arange(65536, dtype=np.float64) / 257
+        lut = np.rint(_LUT_BUILDERS[op](values, **dict(params)) * 257.0)
+        lut = np.clip(lut, 0, 65535).astype(np.uint16)
+    # La tabla se comparte entre llamadas, así que la protegemos contra escritura
+    lut.flags.writeable = False
+    return lut
+
+
+def _point_float(image, op, params, out):
+    """Operación puntual sobre float32: el constructor de la LUT se evalúa sobre los píxeles."""
+    from .Parallel import run_in_bands
+
+    builder = _LUT_BUILDERS[op]
+    row_size = max(1, image[:1].size)
+    rows = max(1, LUT_CHUNK // row_size)
+
+    def band(band_start, band_stop):
+        for start in range(band_start, band_stop, rows):
+            stop = min(band_stop, start + rows)
+            values = builder(image[start:stop] * np.float32(255), **params)
+            np.multiply(values, np.float32(1 / 255), out=out[start:stop], casting='unsafe')
+
+    run_in_bands(band, image.shape[0], row_size)
+    return out
+
+
+def _apply_curves(image, curves, target):
+    """
+    Aplica curvas de 256 niveles (escala 0-255) a los canales de color; el alfa se conserva.
+    :param curves: Una curva para todos los canales o una por canal de color
+    """
+    color = image.ndim == 3 and image.shape[2] >= 3
+    if len(curves) == 1:
+        src = image[..., :3] if color else image
+        dst = target[..., :3] if color else target
+        ImageFilters.apply_point(src, 'curve', out=dst, points=tuple(curves[0]))
+    else:
+        for channel, curve in enumerate(curves):
+            ImageFilters.apply_point(image[..., channel], 'curve', out=target[..., channel],
+                                     points=tuple(curve))
+    if color and image.shape[2] == 4 and target is not image:
+        target[..., 3] = image[..., 3]
+    return target
+
 
 class ImageFilters:
     @staticmethod
-    def adjust_brightness(image, factor):
+    def build_lut(op, dtype=np.uint8, **params):
+        """
+        Construye la tabla de consulta (LUT) de una operación puntual.
+        :param op: Nombre de la operación ('brightness', 'contrast', 'negative',
+                   'highlight', 'binary' o 'identity')
+        :param dtype: Tipo de la imagen: uint8 (256 entradas) o uint16 (65536 entradas)
+        :param params: Parámetros de la operación (por ejemplo factor=1.2), siempre en
+                       la escala 0-255
+        :return: Array del tipo pedido (solo lectura) con el valor de salida para cada
+                 valor de entrada
+        """
+        if op not in _LUT_BUILDERS:
+            raise ValueError(f"Operación puntual desconocida: {op}")
+        dtype = np.dtype(dtype)
+        if dtype not in (np.uint8, np.uint16):
+            raise ValueError(f"Las LUT son para imágenes uint8 o uint16, no {dtype} "
+                             "(ver apply_point)")
+        return _cached_lut(op, tuple(sorted(params.items())), dtype)
+
+    @staticmethod
+    def compose_luts(*luts):
+        """
+        Combina varias LUT en una sola que equivale a aplicarlas en orden.
+        :param luts: LUTs del mismo tipo (uint8 o uint16), en el orden de aplicación
+        :return: LUT resultante
+        """
+        result = np.arange(len(luts[0]), dtype=luts[0].dtype)
+        for lut in luts:
+            result = lut[result]
+        return result
+
+    @staticmethod
+    def apply_point(image, op, out=None, **params):
+        """
+        Aplica una operación puntual eligiendo la implementación según el tipo de la imagen:
+        LUT de 256 entradas para uint8, de 65536 para uint16 y evaluación directa sobre los
+        píxeles para float32 (en [0, 1]).
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param op: Nombre de la operación (ver `build_lut`)
+        :param out: Array opcional del tipo de la imagen donde escribir el resultado
+                    (puede ser la propia imagen)
+        :param params: Parámetros de la operación, en la escala 0-255
+        :return: Imagen transformada (del tipo de la entrada)
+        """
+        if op not in _LUT_BUILDERS:
+            raise ValueError(f"Operación puntual desconocida: {op}")
+        image = normalize(image)
+        if is_float(image.dtype):
+            out = _output_buffer(image, image.shape, image.dtype, out)
+            return _point_float(image, op, params, out)
+        lut = ImageFilters.build_lut(op, dtype=image.dtype, **params)
+        return ImageFilters.apply_lut(image, lut, out=out)
+
+    @staticmethod
+    def apply_lut(image, lut, out=None):
+        """
+        Aplica una LUT a todos los subpíxeles de la imagen sin intermedios en coma flotante.
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param lut: LUT uint8 de 256 entradas o uint16 de 65536 (la imagen se convierte
+                    al tipo de la tabla si no lo tiene ya)
+        :param out: Array opcional del tipo de la LUT con la forma de la imagen donde
+                    escribir el resultado (puede ser la propia imagen)
+        :return: Imagen transformada (del tipo de la LUT)
+        """
+        image = convert(image, lut.dtype)
+        out = _output_buffer(image, image.shape, lut.dtype, out)
+
+        from .Parallel import run_in_bands
+
+        if image.flags.c_contiguous and out.flags.c_contiguous:
+            flat_src = image.reshape(-1)
+            flat_out = out.reshape(-1)
+
+            def band(band_start, band_stop):
+                for start in range(band_start, band_stop, LUT_CHUNK):
+                    stop = min(band_stop, start + LUT_CHUNK)
+                    np.take(lut, flat_src[start:stop], out=flat_out[start:stop])
+
+            run_in_bands(band, flat_src.size)
+        else:
+            # Vistas no contiguas (recortes, canales sueltos): recorremos por bloques de filas
+            row_size = max(1, image[:1].size)
+            rows = max(1, LUT_CHUNK // row_size)
+
+            def band(band_start, band_stop):
+                for start in range(band_start, band_stop, rows):
+                    stop = min(band_stop, start + rows)
+                    np.take(lut, image[start:stop], out=out[start:stop])
+
+            run_in_bands(band, image.shape[0], row_size)
+        return out
+
+    @staticmethod
+    def apply_channel_luts(image, luts, out=None):
+        """
+        Aplica una LUT distinta a cada canal de la imagen en una sola pasada por bloques de filas.
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param luts: Array (C, 256) uint8 o (C, 65536) uint16 con una LUT por canal
+        :param out: Array opcional del tipo de las LUT con la forma de la imagen donde
+                    escribir el resultado (puede ser la propia imagen)
+        :return: Imagen transformada (del tipo de las LUT)
+        """
+        luts = np.asarray(luts)
+        if luts.dtype not in (np.uint8, np.uint16):
+            luts = luts.astype(np.uint8)
+        # Si todos los canales comparten LUT, basta con la versión plana
+        if (luts == luts[0]).all():
+            return ImageFilters.apply_lut(image, luts[0], out=out)
+
+        image = convert(image, luts.dtype)
+        out = _output_buffer(image, image.shape, luts.dtype, out)
+
+        from .Parallel import run_in_bands
+
+        height, width, channels = image.shape
+        rows = max(1, LUT_CHUNK // max(1, width * channels))
+
+        def band(band_start, band_stop):
+            for start in range(band_start, band_stop, rows):
+                stop = min(band_stop, start + rows)
+                for c in range(channels):
+                    np.take(luts[c], image[start:stop, :, c], out=out[start:stop, :, c])
+
+        run_in_bands(band, height, width * channels)
+        return out
+
+    @staticmethod
+    def adjust_brightness(image, factor, out=None, inplace=False):
         """
         Ajusta el brillo de la imagen.
         :param image: Imagen en formato numpy array (H, W, C)
         :param factor: Factor de brillo (>1 para aumentar, <1 para disminuir)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
         :return: Imagen con brillo ajustado
         """
-        # Aseguramos que la imagen esté en formato float para evitar problemas de desbordamiento
-        img_float = image.astype(np.float32)
-        adjusted = img_float * factor
-        # Recortamos los valores para que estén en el rango válido [0, 255]
-        return np.clip(adjusted, 0, 255).astype(np.uint8)
+        # La operación solo depende del valor de cada subpíxel, así que se resuelve
+        # con una LUT (256 entradas en uint8, 65536 en uint16) recortada al blanco
+        image = normalize(image)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return ImageFilters.apply_point(image, 'brightness', out=target, factor=float(factor))
     
     @staticmethod
-    def adjust_contrast(image, factor):
+    def adjust_contrast(image, factor, out=None, inplace=False):
         """
         Ajusta el contraste de la imagen.
         :param image: Imagen en formato numpy array (H, W, C)
         :param factor: Factor de contraste (>1 para aumentar, <1 para disminuir)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
         :return: Imagen con contraste ajustado
         """
-        img_float = image.astype(np.float32)
-        # Aplicamos la fórmula: (img - 128) * factor + 128
-        mean = 128
-        adjusted = (img_float - mean) * factor + mean
-        return np.clip(adjusted, 0, 255).astype(np.uint8)
+        # Aplicamos la fórmula (img - 128) * factor + 128 a través de una LUT
+        image = normalize(image)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return ImageFilters.apply_point(image, 'contrast', out=target, factor=float(factor))
     
     @staticmethod
-    def rotate_image(image, angle):
+    def rotate_image(image, angle, out=None, inplace=False):
         """
         Rota la imagen el ángulo especificado.
         :param image: Imagen en formato numpy array (H, W, C)
         :param angle: Ángulo de rotación en grados (0-360)
+        :param out: Array opcional donde escribir el resultado (con la forma del lienzo rotado)
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+                        (solo posible si el lienzo rotado conserva la forma)
         :return: Imagen rotada
         """
-        # Usamos scikit-image para rotar la imagen en lugar de matplotlib
-        # Esto evita problemas con el hilo principal y tkinter
-        from skimage.transform import rotate
-        
-        # Aseguramos que la imagen esté en formato float para evitar pérdida de datos
-        img_float = image.astype(np.float32) / 255.0
-        
-        # Rotamos la imagen
-        # preserve_range=True mantiene los valores en el rango original
-        # resize=True ajusta el tamaño del lienzo para que no se recorte la imagen
-        rotated = rotate(img_float, angle, resize=True, mode='constant', 
-                         cval=0, clip=False, preserve_range=False)
-        
-        # Convertimos de vuelta a uint8
-        rotated_image = (rotated * 255).astype(np.uint8)
-        
-        return rotated_image
+        # Múltiplos de 90° por transposición exacta; el resto con un mapa inverso
+        # cacheado por (forma, ángulo) y muestreo bilineal en enteros
+        from .Rotation import rotate
+        if not inplace:
+            return rotate(image, angle, resize=True, cval=0, out=out)
+        # La rotación lee toda la imagen: el resultado se calcula aparte y se copia encima
+        return _store(rotate(image, angle, resize=True, cval=0), image, inplace=True)
     
     @staticmethod
-    def highlight_zones(image, mode='light'):
+    def highlight_zones(image, mode='light', out=None, inplace=False):
         """
         Resalta las zonas claras u oscuras de la imagen.
         :param image: Imagen en formato numpy array (H, W, C)
         :param mode: 'light' para resaltar zonas claras, 'dark' para zonas oscuras
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
         :return: Imagen con zonas resaltadas
         """
-        if mode == 'light':
-            # Resaltar zonas claras: potenciamos los valores altos
-            mask = image > 128
-            result = image.copy()
-            result[mask] = np.clip(result[mask] * 1.5, 0, 255)
-            return result
-        elif mode == 'dark':
-            # Resaltar zonas oscuras: aumentamos el valor de los píxeles oscuros
-            mask = image < 128
-            result = image.copy()
-            result[mask] = np.clip(result[mask] * 2, 0, 255)
-            return result
-        else:
-            return image
+        if mode not in ('light', 'dark'):
+            return _passthrough(image, out, inplace)
+        # 'light' multiplica por 1.5 los valores > 128 y 'dark' por 2 los valores < 128;
+        # ambas reglas quedan precalculadas en la LUT, sin máscaras ni copias intermedias
+        image = normalize(image)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return ImageFilters.apply_point(image, 'highlight', out=target, mode=mode)
     
     @staticmethod
-    def apply_rgb_filter(image, red=True, green=True, blue=True):
+    def apply_rgb_filter(image, red=True, green=True, blue=True, out=None, inplace=False):
         """
         Aplica filtro RGB activando o desactivando canales.
         :param image: Imagen en formato numpy array (H, W, C)
         :param red: Booleano que indica si el canal rojo está activado
         :param green: Booleano que indica si el canal verde está activado
         :param blue: Booleano que indica si el canal azul está activado
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
         :return: Imagen con filtro RGB aplicado
         """
         # Verificar que la imagen tenga 3 canales
         if len(image.shape) != 3 or image.shape[2] < 3:
             # Si no es una imagen RGB, devolver la imagen original
-            return image
+            return _passthrough(image, out, inplace)
             
-        # Crear una copia para no modificar la original
-        result = image.copy()
+        # Buffer de salida: la propia imagen (inplace), el de quien llama o uno nuevo
+        image = normalize(image)
+        result = _output_buffer(image, image.shape, image.dtype, out, inplace)
         
         # Convertir los parámetros a booleanos explícitos
-        red_active = bool(red)
-        green_active = bool(green)
-        blue_active = bool(blue)
+        active = (bool(red), bool(green), bool(blue))
         
-        # Aplicar filtros de canal
+        # Aplicar filtros de canal: los canales desactivados se rellenan con 0 y el
+        # resto solo se copia si el resultado no es la propia imagen
         try:
-            if not red_active:
-                result[:, :, 0] = 0
-            if not green_active:
-                result[:, :, 1] = 0
-            if not blue_active:
-                result[:, :, 2] = 0
+            for channel in range(image.shape[2]):
+                if channel < 3 and not active[channel]:
+                    result[:, :, channel] = 0
+                elif result is not image:
+                    result[:, :, channel] = image[:, :, channel]
         except Exception as e:
             # En caso de error, registrar y devolver la imagen original
             print(f"Error al aplicar filtro RGB: {e}")
@@ -119,38 +422,37 @@ class ImageFilters:
         return result
     
     @staticmethod
-    def apply_cmy_filter(image, cyan=True, magenta=True, yellow=True):
+    def apply_cmy_filter(image, cyan=True, magenta=True, yellow=True, out=None, inplace=False):
         """
         Aplica filtro CMY activando o desactivando canales.
         :param image: Imagen en formato numpy array (H, W, C)
         :param cyan: Booleano que indica si el canal cian está activado
         :param magenta: Booleano que indica si el canal magenta está activado
         :param yellow: Booleano que indica si el canal amarillo está activado
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
         :return: Imagen con filtro CMY aplicado
         """
         # Verificar que la imagen tenga 3 canales
         if len(image.shape) != 3 or image.shape[2] < 3:
             # Si no es una imagen RGB, devolver la imagen original
-            return image
+            return _passthrough(image, out, inplace)
             
-        # Crear una copia para no modificar la original
-        result = image.copy()
+        # Buffer de salida: la propia imagen (inplace), el de quien llama o uno nuevo
+        image = normalize(image)
+        result = _output_buffer(image, image.shape, image.dtype, out, inplace)
         
         # Convertir los parámetros a booleanos explícitos
-        cyan_active = bool(cyan)
-        magenta_active = bool(magenta)
-        yellow_active = bool(yellow)
+        active = (bool(cyan), bool(magenta), bool(yellow))
         
+        # Cian, magenta y amarillo son la ausencia de rojo, verde y azul: un canal
+        # desactivado se satura al blanco del tipo y el resto solo se copia si hace falta
         try:
-            # Cian es la ausencia de rojo
-            if not cyan_active:
-                result[:, :, 0] = 255
-            # Magenta es la ausencia de verde
-            if not magenta_active:
-                result[:, :, 1] = 255
-            # Amarillo es la ausencia de azul
-            if not yellow_active:
-                result[:, :, 2] = 255
+            for channel in range(image.shape[2]):
+                if channel < 3 and not active[channel]:
+                    result[:, :, channel] = white(image.dtype)
+                elif result is not image:
+                    result[:, :, channel] = image[:, :, channel]
         except Exception as e:
             # En caso de error, registrar y devolver la imagen original
             print(f"Error al aplicar filtro CMY: {e}")
@@ -159,322 +461,464 @@ class ImageFilters:
         return result
     
     @staticmethod
-    def negative_image(image):
+    def negative_image(image, out=None, inplace=False):
         """
         Invierte los colores de la imagen para obtener el negativo.
         :param image: Imagen en formato numpy array (H, W, C)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
         :return: Negativo de la imagen
         """
-        return 255 - image
+        image = normalize(image)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return ImageFilters.apply_point(image, 'negative', out=target)
+    
+    @staticmethod
+    def adjust_hue(image, degrees, out=None, inplace=False):
+        """
+        Gira el tono de la imagen en el círculo cromático (HSV).
+        :param image: Imagen en formato numpy array (H, W, C)
+        :param degrees: Giro del tono en grados
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :return: Imagen con el tono desplazado
+        """
+        # Las imágenes en escala de grises no tienen tono
+        if image.ndim != 3 or image.shape[2] < 3:
+            return _passthrough(image, out, inplace)
+        from .ColorSpace import shift_hue
+        image = normalize(image)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return shift_hue(image, degrees, target)
+    
+    @staticmethod
+    def adjust_saturation(image, factor, out=None, inplace=False):
+        """
+        Ajusta la saturación de la imagen conservando el valor (V) de cada píxel.
+        :param image: Imagen en formato numpy array (H, W, C)
+        :param factor: Factor de saturación (0 escala de grises, >1 colores más intensos)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :return: Imagen con la saturación ajustada
+        """
+        if image.ndim != 3 or image.shape[2] < 3:
+            return _passthrough(image, out, inplace)
+        from .ColorSpace import adjust_chroma
+        image = normalize(image)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return adjust_chroma(image, 'saturation', factor, target)
+    
+    @staticmethod
+    def adjust_vibrance(image, amount, out=None, inplace=False):
+        """
+        Aumenta (o reduce) la saturación de los colores apagados más que la de los vivos.
+        :param image: Imagen en formato numpy array (H, W, C)
+        :param amount: Intensidad de la vibrancia (-1 a 1)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :return: Imagen con la vibrancia ajustada
+        """
+        if image.ndim != 3 or image.shape[2] < 3:
+            return _passthrough(image, out, inplace)
+        from .ColorSpace import adjust_chroma
+        image = normalize(image)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return adjust_chroma(image, 'vibrance', amount, target)
     
     @staticmethod
-    def zoom_image(image, x, y, scale):
+    def zoom_image(image, x, y, scale, out=None, inplace=False, output_shape=None,
+                   pyramid_key=None):
         """
         Aplica zoom a una región de la imagen.
         :param image: Imagen en formato numpy array (H, W, C)
         :param x: Coordenada x del centro de la región
         :param y: Coordenada y del centro de la región
         :param scale: Factor de escala del zoom (>1 para acercar, <1 para alejar)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :param output_shape: Tamaño (alto, ancho) de la salida; por defecto el de la imagen
+        :param pyramid_key: Clave de contenido de la imagen. Si se indica, se reutiliza
+                            (o se construye una vez) su pirámide multirresolución
         :return: Imagen con zoom aplicado
         """
         try:
             # Verificar que la imagen sea válida
             if image is None or len(image.shape) < 2:
                 print("Imagen inválida para aplicar zoom")
-                return image
+                return _passthrough(image, out, inplace)
                 
             # Obtener dimensiones
             height, width = image.shape[:2]
             
-            # Convertir coordenadas a enteros
-            x = int(x)
-            y = int(y)
-            
-            # Asegurar que scale sea positivo
-            scale = max(0.1, float(scale))
-            
-            # Calculamos el tamaño de la región para el zoom
-            zoom_width = max(1, int(width / scale))
-            zoom_height = max(1, int(height / scale))
-            
-            # Calculamos las coordenadas de la región
-            half_w = zoom_width // 2
-            half_h = zoom_height // 2
-            
-            # Aseguramos que las coordenadas estén dentro de los límites
-            x = max(half_w, min(x, width - half_w))
-            y = max(half_h, min(y, height - half_h))
-            
-            # Recortamos la región
-            x1, y1 = max(0, x - half_w), max(0, y - half_h)
-            x2, y2 = min(width, x + half_w), min(height, y + half_h)
+            # Región centrada en (x, y) que se amplía, dentro de los límites de la imagen
+            from .Integral import cached_integral
+            from .Zoom import get_pyramid, zoom_region, zoom_window
+            region = zoom_window(image.shape, x, y, scale)
             
             # Verificar que la región sea válida
-            if x2 <= x1 or y2 <= y1:
+            if region is None:
                 print("Región de zoom inválida")
-                return image
+                return _passthrough(image, out, inplace)
+            y1, y2, x1, x2 = region
                 
-            # Extraemos la región
-            region = image[y1:y2, x1:x2]
-            
-            # Redimensionamos usando scikit-image
-            from skimage.transform import resize
-            zoomed = resize(
-                region, 
-                (height, width), 
-                mode='edge',  # Usar 'edge' en lugar de 'reflect' para evitar artefactos
-                anti_aliasing=True,  # Aplicar anti-aliasing para mejor calidad
-                preserve_range=True  # Mantener el rango de valores
-            )
-            
-            return zoomed.astype(np.uint8)
+            # Solo se remuestrea la región recortada, leída del nivel de la pirámide más
+            # cercano a la salida (replicación de píxeles si la escala es entera)
+            if output_shape is None or inplace:
+                output_shape = (height, width)
+            # Si la imagen ya tiene su imagen integral (por ejemplo, tras pedir estadísticas
+            # de regiones), las reducciones se promedian desde ella
+            integral = cached_integral(pyramid_key)
+            pyramid = None
+            if pyramid_key is not None and integral is None:
+                pyramid = get_pyramid(image, pyramid_key)
+            zoomed = zoom_region(image, (y1, y2, x1, x2), output_shape, pyramid=pyramid,
+                                 integral=integral)
+            return _store(zoomed, image, out, inplace)
             
         except Exception as e:
             print(f"Error al aplicar zoom: {e}")
-            return image
+            return _passthrough(image, out, inplace)
+    
+    @staticmethod
+    def binarize_image(image, threshold=128, out=None, inplace=False, method='manual',
+                       classes=2, radius=15, offset=5.0, output='image', key=None):
+        """
+        Convierte la imagen a blanco y negro usando un umbral sobre la luminancia.
+        :param image: Imagen en formato numpy array (H, W, C)
+        :param threshold: Umbral de binarización (0-255, también para uint16 y float32)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :param method: 'manual' (usa `threshold`), 'otsu' (umbral que maximiza la varianza
+                       entre clases; con classes > 2, multi-Otsu con un gris por clase) o
+                       'adaptive' (cada píxel frente a la media de su vecindad)
+        :param classes: Clases de Otsu (2-5)
+        :param radius: Radio de la vecindad del umbral adaptativo
+        :param offset: Margen restado a la media local (0-255)
+        :param output: 'image' (forma de la entrada), 'mask' (un solo canal (H, W)) o
+                       'view' (la máscara difundida a los canales, vista de solo lectura
+                       sin copias); `out` e `inplace` solo se usan con 'image'
+        :param key: Clave de contenido de la imagen: Otsu reutiliza su histograma cacheado
+        :return: Imagen binarizada (0 o blanco, del tipo de la entrada)
+        """
+        image = normalize(image)
+        color = image.ndim == 3 and image.shape[2] >= 3
+
+        # Umbral manual sin conversión de color: es una operación puntual y basta una LUT
+        if method == 'manual' and output == 'image' and not (image.ndim == 3 and image.shape[2] == 3):
+            target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+            return ImageFilters.apply_point(image, 'binary', out=target, threshold=float(threshold))
+
+        from .Threshold import threshold_map
+        counts = None
+        if method == 'otsu' and key is not None and (image.ndim == 2 or color):
+            from .Histogram import cached_histograms
+            counts = cached_histograms(image, key)['luminance']
+        values, _ = threshold_map(image, method, threshold, classes, radius, offset, counts)
+
+        if output == 'mask' or image.ndim == 2:
+            if output == 'image':
+                return _store(values, image, out, inplace)
+            return values
+        if output == 'view':
+            return np.broadcast_to(values[..., None], image.shape)
+
+        # Difundimos el resultado a los canales de color sin apilar copias (el alfa se
+        # conserva salvo en el umbral manual sobre RGB, que no tiene alfa)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        channels = 3 if color else image.shape[2]
+        target[..., :channels] = values[..., None]
+        if channels < image.shape[2] and target is not image:
+            target[..., channels:] = image[..., channels:]
+        return target
     
     @staticmethod
-    def binarize_image(image, threshold=128):
+    def threshold_levels(image, classes=2, key=None):
         """
-        Convierte la imagen a blanco y negro usando un umbral.
+        Umbrales de Otsu (o multi-Otsu) de la luminancia, sin binarizar la imagen.
         :param image: Imagen en formato numpy array (H, W, C)
-        :param threshold: Umbral de binarización (0-255)
-        :return: Imagen binarizada
+        :param classes: Número de clases (2-5)
+        :param key: Clave de contenido de la imagen para reutilizar su histograma
+        :return: Lista de umbrales en la escala 0-255
         """
-        # Convertimos a escala de grises si la imagen es a color
-        if len(image.shape) == 3 and image.shape[2] == 3:
-            gray = np.dot(image[..., :3], [0.2989, 0.5870, 0.1140])
+        from .Histogram import cached_histograms
+        from .Threshold import gray_levels, level_counts, multi_otsu_thresholds, otsu_threshold
+        image = normalize(image)
+        if key is not None and (image.ndim == 2 or image.shape[2] >= 3):
+            counts = cached_histograms(image, key)['luminance']
         else:
-            gray = image.copy()
+            counts = level_counts(gray_levels(image))
+        if int(classes) <= 2:
+            return [otsu_threshold(counts)]
+        return multi_otsu_thresholds(counts, classes)
+    
+    @staticmethod
+    def blur_image(image, radius, mode='gaussian', out=None, inplace=False):
+        """
+        Desenfoca la imagen.
+        :param image: Imagen en formato numpy array (H, W, C)
+        :param radius: Radio en píxeles (desviación típica de la gaussiana o radio de la media)
+        :param mode: 'gaussian' o 'box'
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :return: Imagen desenfocada
+        """
+        if radius <= 0:
+            return _passthrough(image, out, inplace)
+        from .Convolution import box_blur, gaussian_blur
         
-        # Aplicamos umbral
-        binary = np.zeros_like(gray)
-        binary[gray > threshold] = 255
+        # Los radios grandes no encarecen el filtro: la media usa sumas acumuladas y la
+        # gaussiana pasa a FFT cuando el kernel 1D es muy largo
+        blur = box_blur if mode == 'box' else gaussian_blur
+        return _convolve_into(image, lambda src, dst: blur(src, radius, out=dst), out, inplace)
+    
+    @staticmethod
+    def sharpen_image(image, amount=1.0, out=None, inplace=False):
+        """
+        Enfoca la imagen restando su laplaciano (kernel 3x3).
+        :param image: Imagen en formato numpy array (H, W, C)
+        :param amount: Intensidad del enfoque
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :return: Imagen enfocada
+        """
+        if amount == 0:
+            return _passthrough(image, out, inplace)
+        from .Convolution import convolve, sharpen_kernel
+        kernel = sharpen_kernel(round(float(amount), 3))
+        return _convolve_into(image, lambda src, dst: convolve(src, kernel, out=dst), out, inplace)
+    
+    @staticmethod
+    def detect_edges(image, operator='sobel', out=None, inplace=False):
+        """
+        Detecta bordes sobre la luminancia de la imagen.
+        :param image: Imagen en formato numpy array (H, W, C)
+        :param operator: 'sobel' (módulo del gradiente) o 'laplacian' (valor absoluto)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :return: Imagen de bordes en escala de grises con la forma de la entrada
+        """
+        from .ColorSpace import grayscale
+        from .Convolution import LAPLACIAN, SOBEL_X, SOBEL_Y, convolve
         
-        # Si la imagen original era a color, convertimos el resultado a 3 canales
-        if len(image.shape) == 3 and image.shape[2] == 3:
-            binary = np.stack([binary, binary, binary], axis=-1)
+        image = normalize(image)
+        gray = grayscale(image)
+        if operator == 'laplacian':
+            edges = np.abs(convolve(gray, LAPLACIAN, dtype=np.float32))
+        else:
+            edges = convolve(gray, SOBEL_X, dtype=np.float32)
+            np.hypot(edges, convolve(gray, SOBEL_Y, dtype=np.float32), out=edges)
+        np.clip(edges, 0, white(image.dtype), out=edges)
         
-        return binary.astype(np.uint8)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        if target.ndim == 3:
+            target[..., :3] = edges[..., None]
+            if target.shape[2] == 4 and target is not image:
+                target[..., 3] = image[..., 3]
+        else:
+            target[...] = edges
+        return target
     
     @staticmethod
-    def merge_images(image1, image2, alpha=0.5):
+    def auto_levels(image, clip=0.5, per_channel=False, out=None, inplace=False,
+                    histograms=None, key=None):
+        """
+        Estira automáticamente el contraste para que el histograma ocupe todo el rango.
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param clip: Porcentaje de píxeles que se satura en cada extremo
+        :param per_channel: Si es True, cada canal RGB se estira por separado (corrige
+                            dominantes de color); si no, se usa la luminancia para todos
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :param histograms: Histogramas ya calculados con `compute_histograms` (opcional)
+        :param key: Clave de contenido de la imagen para reutilizar sus histogramas
+        :return: Imagen con los niveles ajustados
+        """
+        from .Enhancement import levels_curve
+        image = normalize(image)
+        histograms = histograms or ImageFilters.compute_histograms(image, key=key)
+        # Las curvas salen del histograma acumulado y se aplican como LUT
+        names = ('red', 'green', 'blue') if per_channel and histograms['red'] is not None else ('luminance',)
+        curves = [levels_curve(histograms[name], clip) for name in names]
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return _apply_curves(image, curves, target)
+    
+    @staticmethod
+    def equalize_histogram(image, out=None, inplace=False, histograms=None, key=None):
+        """
+        Ecualiza el histograma de la imagen (global): los niveles se reparten según su
+        frecuencia acumulada. En color la curva se calcula sobre la luminancia.
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :param histograms: Histogramas ya calculados con `compute_histograms` (opcional)
+        :param key: Clave de contenido de la imagen para reutilizar sus histogramas
+        :return: Imagen ecualizada
+        """
+        from .Enhancement import equalize_curve
+        image = normalize(image)
+        histograms = histograms or ImageFilters.compute_histograms(image, key=key)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        return _apply_curves(image, [equalize_curve(histograms['luminance'])], target)
+    
+    @staticmethod
+    def clahe(image, clip_limit=2.0, tiles=8, out=None, inplace=False):
+        """
+        Ecualización adaptativa con contraste limitado (CLAHE) sobre la luminancia.
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param clip_limit: Límite de contraste (1 no cambia la imagen; 2-4 es habitual)
+        :param tiles: Teselas por lado de la rejilla
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre la propia imagen
+        :return: Imagen con el contraste local realzado
+        """
+        if clip_limit <= 1:
+            return _passthrough(image, out, inplace)
+        from .Enhancement import clahe
+        # Cada píxel interpola las tablas de sus cuatro teselas vecinas, así que la
+        # salida no puede pisar la entrada: con inplace se calcula aparte y se copia
+        image = normalize(image)
+        target = _output_buffer(image, image.shape, image.dtype, out, inplace)
+        direct = not np.may_share_memory(target, image)
+        result = clahe(image, target if direct else np.empty_like(image), tiles, clip_limit)
+        if not direct:
+            np.copyto(target, result)
+        return target
+    
+    @staticmethod
+    def merge_images(image1, image2, alpha=0.5, out=None, inplace=False, overlay_key=None):
         """
         Fusiona dos imágenes con un factor de transparencia.
         :param image1: Primera imagen en formato numpy array (H, W, C)
         :param image2: Segunda imagen en formato numpy array (H, W, C)
         :param alpha: Factor de transparencia (0-1)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre image1
+        :param overlay_key: Clave de contenido de image2 para reutilizar su versión
+                            redimensionada entre llamadas (por defecto, huella de sus píxeles)
         :return: Imagen fusionada
         """
-        # Redimensionamos la segunda imagen al tamaño de la primera si es necesario
-        if image1.shape[:2] != image2.shape[:2]:
-            from skimage.transform import resize
-            image2 = resize(image2, image1.shape[:2], mode='reflect', preserve_range=True).astype(np.uint8)
+        from .Blend import blend, fit_overlay
         
-        # Fusionamos las imágenes: image1 * (1-alpha) + image2 * alpha
-        merged = image1.astype(np.float32) * (1 - alpha) + image2.astype(np.float32) * alpha
+        # La segunda imagen se adapta (tamaño, canales y tipo) a la primera una sola vez y
+        # se guarda en caché: al cambiar alpha solo queda la mezcla
+        image1 = normalize(image1)
+        image2 = fit_overlay(image2, image1.shape, key=overlay_key, dtype=image1.dtype)
         
-        return np.clip(merged, 0, 255).astype(np.uint8)
+        # Fusionamos las imágenes: image1 * (1-alpha) + image2 * alpha
+        target = _output_buffer(image1, image1.shape, image1.dtype, out, inplace)
+        return blend(image1, image2, alpha, out=target)
     
     @staticmethod
-    def watermark_merge_images(image1, image2):
+    def watermark_merge_images(image1, image2, out=None, inplace=False, offset=None):
         """
         Fusiona dos imágenes de diferentes tamaños usando el método de marca de agua.
         :param image1: Primera imagen en formato numpy array (H, W, C)
         :param image2: Segunda imagen en formato numpy array (H, W, C)
+        :param out: Array opcional donde escribir el resultado
+        :param inplace: Si es True, el resultado se escribe sobre image1
+                        (solo posible si image1 ya tiene la forma del resultado)
+        :param offset: Posición (fila, columna) de la imagen pequeña; centrada por defecto
         :return: Imagen fusionada
         """
         try:
-            # Normalizar valores a rango [0, 1]
-            img1 = image1.astype(np.float32) / 255
-            img2 = image2.astype(np.float32) / 255
-            
-            # Determinar cuál imagen es más grande
-            tamano1 = img1.shape[0] * img1.shape[1]
-            tamano2 = img2.shape[0] * img2.shape[1]
-            
-            # Identificar la imagen más grande y la más pequeña
-            if tamano1 >= tamano2:
-                img_grande = img1.copy()
-                img_pequena = img2.copy()
-            else:
-                img_grande = img2.copy()
-                img_pequena = img1.copy()
-            
-            # Cálculo de alto y ancho de dimensiones finales
-            altura_final = max(img_grande.shape[0], img_pequena.shape[0])
-            anchura_final = max(img_grande.shape[1], img_pequena.shape[1])
-            
-            # Matriz nueva para añadir imágenes
-            resultado = np.zeros((altura_final, anchura_final, 3))
-            
-            # Posición central para la imagen más pequeña
-            centro_altura = altura_final // 2
-            centro_anchura = anchura_final // 2
-            
-            # Insertar imagen más pequeña en el centro
-            inicio_altura = centro_altura - img_pequena.shape[0] // 2
-            inicio_anchura = centro_anchura - img_pequena.shape[1] // 2
-            
-            resultado[inicio_altura:inicio_altura + img_pequena.shape[0],
-                     inicio_anchura:inicio_anchura + img_pequena.shape[1]] += img_pequena
-            
-            # Aplicar efecto de marca de agua
-            img_marca_agua = img_grande * 1
-            
-            # Insertar la imagen con marca de agua
-            resultado[:img_marca_agua.shape[0], :img_marca_agua.shape[1]] += img_marca_agua
-            
-            # Normalizar valores
-            resultado = np.clip(resultado, 0, 1)
-            
-            # Convertir de vuelta a rango [0, 255]
-            return (resultado * 255).astype(np.uint8)
+            # La imagen pequeña se suma con saturación (en el tipo más preciso de las dos) y
+            # solo en su rectángulo; si image1 es la grande y se trabaja en el sitio, el
+            # resto no se toca
+            from .Blend import watermark, watermark_shape
+            dtype = widest(image1.dtype, image2.dtype)
+            target = _output_buffer(image1, watermark_shape(image1, image2), dtype, out, inplace)
+            return watermark(image1, image2, offset=offset, out=target)
             
         except Exception as e:
             print(f"Error en watermark_merge_images: {e}")
             # En caso de error, devolver la primera imagen
-            return image1
+            return _passthrough(image1, out, inplace)
     
     @staticmethod
-    def create_mosaic(images, color_frame='red', frame_size=9):
+    def create_mosaic(images, color_frame='red', frame_size=9, out=None,
+                      rows=2, cols=2, tile_size=300, mode='nearest'):
         """
-        Crea un mosaico de 4 imágenes con un marco de color.
-        :param images: Lista de 4 imágenes en formato numpy array (H, W, C)
+        Crea un mosaico de rows x cols imágenes con un marco de color.
+        :param images: Lista de rows * cols imágenes en formato numpy array (H, W, C)
         :param color_frame: Color del marco ('red', 'black', etc.)
         :param frame_size: Tamaño del marco en píxeles
+        :param out: Array opcional donde escribir el mosaico (del tipo más preciso de las imágenes)
+        :param rows: Número de filas de la rejilla (2 por defecto)
+        :param cols: Número de columnas de la rejilla (2 por defecto)
+        :param tile_size: Lado de cada celda en píxeles, o tupla (alto, ancho)
+        :param mode: Remuestreo de cada celda: 'nearest', 'bilinear' o 'area'
         :return: Imagen del mosaico en formato numpy array
         """
         # Validar número de imágenes
-        if len(images) != 4:
-            raise ValueError("Se requieren exactamente 4 imágenes")
-        
-        # Redimensionar las imágenes
-        resized_images = []
-        for img in images:
-            # Redimensionar imagen una por una
-            if img.ndim == 3:  # Imagen a color
-                img_resized = np.zeros((300, 300, img.shape[2]))
-            else:  # Imagen en escala de grises
-                img_resized = np.zeros((300, 300))
-            
-            # Aplicación de interpolación simple
-            x_ratio = img.shape[1] / 300
-            y_ratio = img.shape[0] / 300
-            
-            for y in range(300):
-                for x in range(300):
-                    px = int(x * x_ratio)
-                    py = int(y * y_ratio)
-                    px = min(px, img.shape[1] - 1)
-                    py = min(py, img.shape[0] - 1)
-                    img_resized[y, x] = img[py, px]
-            
-            resized_images.append(img_resized)
-        
-        # Cálculo del tamaño total del mosaico
-        total_size = 300 * 2 + frame_size * 3  # 3 marcos en total (bordes y centro)
-        
-        # Crear el lienzo con el color del marco
-        mosaic = np.zeros((total_size, total_size, 3))
-        
-        # Convertir nombre de color a RGB usando matplotlib
-        import matplotlib.pyplot as plt
-        rgb_color = plt.cm.colors.to_rgb(color_frame)
-        
-        # Rellenar todo el lienzo con el color del marco
-        mosaic[:, :, 0] = rgb_color[0]
-        mosaic[:, :, 1] = rgb_color[1]
-        mosaic[:, :, 2] = rgb_color[2]
-        
-        # Insertar imágenes en la matriz
-        for i in range(4):
-            row = i // 2
-            col = i % 2
-            pos_x = col * (300 + frame_size) + frame_size
-            pos_y = row * (300 + frame_size) + frame_size
-            
-            img = resized_images[i]
-            
-            # Asegurar que la imagen tenga 3 canales
-            if img.ndim == 2:  # Si es escala de grises
-                img_rgb = np.stack([img, img, img], axis=2)
-            else:
-                img_rgb = img
-                
-            # Normalizar valores si es necesario
-            if img_rgb.max() > 1.0:
-                img_rgb = img_rgb / 255.0
-                
-            # Posicionar la imagen en el mosaico
-            mosaic[pos_y:pos_y+300, pos_x:pos_x+300] = img_rgb
-        
-        # Convertir a formato uint8 para devolverlo como imagen
-        return (mosaic * 255).astype(np.uint8)
+        if len(images) != rows * cols:
+            raise ValueError(f"Se requieren exactamente {rows * cols} imágenes")
+
+        # Las celdas se rellenan con índices precalculados directamente en el lienzo
+        from .Mosaic import build_mosaic
+        return build_mosaic(images, rows=rows, cols=cols, tile_size=tile_size,
+                            gutter=frame_size, color=color_frame, mode=mode, out=out)
     
     @staticmethod
-    def generate_histogram(image):
+    def compute_histograms(image, key=None):
+        """
+        Calcula los histogramas de intensidad y de cada canal RGB en una sola pasada.
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param key: Clave de contenido de la imagen (por ejemplo, la huella del fichero
+                    subido); si se indica, el resultado se reutiliza entre peticiones
+        :return: Diccionario {'luminance', 'red', 'green', 'blue'} con 256 conteos por canal
+                 (los canales de color son None en imágenes en escala de grises)
+        """
+        from .Histogram import cached_histograms
+        return cached_histograms(image, key)
+
+    @staticmethod
+    def generate_histogram(image, histograms=None):
         """
-        Genera el histograma de la imagen para cada canal de color.
+        Genera el gráfico del histograma de la imagen para cada canal de color.
         :param image: Imagen en formato numpy array (H, W, C)
-        :return: Figura de matplotlib con el histograma
+        :param histograms: Histogramas ya calculados con `compute_histograms` (opcional)
+        :return: Imagen RGB uint8 con el gráfico de barras
         """
-        # Configurar matplotlib para no usar GUI
-        import matplotlib
-        matplotlib.use('Agg')  # Use non-interactive backend
-        
-        # Crear figura sin usar tkinter
-        if len(image.shape) == 3 and image.shape[2] == 3:
-            # Crear figura
-            fig = plt.figure(figsize=(12, 10))
-            
-            # Crear subplots manualmente
-            ax1 = fig.add_subplot(2, 2, 1)
-            ax2 = fig.add_subplot(2, 2, 2)
-            ax3 = fig.add_subplot(2, 2, 3)
-            ax4 = fig.add_subplot(2, 2, 4)
-            
-            # Histograma de intensidad
-            gray = np.dot(image[..., :3], [0.2989, 0.5870, 0.1140])
-            ax1.hist(gray.ravel(), bins=256, color='gray', alpha=0.7)
-            ax1.set_title('Intensidad')
-            ax1.set_xlim([0, 256])
-            
-            # Histograma de canal rojo
-            ax2.hist(image[..., 0].ravel(), bins=256, color='red', alpha=0.7)
-            ax2.set_title('Canal Rojo')
-            ax2.set_xlim([0, 256])
-            
-            # Histograma de canal verde
-            ax3.hist(image[..., 1].ravel(), bins=256, color='green', alpha=0.7)
-            ax3.set_title('Canal Verde')
-            ax3.set_xlim([0, 256])
-            
-            # Histograma de canal azul
-            ax4.hist(image[..., 2].ravel(), bins=256, color='blue', alpha=0.7)
-            ax4.set_title('Canal Azul')
-            ax4.set_xlim([0, 256])
-            
-            plt.tight_layout()
+        from .Histogram import compute_histograms, render_histogram_chart
+        if histograms is None:
+            histograms = compute_histograms(image)
+        return render_histogram_chart(histograms)
+
+    @staticmethod
+    def region_stats(image, regions, key=None):
+        """
+        Estadísticas de regiones rectangulares a partir de la imagen integral (cuatro lecturas
+        por región, sea cual sea su tamaño).
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param regions: Lista de rectángulos (x, y, ancho, alto); se recortan a la imagen
+        :param key: Clave de contenido de la imagen; si se indica, la imagen integral se
+                    construye una vez y se reutiliza entre peticiones (también en el zoom)
+        :return: Lista de diccionarios con 'pixels', 'mean' y 'std' por canal y 'luminance'
+                 (media), en la escala 0-255 para cualquier tipo de dato
+        """
+        from .ColorSpace import LUMA_SHIFT, LUMA_WEIGHTS
+        from .Integral import get_integral
+        regions = np.asarray(regions, dtype=np.int64).reshape(-1, 4)
+        x, y, width, height = regions.T
+        integral = get_integral(image, key, squares=True)
+        bounds = (y, y + np.maximum(height, 0), x, x + np.maximum(width, 0))
+        unit = scale(integral.dtype)
+        pixels = integral.count(*bounds)
+        means = (integral.mean(*bounds) / unit).reshape(len(regions), -1)
+        stds = (integral.std(*bounds) / unit).reshape(len(regions), -1)
+        if means.shape[1] >= 3:
+            weights = np.array(LUMA_WEIGHTS, dtype=np.float64) / (1 << LUMA_SHIFT)
+            luminance = means[:, :3] @ weights
         else:
-            fig = plt.figure(figsize=(10, 6))
-            ax = fig.add_subplot(1, 1, 1)
-            ax.hist(image.ravel(), bins=256, color='gray', alpha=0.7)
-            ax.set_title('Histograma de Intensidad')
-            ax.set_xlim([0, 256])
-        
-        # Guardar la figura en un buffer de memoria
-        from io import BytesIO
-        buf = BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        plt.close(fig)  # Cerrar la figura para liberar memoria
-        
-        # Crear una nueva figura con la imagen guardada
-        buf.seek(0)
-        img = plt.imread(buf)
-        new_fig = plt.figure(figsize=(12, 10))
-        ax = new_fig.add_subplot(1, 1, 1)
-        ax.imshow(img)
-        ax.axis('off')
-        
-        return new_fig
\ No newline at end of file
+            luminance = means[:, 0]
+
+        stats = []
+        for index in range(len(regions)):
+            empty = pixels[index] == 0
+            stats.append({
+                'pixels': int(pixels[index]),
+                'mean': None if empty else [round(float(v), 3) for v in means[index]],
+                'std': None if empty else [round(float(v), 3) for v in stds[index]],
+                'luminance': None if empty else round(float(luminance[index]), 3),
+            })
+        return stats
@@ -0,0 +1,155 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .Cache import LRUCache
+from .ColorSpace import grayscale, luma
+from .Dtypes import convert, normalize
+
+# Píxeles procesados por bloque: acota los temporales de índices (intp) a unos pocos MB
+HISTOGRAM_CHUNK = 1 << 18
+
+# Histogramas por clave de contenido de la imagen: el endpoint del histograma y los
+# filtros de mejora automática de una misma imagen comparten un único cálculo
+HISTOGRAM_CACHE = LRUCache(max_items=64)
+
+# Canales en el orden en que se guardan en el bincount combinado
+CHANNELS = ('red', 'green', 'blue', 'luminance')
+
+# Colores de las barras (RGB) y títulos de cada panel
+PANEL_STYLE = {
+    'luminance': ((128, 128, 128), 'Intensidad'),
+    'red': ((255, 0, 0), 'Canal Rojo'),
+    'green': ((0, 128, 0), 'Canal Verde'),
+    'blue': ((0, 0, 255), 'Canal Azul'),
+}
+
+
+def _levels(block):
+    """Niveles 0-255 de un bloque: uint16 y float se cuantizan bloque a bloque."""
+    return convert(block, np.uint8)
+
+
+def compute_histograms(image):
+    """
+    Calcula en una sola pasada los histogramas de 256 niveles de la imagen.
+
+    Para imágenes en color, cada bloque de píxeles produce los índices de R, G, B y
+    luminancia desplazados a rangos disjuntos, y un único `bincount` los cuenta todos.
+    Las imágenes uint16 y float32 se cuantizan a 256 niveles dentro de cada bloque, sin
+    convertir la imagen completa. La luminancia se calcula con la precisión de la imagen
+    y después se cuantiza, igual que `Threshold.gray_levels`: Otsu da el mismo umbral con
+    el histograma cacheado que sin él.
+    :param image: Imagen en formato numpy array (H, W), (H, W, 3) o (H, W, 4)
+    :return: Diccionario {'luminance', 'red', 'green', 'blue'} con arrays int64 de 256
+             valores; en escala de grises los canales de color son None
+    """
+    image = normalize(image)
+    if image.ndim == 2 or image.shape[2] < 3:
+        # Escala de grises (con o sin alfa): solo cuenta el primer canal
+        counts = np.zeros(256, dtype=np.int64)
+        flat = grayscale(image).reshape(-1)
+        for start in range(0, flat.size, HISTOGRAM_CHUNK):
+            counts += np.bincount(_levels(flat[start:start + HISTOGRAM_CHUNK]), minlength=256)
+        return {'luminance': counts, 'red': None, 'green': None, 'blue': None}
+
+    # El canal alfa (si existe) no interviene en el histograma
+    pixels = image.reshape(-1, image.shape[2])[:, :3]
+    offsets = np.arange(3, dtype=np.uint16) * 256
+    counts = np.zeros(4 * 256, dtype=np.int64)
+    codes = np.empty((min(HISTOGRAM_CHUNK, len(pixels)), 4), dtype=np.uint16)
+    for start in range(0, len(pixels), HISTOGRAM_CHUNK):
+        raw = pixels[start:start + HISTOGRAM_CHUNK]
+        block = _levels(raw)
+        target = codes[:len(block)]
+        np.add(block, offsets, out=target[:, :3], dtype=np.uint16)
+        target[:, 3] = _levels(luma(raw))
+        target[:, 3] += 3 * 256
+        counts += np.bincount(target.reshape(-1), minlength=4 * 256)
+
+    counts = counts.reshape(4, 256)
+    return {name: counts[i] for i, name in enumerate(CHANNELS)}
+
+
+def cached_histograms(image, key=None):
+    """
+    Histogramas de `compute_histograms`, guardados en caché por clave de contenido.
+    :param image: Imagen en formato numpy array
+    :param key: Clave de contenido (por ejemplo, la huella del fichero subido); sin clave
+                se calculan sin cachear
+    :return: Diccionario de `compute_histograms` (arrays de solo lectura si se cachea)
+    """
+    if key is None:
+        return compute_histograms(image)
+
+    def build():
+        histograms = compute_histograms(image)
+        for counts in histograms.values():
+            if counts is not None:
+                counts.flags.writeable = False
+        return histograms
+
+    return HISTOGRAM_CACHE.get_or_create(('histograms', key), build)
+
+
+@lru_cache(maxsize=1)
+def _font():
+    from PIL import ImageFont
+    return ImageFont.load_default()
+
+
+def _draw_bars(panel, counts, color, alpha=0.7):
+    """Dibuja las barras de un histograma ocupando todo el alto de `panel`."""
+    height, width = panel.shape[:2]
+    peak = counts.max()
+    if peak == 0:
+        return
+    # Altura de cada barra en píxeles y columna del panel que corresponde a cada nivel
+    bar_heights = (counts * height + peak - 1) // peak
+    columns = bar_heights[(np.arange(width) * 256) // width]
+    mask = np.arange(height)[::-1, None] < columns[None, :]
+    # Color de la barra mezclado con el fondo blanco (como el alpha de las barras)
+    fill = np.round(255 - alpha * (255 - np.array(color))).astype(np.uint8)
+    panel[mask] = fill
+
+
+def render_histogram_chart(histograms, panel_size=(200, 512), margin=24):
+    """
+    Dibuja los histogramas como gráficos de barras directamente en un buffer uint8.
+    :param histograms: Resultado de `compute_histograms`
+    :param panel_size: Tamaño (alto, ancho) del área de barras de cada panel
+    :param margin: Margen en píxeles alrededor de cada panel (títulos y ejes)
+    :return: Imagen RGB uint8 con un panel (escala de grises) o una rejilla 2x2 (color)
+    """
+    names = [name for name in ('luminance', 'red', 'green', 'blue')
+             if histograms.get(name) is not None]
+    grid_cols = 1 if len(names) == 1 else 2
+    grid_rows = -(-len(names) // grid_cols)
+    plot_h, plot_w = panel_size
+    cell_h, cell_w = plot_h + 2 * margin, plot_w + 2 * margin
+    chart = np.full((grid_rows * cell_h, grid_cols * cell_w, 3), 255, dtype=np.uint8)
+
+    labels = []
+    for i, name in enumerate(names):
+        row, col = divmod(i, grid_cols)
+        top, left = row * cell_h + margin, col * cell_w + margin
+        color, title = PANEL_STYLE[name]
+        _draw_bars(chart[top:top + plot_h, left:left + plot_w], np.asarray(histograms[name]), color)
+        # Marco del área de dibujo
+        chart[top - 1, left - 1:left + plot_w + 1] = 0
+        chart[top + plot_h, left - 1:left + plot_w + 1] = 0
+        chart[top - 1:top + plot_h + 1, left - 1] = 0
+        chart[top - 1:top + plot_h + 1, left + plot_w] = 0
+        labels.append((left, top - margin + 6, title))
+        for level in (0, 64, 128, 192, 255):
+            x = left + (level * plot_w) // 256
+            chart[top + plot_h:top + plot_h + 4, x] = 0
+            labels.append((x - 4, top + plot_h + 6, str(level)))
+
+    # Los textos son pocos y pequeños: se dibujan con la fuente de mapa de bits de PIL
+    from PIL import Image, ImageDraw
+    canvas = Image.fromarray(chart)
+    draw = ImageDraw.Draw(canvas)
+    for x, y, text in labels:
+        draw.text((x, y), text, fill=(0, 0, 0), font=_font())
+    return np.asarray(canvas)
@@ -0,0 +1,195 @@
+"""
+Imagen integral (tabla de sumas acumuladas): tras una pasada de construcción, la suma de
+cualquier rectángulo se obtiene con cuatro lecturas, sea cual sea su tamaño.
+"""
+import numpy as np
+
+from .Cache import LRUCache
+from .Dtypes import normalize
+from .Resample import axis_area
+
+# Filas por bloque al construir la tabla (acota los temporales de 64 bits)
+BUILD_ROWS = 256
+
+# Tablas cacheadas por clave de contenido de la imagen (8 bytes por subpíxel y tabla)
+INTEGRAL_CACHE = LRUCache(max_items=8, max_bytes=768 * 1024 * 1024)
+
+
+def accumulator(dtype):
+    """Tipo de la tabla para un tipo de imagen: int64 para enteros y float64 para float."""
+    # int64 es exacto para cualquier imagen entera (y sus cuadrados) de menos de 2^31 píxeles
+    return np.float64 if dtype.kind == 'f' else np.int64
+
+
+class IntegralImage:
+    """
+    Tabla de sumas acumuladas de una imagen, con una fila y una columna de ceros delante:
+    table[y, x] es la suma de los píxeles [0, y) x [0, x). Las consultas aceptan escalares
+    o arrays de rectángulos y devuelven un valor por canal.
+    """
+
+    def __init__(self, image, squares=False, table=None):
+        """
+        :param image: Imagen (H, W) o (H, W, C) uint8, uint16 o float32
+        :param squares: Si es True, también se acumulan los cuadrados (para la desviación típica)
+        :param table: Buffer opcional (H + 1, W + 1[, C]) int64 (float64 si la imagen es
+                      float) donde construir la tabla
+        """
+        image = normalize(image)
+        self.shape = image.shape
+        self.dtype = image.dtype
+        table_dtype = accumulator(image.dtype)
+        shape = (image.shape[0] + 1, image.shape[1] + 1) + image.shape[2:]
+        if table is None:
+            table = np.empty(shape, dtype=table_dtype)
+        elif table.shape != shape or table.dtype != table_dtype:
+            raise ValueError(f"La tabla debe ser {np.dtype(table_dtype)} con forma {shape}")
+        self.table = self._build(image, table, square=False)
+        self.squares = None
+        if squares:
+            self.squares = self._build(image, np.empty(shape, dtype=table_dtype), square=True)
+
+    @staticmethod
+    def _build(image, table, square):
+        table[0] = 0
+        table[:, 0] = 0
+        # Por bloques de filas: prefijos de cada fila y luego acumulado vertical, arrastrando
+        # la última fila del bloque anterior
+        for start in range(0, image.shape[0], BUILD_ROWS):
+            stop = min(image.shape[0], start + BUILD_ROWS)
+            target = table[start + 1:stop + 1, 1:]
+            if square:
+                np.cumsum(np.square(image[start:stop], dtype=table.dtype), axis=1, out=target)
+            else:
+                np.cumsum(image[start:stop], axis=1, dtype=table.dtype, out=target)
+            np.cumsum(target, axis=0, out=target)
+            target += table[start, 1:]
+        return table
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes + (self.squares.nbytes if self.squares is not None else 0)
+
+    def _bounds(self, y1, y2, x1, x2):
+        height, width = self.shape[:2]
+        y1 = np.clip(np.asarray(y1, dtype=np.intp), 0, height)
+        x1 = np.clip(np.asarray(x1, dtype=np.intp), 0, width)
+        y2 = np.clip(np.asarray(y2, dtype=np.intp), y1, height)
+        x2 = np.clip(np.asarray(x2, dtype=np.intp), x1, width)
+        return y1, y2, x1, x2
+
+    @staticmethod
+    def _corners(table, y1, y2, x1, x2):
+        return table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+
+    def _per_channel(self, values):
+        # Añade los ejes de canal para dividir sumas (..., C) entre recuentos (...)
+        return values.reshape(values.shape + (1,) * (len(self.shape) - 2))
+
+    def count(self, y1, y2, x1, x2):
+        """Píxeles de los rectángulos [y1, y2) x [x1, x2) (recortados a la imagen)."""
+        y1, y2, x1, x2 = self._bounds(y1, y2, x1, x2)
+        return (y2 - y1) * (x2 - x1)
+
+    def sum(self, y1, y2, x1, x2):
+        """
+        Suma de los rectángulos [y1, y2) x [x1, x2), recortados a la imagen.
+        :return: Array (..., C) o (...) int64 (float64 si la imagen es float)
+        """
+        return self._corners(self.table, *self._bounds(y1, y2, x1, x2))
+
+    def mean(self, y1, y2, x1, x2):
+        """
+        Media de los rectángulos (NaN si quedan vacíos), en la escala de la imagen.
+        :return: Array float64 (..., C) o (...)
+        """
+        bounds = self._bounds(y1, y2, x1, x2)
+        count = self._per_channel((bounds[1] - bounds[0]) * (bounds[3] - bounds[2]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._corners(self.table, *bounds) / count
+
+    def std(self, y1, y2, x1, x2):
+        """
+        Desviación típica de los rectángulos (requiere `squares=True`).
+        :return: Array float64 (..., C) o (...)
+        """
+        if self.squares is None:
+            raise ValueError("La imagen integral se construyó sin la tabla de cuadrados")
+        bounds = self._bounds(y1, y2, x1, x2)
+        count = self._per_channel((bounds[1] - bounds[0]) * (bounds[3] - bounds[2]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self._corners(self.table, *bounds) / count
+            variance = self._corners(self.squares, *bounds) / count - mean * mean
+        return np.sqrt(np.maximum(variance, 0))
+
+    def window_sums(self, radius_y, radius_x):
+        """
+        Sumas de todas las ventanas (2 * radius_y + 1) x (2 * radius_x + 1) que caben
+        enteras en la imagen (modo 'valid' de una convolución de media).
+        :return: Array (H - 2 * radius_y, W - 2 * radius_x[, C])
+        """
+        table = self.table
+        wy, wx = 2 * radius_y + 1, 2 * radius_x + 1
+        height, width = self.shape[0] - wy + 1, self.shape[1] - wx + 1
+        if height <= 0 or width <= 0:
+            raise ValueError(f"La ventana {wy}x{wx} no cabe en la imagen {self.shape[:2]}")
+        sums = table[wy:, wx:] - table[:height, wx:]
+        sums -= table[wy:, :width]
+        sums += table[:height, :width]
+        return sums
+
+    def resize_area(self, output_shape, region=None):
+        """
+        Reducción por área: cada píxel de salida es la media exacta de su bloque de origen,
+        con el mismo reparto de bloques que `Resample.resize(mode='area')`.
+        :param output_shape: Tamaño de salida (alto, ancho), no mayor que la región
+        :param region: (y1, y2, x1, x2) opcional; por defecto la imagen completa
+        :return: Imagen reducida del tipo de la imagen original
+        """
+        y1, y2, x1, x2 = region if region is not None else (0, self.shape[0], 0, self.shape[1])
+        out_h, out_w = max(1, int(output_shape[0])), max(1, int(output_shape[1]))
+        if out_h > y2 - y1 or out_w > x2 - x1:
+            raise ValueError("La reducción por área no puede ampliar la región")
+        starts_y, sizes_y = axis_area(y2 - y1, out_h)
+        starts_x, sizes_x = axis_area(x2 - x1, out_w)
+        top = (y1 + starts_y)[:, None]
+        left = (x1 + starts_x)[None, :]
+        bottom = top + sizes_y[:, None].astype(np.intp)
+        right = left + sizes_x[None, :].astype(np.intp)
+        sums = self._corners(self.table, top, bottom, left, right)
+        counts = self._per_channel(sizes_y[:, None].astype(sums.dtype) * sizes_x[None, :])
+        if self.dtype.kind == 'f':
+            return (sums / counts).astype(np.float32)
+        # Media redondeada: (suma + n/2) // n
+        sums += counts // 2
+        sums //= counts
+        return sums.astype(self.dtype)
+
+
+def get_integral(image, key=None, squares=False):
+    """
+    Devuelve la imagen integral de una imagen, construyéndola solo la primera vez.
+    :param image: Imagen original
+    :param key: Clave de contenido (por ejemplo, la huella del fichero subido); sin clave
+                la tabla no se cachea
+    :param squares: Si es True, la tabla debe incluir los cuadrados
+    :return: IntegralImage (sus tablas no deben modificarse)
+    """
+    if key is None:
+        return IntegralImage(image, squares=squares)
+    cached = INTEGRAL_CACHE.get(('integral', key))
+    if cached is not None and (cached.squares is not None or not squares):
+        return cached
+    integral = IntegralImage(image, squares=squares)
+    integral.table.flags.writeable = False
+    if integral.squares is not None:
+        integral.squares.flags.writeable = False
+    INTEGRAL_CACHE.put(('integral', key), integral)
+    return integral
+
+
+def cached_integral(key):
+    """Imagen integral ya construida para una clave de contenido, o None (nunca la construye)."""
+    if key is None:
+        return None
+    return INTEGRAL_CACHE.get(('integral', key))
@@ -0,0 +1,343 @@
+"""
+Imagen diferida: las operaciones se registran como un grafo y solo se ejecutan al
+materializar el resultado (al codificarlo), después de reescribir el grafo para que el
+trabajo sea proporcional a lo que se ve.
+
+Reescrituras:
+- Los recortes (y el recorte de un zoom) se adelantan hacia el origen: los filtros por
+  píxel pasan a procesar solo la región, y los de vecindad (desenfoque, enfoque, bordes)
+  la región más el margen de su kernel, con un resultado idéntico.
+- Las reducciones marcadas como aproximadas (miniaturas) y las de vecino más cercano se
+  adelantan a los filtros por píxel, como en la previsualización.
+- Dos negativos seguidos se cancelan y los pasos que no cambian la imagen se eliminan.
+- Los filtros consecutivos se ejecutan con un FilterPipeline, que fusiona los puntuales
+  en una sola LUT.
+"""
+import numpy as np
+
+from .Dtypes import normalize
+from .Integral import cached_integral
+from .Pipeline import FilterPipeline, zoom_arguments
+from .Preview import proxy_shape
+from .Resample import resize
+from .Rotation import rotation_geometry
+from .Zoom import get_pyramid, zoom_region, zoom_window
+
+# Filtros cuyo resultado en un píxel solo depende de ese píxel
+POINTWISE_FILTERS = ('brightness', 'contrast', 'highlight', 'negative', 'rgb', 'cmy', 'binary',
+                     'hue', 'saturation', 'vibrance')
+
+# Filtros que son su propia inversa: dos seguidos se cancelan
+INVOLUTIONS = ('negative',)
+
+
+def _halo(filter_type, params):
+    """
+    Píxeles de vecindad que necesita un filtro a cada lado, o None si el filtro depende
+    de toda la imagen (histogramas, rotación...).
+    """
+    if filter_type == 'binary':
+        method = params['threshold_method']
+        if method == 'adaptive':
+            return max(1, params['adaptive_radius'])
+        return 0 if method == 'manual' else None
+    if filter_type in POINTWISE_FILTERS:
+        return 0
+    if filter_type == 'blur':
+        radius = params['blur_radius']
+        if radius <= 0:
+            return 0
+        if params['blur_mode'] == 'box':
+            return int(radius)
+        # Mismo radio que el kernel de `gaussian_blur`
+        return int(np.ceil(3 * max(round(float(radius), 3), 1e-3)))
+    if filter_type in ('sharpen', 'edges'):
+        return 1
+    return None
+
+
+def tile_halo(steps):
+    """
+    Solapamiento con el que unos pasos se aplican por teselas (`Tiling.TiledProcessor`)
+    con el mismo resultado que sobre la imagen completa: la suma de los de cada paso.
+    :param steps: Pasos normalizados (`FilterPipeline.steps`)
+    :return: Píxeles de halo, o None si algún paso depende de toda la imagen o cambia su forma
+    """
+    total = 0
+    for filter_type, params in steps:
+        halo = _halo(filter_type, params)
+        if halo is None or _output_shape(('filter', filter_type, params), (2, 2, 3)) != (2, 2, 3):
+            return None
+        total += halo
+    return total
+
+
+def _is_identity(filter_type, params):
+    """Indica si el paso devuelve la imagen sin cambios."""
+    if filter_type in ('brightness', 'contrast'):
+        return params[f'{filter_type}_factor'] == 1.0
+    if filter_type == 'highlight':
+        return params['highlight_mode'] not in ('light', 'dark')
+    if filter_type == 'rgb':
+        return params['red'] and params['green'] and params['blue']
+    if filter_type == 'cmy':
+        return params['cyan'] and params['magenta'] and params['yellow']
+    if filter_type == 'rotate':
+        return params['rotation_angle'] % 360 == 0
+    if filter_type == 'blur':
+        return params['blur_radius'] <= 0
+    if filter_type == 'sharpen':
+        return params['sharpen_amount'] == 0
+    if filter_type == 'clahe':
+        return params['clahe_clip'] <= 1
+    return False
+
+
+def _output_shape(op, shape):
+    """Forma que produce una operación del grafo a partir de la forma de su entrada."""
+    kind = op[0]
+    if kind == 'crop':
+        y1, y2, x1, x2 = op[1]
+        return (y2 - y1, x2 - x1) + shape[2:]
+    if kind == 'resize':
+        return tuple(op[1]) + shape[2:]
+    if op[1] == 'rotate':
+        return rotation_geometry(shape, op[2]['rotation_angle'])[0] + shape[2:]
+    if op[1] == 'binary' and op[2]['binary_output'] == 'mask':
+        return shape[:2]
+    return shape
+
+
+def _is_downsample(op, shape):
+    return op[1][0] <= shape[0] and op[1][1] <= shape[1]
+
+
+def _rewrite(ops, shapes):
+    """
+    Aplica una reescritura al plan, si alguna es posible.
+    :param ops: Operaciones desde el origen
+    :param shapes: Forma de la entrada de cada operación
+    :return: Nuevo plan, o None si ya no se puede simplificar
+    """
+    for i, op in enumerate(ops):
+        kind = op[0]
+        if kind == 'filter' and _is_identity(op[1], op[2]):
+            return ops[:i] + ops[i + 1:]
+        if kind == 'crop' and op[1] == (0, shapes[i][0], 0, shapes[i][1]):
+            return ops[:i] + ops[i + 1:]
+        if kind == 'resize' and tuple(op[1]) == shapes[i][:2]:
+            return ops[:i] + ops[i + 1:]
+        if i == 0:
+            continue
+        previous = ops[i - 1]
+        if kind == 'filter' and previous[0] == 'filter' and op[1] == previous[1] \
+                and op[1] in INVOLUTIONS:
+            return ops[:i - 1] + ops[i + 1:]
+        if kind == 'crop' and previous[0] == 'crop':
+            # Recorte de un recorte: un solo recorte en coordenadas de la entrada
+            y1, _, x1, _ = previous[1]
+            a1, a2, b1, b2 = op[1]
+            return ops[:i - 1] + [('crop', (y1 + a1, y1 + a2, x1 + b1, x1 + b2))] + ops[i + 1:]
+        if kind == 'crop' and previous[0] == 'filter':
+            halo = _halo(previous[1], previous[2])
+            if halo is None:
+                continue
+            if halo == 0:
+                return ops[:i - 1] + [op, previous] + ops[i + 1:]
+            # El filtro de vecindad procesa la región ampliada con su margen y se recorta
+            # después; si el margen llega al borde de la imagen, reflejar en el borde del
+            # recorte equivale a reflejar en el de la imagen
+            height, width = shapes[i - 1][:2]
+            y1, y2, x1, x2 = op[1]
+            top, left = max(0, y1 - halo), max(0, x1 - halo)
+            bottom, right = min(height, y2 + halo), min(width, x2 + halo)
+            smaller = (bottom - top) * (right - left) < height * width
+            if smaller and min(bottom - top, right - left) > halo:
+                inner = (y1 - top, y2 - top, x1 - left, x2 - left)
+                return (ops[:i - 1] + [('crop', (top, bottom, left, right)), previous,
+                                       ('crop', inner)] + ops[i + 1:])
+        if kind == 'resize' and previous[0] == 'filter' and _halo(previous[1], previous[2]) == 0 \
+                and (op[3] or op[2] == 'nearest') and _is_downsample(op, shapes[i]):
+            return ops[:i - 1] + [op, previous] + ops[i + 1:]
+    return None
+
+
+class LazyImage:
+    """
+    Nodo de un grafo de operaciones sobre una imagen. Cada operación devuelve un nodo
+    nuevo (los nodos son inmutables y pueden compartir antecesores); nada se calcula
+    hasta `compute`, que memoriza el resultado en el nodo.
+    """
+
+    def __init__(self, parent, op, image=None, key=None):
+        self.parent = parent
+        self.op = op
+        self._image = image
+        self.key = key if parent is None else parent.key
+        self.shape = image.shape if parent is None else _output_shape(op, parent.shape)
+        self._value = None
+
+    @classmethod
+    def source(cls, image, key=None):
+        """
+        :param image: Imagen de origen (no se modifica salvo con compute(inplace=True))
+        :param key: Clave de contenido de la imagen (por ejemplo, la huella del fichero);
+                    permite reutilizar sus estructuras cacheadas (pirámide, histogramas...)
+        :return: LazyImage
+        """
+        return cls(None, ('source',), image=normalize(image), key=key)
+
+    # --- Construcción del grafo -----------------------------------------------------------
+
+    def filter(self, filter_type, params=None):
+        """
+        Añade un filtro con los mismos nombres de parámetros que /process-image/.
+        El zoom se registra como recorte más remuestreo.
+        :return: LazyImage
+        """
+        filter_type, params = FilterPipeline._normalize_step((filter_type, params or {}))
+        if filter_type == 'zoom':
+            x, y, output_shape = zoom_arguments(params, self.shape)
+            return self.zoom(x, y, params['zoom_scale'], output_shape)
+        return LazyImage(self, ('filter', filter_type, params))
+
+    def apply_steps(self, steps):
+        """Añade los pasos de un pipeline (tuplas o diccionarios, como en FilterPipeline)."""
+        node = self
+        for filter_type, params in FilterPipeline(steps).steps:
+            node = node.filter(filter_type, params)
+        return node
+
+    def crop(self, y1, y2, x1, x2):
+        """Recorta la región [y1, y2) x [x1, x2) (recortada a la imagen)."""
+        height, width = self.shape[:2]
+        y1, x1 = min(max(0, int(y1)), height - 1), min(max(0, int(x1)), width - 1)
+        y2, x2 = min(max(y1 + 1, int(y2)), height), min(max(x1 + 1, int(x2)), width)
+        return LazyImage(self, ('crop', (y1, y2, x1, x2)))
+
+    def resize(self, output_shape, mode='auto', approximate=False):
+        """
+        Remuestrea la imagen.
+        :param output_shape: Tamaño de salida (alto, ancho)
+        :param mode: 'auto' (como el zoom: replicación en escalas enteras, bilineal al
+                     ampliar y por áreas al reducir), 'nearest', 'bilinear' o 'area'
+        :param approximate: Si es True, una reducción puede adelantarse a los filtros por
+                            píxel (el filtro se aplica a los píxeles ya promediados)
+        """
+        shape = (max(1, int(output_shape[0])), max(1, int(output_shape[1])))
+        return LazyImage(self, ('resize', shape, mode, approximate))
+
+    def zoom(self, x, y, scale, output_shape=None):
+        """Zoom centrado en (x, y), igual que `ImageFilters.zoom_image`."""
+        region = zoom_window(self.shape, x, y, scale)
+        if region is None:
+            return self
+        return self.crop(*region).resize(output_shape or self.shape[:2])
+
+    def thumbnail(self, max_side):
+        """Miniatura cuyo lado mayor no supera `max_side` (se adelanta a los filtros por píxel)."""
+        return self.resize(proxy_shape(self.shape, max_side), approximate=True)
+
+    # --- Plan y ejecución -----------------------------------------------------------------
+
+    def _chain(self):
+        nodes = []
+        node = self
+        while node.parent is not None and node._value is None:
+            nodes.append(node)
+            node = node.parent
+        return node, nodes[::-1]
+
+    def plan(self):
+        """
+        Operaciones que ejecutará `compute`, ya reescritas.
+        :return: (nodo de partida, lista de operaciones)
+        """
+        start, nodes = self._chain()
+        ops = [node.op for node in nodes]
+        while True:
+            shapes = [start.shape]
+            for op in ops[:-1]:
+                shapes.append(_output_shape(op, shapes[-1]))
+            rewritten = _rewrite(ops, shapes)
+            if rewritten is None:
+                return start, ops
+            ops = rewritten
+
+    def explain(self):
+        """Descripción legible del plan (una operación por línea)."""
+        _, ops = self.plan()
+        lines = []
+        for op in ops:
+            if op[0] == 'filter':
+                lines.append(f"filter {op[1]} {op[2]}")
+            elif op[0] == 'crop':
+                lines.append(f"crop y={op[1][0]}:{op[1][1]} x={op[1][2]}:{op[1][3]}")
+            else:
+                lines.append(f"resize {op[1][0]}x{op[1][1]} {op[2]}")
+        return '\n'.join(lines) or 'source'
+
+    def compute(self, inplace=False):
+        """
+        Materializa la imagen ejecutando el plan reescrito.
+        :param inplace: Si es True, los pasos que conservan la forma pueden escribir sobre
+                        la imagen de origen
+        :return: Array numpy del tipo de la imagen de origen
+        """
+        if self._value is not None:
+            return self._value
+        start, ops = self.plan()
+        source = start._image if start.parent is None else start._value
+        current = source
+        owned = inplace and start.parent is None and current.flags.writeable
+        # Las cachés por imagen (pirámide, histogramas) solo valen sobre el origen intacto
+        pristine = start.parent is None
+        steps = []
+
+        def run_steps(current, owned):
+            pipeline = FilterPipeline(steps, source_key=self.key if pristine else None)
+            result = pipeline.apply(current, inplace=owned)
+            return result, (owned or result is not current) and result.flags.writeable
+
+        i = 0
+        while i < len(ops):
+            op = ops[i]
+            if op[0] == 'filter':
+                steps.append((op[1], op[2]))
+                i += 1
+                continue
+            if steps:
+                current, owned = run_steps(current, owned)
+                steps, pristine = [], False
+            if op[0] == 'crop':
+                y1, y2, x1, x2 = op[1]
+                following = ops[i + 1] if i + 1 < len(ops) else None
+                if following is not None and following[0] == 'resize' and following[2] == 'auto':
+                    # Recorte + remuestreo (un zoom): si se parte del origen intacto, la región
+                    # se lee de su imagen integral o de su pirámide, como en `zoom_image`
+                    integral = cached_integral(self.key) if pristine else None
+                    pyramid = None
+                    if pristine and self.key is not None and integral is None:
+                        pyramid = get_pyramid(current, self.key)
+                    current = zoom_region(current, op[1], following[1], pyramid=pyramid,
+                                          integral=integral)
+                    owned, i = True, i + 2
+                else:
+                    # Una vista: los pasos siguientes leen solo la región, sin copiarla
+                    current = current[y1:y2, x1:x2]
+                    i += 1
+            else:
+                shape, mode = op[1], op[2]
+                if mode == 'auto':
+                    current = zoom_region(current, (0, current.shape[0], 0, current.shape[1]), shape)
+                else:
+                    current = resize(current, shape, mode=mode)
+                owned, i = True, i + 1
+            pristine = False
+        if steps:
+            current, owned = run_steps(current, owned)
+
+        if current is source and not inplace:
+            current = current.copy()
+        self._value = current
+        return current
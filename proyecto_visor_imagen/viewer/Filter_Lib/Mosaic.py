@@ -0,0 +1,81 @@
+import numpy as np
+
+from .Dtypes import convert, widest
+from .Resample import resize
+
+
+def frame_color_rgb(color, dtype=np.uint8):
+    """
+    Convierte un nombre o código de color de matplotlib a RGB.
+    :param color: Color ('red', 'black', '#ff8800', ...)
+    :param dtype: Tipo del lienzo (uint8, uint16 o float32)
+    :return: Array de 3 valores del tipo pedido
+    """
+    # matplotlib.colors no arrastra pyplot ni ningún backend gráfico
+    from matplotlib.colors import to_rgb
+    rgb = (np.array(to_rgb(color)) * 255).astype(np.uint8)
+    return convert(rgb, dtype)
+
+
+def _tile_shape(tile_size):
+    if isinstance(tile_size, (tuple, list)):
+        return int(tile_size[0]), int(tile_size[1])
+    return int(tile_size), int(tile_size)
+
+
+def _as_rgb(image, dtype):
+    """Vista RGB de la imagen en el tipo del lienzo: difunde la escala de grises y descarta el alfa."""
+    image = convert(image, dtype)
+    if image.ndim == 2:
+        return image[..., None]
+    return image[..., :3]
+
+
+def mosaic_shape(rows, cols, tile_size=300, gutter=9):
+    """
+    Tamaño del lienzo de un mosaico.
+    :return: (alto, ancho, 3)
+    """
+    tile_h, tile_w = _tile_shape(tile_size)
+    return (rows * tile_h + (rows + 1) * gutter, cols * tile_w + (cols + 1) * gutter, 3)
+
+
+def build_mosaic(images, rows=2, cols=2, tile_size=300, gutter=9, color='red',
+                 mode='nearest', out=None):
+    """
+    Compone una rejilla de rows x cols imágenes separadas por un marco de color.
+    :param images: Lista de imágenes (H, W), (H, W, 3) o (H, W, 4) en orden de filas;
+                   las celdas sin imagen quedan del color del marco
+    :param rows: Número de filas de la rejilla
+    :param cols: Número de columnas de la rejilla
+    :param tile_size: Lado de cada celda en píxeles, o tupla (alto, ancho)
+    :param gutter: Grosor del marco en píxeles
+    :param color: Color del marco
+    :param mode: Remuestreo de cada celda: 'nearest', 'bilinear' o 'area'
+    :param out: Array opcional con la forma de `mosaic_shape` donde escribir el mosaico
+    :return: Mosaico RGB con el tipo más preciso de las imágenes (uint8, uint16 o float32)
+    """
+    rows, cols, gutter = int(rows), int(cols), max(0, int(gutter))
+    if rows < 1 or cols < 1:
+        raise ValueError("El mosaico necesita al menos una fila y una columna")
+    if len(images) > rows * cols:
+        raise ValueError(f"Se recibieron {len(images)} imágenes para {rows * cols} celdas")
+
+    tile_h, tile_w = _tile_shape(tile_size)
+    shape = mosaic_shape(rows, cols, (tile_h, tile_w), gutter)
+    dtype = widest(*(image.dtype for image in images)) if images else np.dtype(np.uint8)
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape or out.dtype != dtype:
+        raise ValueError(f"El buffer del mosaico debe ser {dtype} con forma {shape}")
+
+    # Todo el lienzo toma el color del marco; las celdas se sobrescriben después
+    out[...] = frame_color_rgb(color, dtype)
+
+    for i, image in enumerate(images):
+        row, col = divmod(i, cols)
+        y = row * (tile_h + gutter) + gutter
+        x = col * (tile_w + gutter) + gutter
+        # El remuestreo escribe directamente en la celda del lienzo
+        resize(_as_rgb(image, dtype), (tile_h, tile_w), mode=mode, out=out[y:y + tile_h, x:x + tile_w])
+    return out
@@ -0,0 +1,104 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuración por defecto: un hilo por núcleo y bandas de al menos 1 Mi subpíxeles
+# (por debajo de eso el reparto cuesta más de lo que se gana)
+DEFAULT_MIN_BAND_SIZE = 1 << 20
+
+_config = {
+    'workers': os.cpu_count() or 1,
+    'min_band_size': DEFAULT_MIN_BAND_SIZE,
+}
+_executor = None
+_executor_lock = threading.Lock()
+# Marca los hilos del pool: una llamada anidada se ejecuta en serie para no bloquear
+# el pool esperando tareas que no tienen hilo libre
+_local = threading.local()
+
+
+def configure(workers=None, min_band_size=None):
+    """
+    Ajusta el pool compartido de hilos.
+    :param workers: Número de hilos (1 desactiva el paralelismo; None deja el actual)
+    :param min_band_size: Subpíxeles mínimos por banda (None deja el actual)
+    """
+    global _executor
+    with _executor_lock:
+        if min_band_size is not None:
+            _config['min_band_size'] = max(1, int(min_band_size))
+        if workers is not None and int(workers) != _config['workers']:
+            _config['workers'] = max(1, int(workers))
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+
+
+def settings():
+    """Configuración actual del pool (workers, min_band_size)."""
+    return dict(_config)
+
+
+def get_executor():
+    """Devuelve el ThreadPoolExecutor compartido, creándolo la primera vez."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_config['workers'], thread_name_prefix='filters',
+                initializer=_mark_worker,
+            )
+        return _executor
+
+
+def _mark_worker():
+    _local.in_worker = True
+
+
+def band_ranges(length, unit_size=1, workers=None, min_band_size=None):
+    """
+    Divide [0, length) en bandas contiguas de tamaño parecido.
+    :param length: Número de unidades a repartir (filas o subpíxeles)
+    :param unit_size: Subpíxeles por unidad (por ejemplo, el tamaño de una fila)
+    :param workers: Máximo de bandas (por defecto, los hilos configurados)
+    :param min_band_size: Subpíxeles mínimos por banda (por defecto, el configurado)
+    :return: Lista de tuplas (inicio, fin)
+    """
+    workers = _config['workers'] if workers is None else workers
+    min_band_size = _config['min_band_size'] if min_band_size is None else min_band_size
+    count = min(workers, length, max(1, (length * unit_size) // max(1, min_band_size)))
+    count = max(1, count)
+    edges = [(length * i) // count for i in range(count + 1)]
+    return [(edges[i], edges[i + 1]) for i in range(count) if edges[i] < edges[i + 1]]
+
+
+def run_in_bands(func, length, unit_size=1, workers=None, min_band_size=None):
+    """
+    Ejecuta func(inicio, fin) sobre bandas de [0, length) en el pool compartido.
+
+    Cada banda debe escribir en una zona distinta de la salida. NumPy libera el GIL en
+    los kernels elemento a elemento y en `take`, así que las bandas corren en paralelo.
+    Si solo hay una banda, o la llamada viene de un hilo del pool, se ejecuta en serie.
+    :param func: Función (inicio, fin) -> None
+    :param length: Número de unidades a repartir (filas o subpíxeles)
+    :param unit_size: Subpíxeles por unidad
+    :param workers: Máximo de bandas (por defecto, los hilos configurados)
+    :param min_band_size: Subpíxeles mínimos por banda (por defecto, el configurado)
+    """
+    if getattr(_local, 'in_worker', False):
+        func(0, length)
+        return
+    bands = band_ranges(length, unit_size, workers, min_band_size)
+    if len(bands) <= 1:
+        for start, stop in bands:
+            func(start, stop)
+        return
+
+    executor = get_executor()
+    # La primera banda la procesa el hilo que llama mientras el pool hace el resto
+    futures = [executor.submit(func, start, stop) for start, stop in bands[1:]]
+    try:
+        func(*bands[0])
+    finally:
+        for future in futures:
+            future.result()
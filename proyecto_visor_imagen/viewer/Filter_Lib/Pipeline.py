@@ -0,0 +1,302 @@
+import json
+
+import numpy as np
+
+from .Dtypes import is_float, lut_size, normalize, white
+from .Filters import ImageFilters
+
+
+def _as_bool(value):
+    """Interpreta los valores booleanos que llegan desde formularios o JSON."""
+    if isinstance(value, str):
+        return value.strip().lower() == 'true'
+    return bool(value)
+
+
+def _optional_int(value):
+    return None if value in (None, '') else int(float(value))
+
+
+# Parámetros que acepta cada filtro: (clave, conversor, valor por defecto).
+# Las claves coinciden con los campos que envía el editor a /process-image/.
+FILTER_PARAMS = {
+    'brightness': (('brightness_factor', float, 1.0),),
+    'contrast': (('contrast_factor', float, 1.0),),
+    'rotate': (('rotation_angle', float, 0.0),),
+    'highlight': (('highlight_mode', str, 'light'),),
+    'rgb': (('red', _as_bool, True), ('green', _as_bool, True), ('blue', _as_bool, True)),
+    'cmy': (('cyan', _as_bool, True), ('magenta', _as_bool, True), ('yellow', _as_bool, True)),
+    'negative': (),
+    'zoom': (('zoom_x', _optional_int, None), ('zoom_y', _optional_int, None),
+             ('zoom_scale', float, 2.0), ('zoom_width', _optional_int, None),
+             ('zoom_height', _optional_int, None)),
+    'binary': (('threshold', int, 128), ('threshold_method', str, 'manual'),
+               ('threshold_classes', int, 2), ('adaptive_radius', int, 15),
+               ('adaptive_offset', float, 5.0), ('binary_output', str, 'image')),
+    'hue': (('hue_shift', float, 0.0),),
+    'saturation': (('saturation_factor', float, 1.0),),
+    'vibrance': (('vibrance_amount', float, 0.0),),
+    'blur': (('blur_radius', float, 2.0), ('blur_mode', str, 'gaussian')),
+    'sharpen': (('sharpen_amount', float, 1.0),),
+    'edges': (('edge_operator', str, 'sobel'),),
+    'auto_levels': (('levels_clip', float, 0.5), ('levels_per_channel', _as_bool, False)),
+    'equalize': (),
+    'clahe': (('clahe_clip', float, 2.0), ('clahe_tiles', int, 8)),
+}
+
+
+# Parámetros expresados en píxeles de la imagen: se escalan al aplicar el pipeline sobre
+# una versión reducida (previsualización)
+COORDINATE_PARAMS = {
+    'zoom': ('zoom_x', 'zoom_y', 'zoom_width', 'zoom_height'),
+    'blur': ('blur_radius',),
+    'binary': ('adaptive_radius',),
+}
+
+
+def zoom_arguments(params, shape):
+    """
+    Centro y tamaño de salida de un paso de zoom sobre una imagen de la forma dada.
+    :param params: Parámetros normalizados del paso
+    :param shape: Forma de la imagen que recibe el paso
+    :return: (x, y, (alto, ancho) de salida o None para conservar el de la imagen)
+    """
+    x = params['zoom_x'] if params['zoom_x'] is not None else shape[1] // 2
+    y = params['zoom_y'] if params['zoom_y'] is not None else shape[0] // 2
+    output_shape = None
+    if params['zoom_width'] or params['zoom_height']:
+        # Si solo se pide una dimensión, la otra conserva la proporción de la imagen
+        height, width = shape[:2]
+        out_w = params['zoom_width'] or max(1, round(params['zoom_height'] * width / height))
+        out_h = params['zoom_height'] or max(1, round(params['zoom_width'] * height / width))
+        output_shape = (out_h, out_w)
+    return x, y, output_shape
+
+
+class FilterPipeline:
+    """
+    Secuencia ordenada de filtros que se aplica con el menor número posible de pasadas.
+
+    Las operaciones puntuales (brillo, contraste, resaltado, negativo, umbral) y las
+    máscaras de canal (RGB/CMY) consecutivas se combinan en una LUT por canal, de modo
+    que "brillo + contraste + rgb + negativo" recorre los píxeles una sola vez y escribe
+    en un único buffer de salida. Las LUT tienen 256 entradas para uint8 y 65536 para
+    uint16; las imágenes float32 aplican cada paso puntual por separado.
+    """
+
+    def __init__(self, steps, source_key=None):
+        """
+        :param steps: Lista de pasos. Cada paso puede ser una tupla (filtro, parámetros)
+                      o un diccionario {'type': filtro, ...parámetros} con los mismos
+                      nombres de campo que usa /process-image/
+        :param source_key: Clave de contenido de la imagen de entrada (por ejemplo, la huella
+                           del fichero subido). Permite reutilizar estructuras cacheadas por
+                           imagen, como la pirámide del zoom
+        """
+        self.steps = [self._normalize_step(step) for step in steps]
+        self.source_key = source_key
+
+    def scaled(self, factor, source_key=None):
+        """
+        Copia del pipeline para aplicarlo a la imagen escalada por `factor`
+        (las coordenadas y tamaños en píxeles se ajustan a la nueva resolución).
+        :param factor: Escala de la imagen destino respecto a la original
+        :param source_key: Clave de contenido de la imagen escalada
+        :return: Nuevo FilterPipeline
+        """
+        steps = []
+        for filter_type, params in self.steps:
+            params = dict(params)
+            for key in COORDINATE_PARAMS.get(filter_type, ()):
+                # Las coordenadas enteras se redondean; los radios (float) se escalan tal cual
+                if isinstance(params[key], int):
+                    params[key] = round(params[key] * factor)
+                elif params[key] is not None:
+                    params[key] = params[key] * factor
+            steps.append((filter_type, params))
+        return FilterPipeline(steps, source_key=source_key)
+
+    def signature(self):
+        """
+        Forma canónica de los pasos (tipos y parámetros ya convertidos): dos peticiones con
+        el mismo resultado tienen la misma firma aunque sus campos se escriban distinto
+        ('1.20' y '1.2', 'on' y 'true', campos que el filtro no usa...).
+        :return: Cadena JSON
+        """
+        return json.dumps([[filter_type, params] for filter_type, params in self.steps],
+                          sort_keys=True, default=str)
+
+    def lazy(self, image):
+        """
+        Grafo diferido con los pasos del pipeline sobre la imagen (ver `Lazy.LazyImage`):
+        se calcula con `compute()` y solo procesa la parte de la imagen que llega a la salida.
+        :param image: Imagen de entrada
+        :return: LazyImage
+        """
+        from .Lazy import LazyImage
+        return LazyImage.source(image, key=self.source_key).apply_steps(self.steps)
+
+    @staticmethod
+    def _normalize_step(step):
+        if isinstance(step, dict):
+            params = dict(step.get('params') or {})
+            params.update({k: v for k, v in step.items() if k not in ('type', 'params')})
+            filter_type = step.get('type')
+        else:
+            filter_type, params = step
+        if filter_type not in FILTER_PARAMS:
+            raise ValueError(f"Filtro desconocido en el pipeline: {filter_type}")
+
+        values = {}
+        for key, convert, default in FILTER_PARAMS[filter_type]:
+            raw = params.get(key, default)
+            values[key] = raw if raw is None else convert(raw)
+        return filter_type, values
+
+    @staticmethod
+    def _is_fusable(filter_type, image, params):
+        """Indica si el filtro puede expresarse como LUT por canal sobre esta imagen."""
+        if is_float(image.dtype):
+            return False
+        if filter_type in ('brightness', 'contrast', 'highlight', 'negative', 'rgb', 'cmy'):
+            return True
+        # El umbral sobre RGB necesita la luminancia, que mezcla canales; Otsu y el umbral
+        # adaptativo dependen del histograma o de la vecindad
+        if filter_type == 'binary':
+            return (params['threshold_method'] == 'manual' and params['binary_output'] == 'image'
+                    and not (image.ndim == 3 and image.shape[2] == 3))
+        return False
+
+    @staticmethod
+    def _compose_step(luts, filter_type, params):
+        """Compone el paso sobre las LUT por canal acumuladas (modificándolas in situ)."""
+        dtype = luts.dtype
+        if filter_type == 'brightness':
+            luts[:] = ImageFilters.build_lut('brightness', dtype, factor=params['brightness_factor'])[luts]
+        elif filter_type == 'contrast':
+            luts[:] = ImageFilters.build_lut('contrast', dtype, factor=params['contrast_factor'])[luts]
+        elif filter_type == 'highlight':
+            if params['highlight_mode'] in ('light', 'dark'):
+                luts[:] = ImageFilters.build_lut('highlight', dtype, mode=params['highlight_mode'])[luts]
+        elif filter_type == 'negative':
+            luts[:] = ImageFilters.build_lut('negative', dtype)[luts]
+        elif filter_type == 'binary':
+            luts[:] = ImageFilters.build_lut('binary', dtype, threshold=float(params['threshold']))[luts]
+        elif filter_type in ('rgb', 'cmy') and len(luts) >= 3:
+            # Un canal desactivado pasa a ser constante: 0 en RGB, blanco en CMY
+            keys = ('red', 'green', 'blue') if filter_type == 'rgb' else ('cyan', 'magenta', 'yellow')
+            fill = 0 if filter_type == 'rgb' else white(dtype)
+            for channel, key in enumerate(keys):
+                if not params[key]:
+                    luts[channel] = fill
+
+    @staticmethod
+    def _apply_step(image, filter_type, params, inplace=False, source_key=None):
+        """
+        Aplica un filtro que no se puede fusionar (cambia la geometría, mezcla canales o la
+        imagen es float32).
+        Con inplace=True, los filtros que conservan la forma escriben sobre `image`.
+        `source_key` solo se indica cuando `image` es todavía la imagen de entrada sin modificar.
+        """
+        if filter_type == 'brightness':
+            return ImageFilters.adjust_brightness(image, params['brightness_factor'], inplace=inplace)
+        if filter_type == 'contrast':
+            return ImageFilters.adjust_contrast(image, params['contrast_factor'], inplace=inplace)
+        if filter_type == 'highlight':
+            return ImageFilters.highlight_zones(image, params['highlight_mode'], inplace=inplace)
+        if filter_type == 'negative':
+            return ImageFilters.negative_image(image, inplace=inplace)
+        if filter_type == 'rgb':
+            return ImageFilters.apply_rgb_filter(image, params['red'], params['green'],
+                                                 params['blue'], inplace=inplace)
+        if filter_type == 'cmy':
+            return ImageFilters.apply_cmy_filter(image, params['cyan'], params['magenta'],
+                                                 params['yellow'], inplace=inplace)
+        if filter_type == 'rotate':
+            return ImageFilters.rotate_image(image, params['rotation_angle'])
+        if filter_type == 'zoom':
+            x, y, output_shape = zoom_arguments(params, image.shape)
+            if output_shape is not None:
+                inplace = inplace and output_shape == image.shape[:2]
+            return ImageFilters.zoom_image(image, x, y, params['zoom_scale'], inplace=inplace,
+                                           output_shape=output_shape, pyramid_key=source_key)
+        if filter_type == 'binary':
+            # Con binary_output='mask' el resultado es de un solo canal (H, W)
+            return ImageFilters.binarize_image(
+                image, params['threshold'], inplace=inplace, method=params['threshold_method'],
+                classes=params['threshold_classes'], radius=max(1, params['adaptive_radius']),
+                offset=params['adaptive_offset'], output=params['binary_output'], key=source_key
+            )
+        if filter_type == 'hue':
+            return ImageFilters.adjust_hue(image, params['hue_shift'], inplace=inplace)
+        if filter_type == 'saturation':
+            return ImageFilters.adjust_saturation(image, params['saturation_factor'], inplace=inplace)
+        if filter_type == 'vibrance':
+            return ImageFilters.adjust_vibrance(image, params['vibrance_amount'], inplace=inplace)
+        if filter_type == 'blur':
+            return ImageFilters.blur_image(image, params['blur_radius'], params['blur_mode'],
+                                           inplace=inplace)
+        if filter_type == 'sharpen':
+            return ImageFilters.sharpen_image(image, params['sharpen_amount'], inplace=inplace)
+        if filter_type == 'edges':
+            return ImageFilters.detect_edges(image, params['edge_operator'], inplace=inplace)
+        # Las curvas dependen del histograma de la imagen actual: no se pueden fusionar
+        # con las LUT anteriores, pero sí reutilizan el histograma de la imagen de entrada
+        if filter_type == 'auto_levels':
+            return ImageFilters.auto_levels(image, params['levels_clip'], params['levels_per_channel'],
+                                            inplace=inplace, key=source_key)
+        if filter_type == 'equalize':
+            return ImageFilters.equalize_histogram(image, inplace=inplace, key=source_key)
+        if filter_type == 'clahe':
+            return ImageFilters.clahe(image, params['clahe_clip'], params['clahe_tiles'],
+                                      inplace=inplace)
+        raise ValueError(f"Filtro no soportado: {filter_type}")
+
+    def apply(self, image, inplace=False):
+        """
+        Aplica el pipeline completo a la imagen.
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W), uint8, uint16 o
+                      float32 (otros tipos se convierten una vez al principio)
+        :param inplace: Si es True, los tramos fusionados escriben directamente sobre `image`
+        :return: Imagen resultante (del tipo de la imagen)
+        """
+        current = normalize(image)
+        # `owned` indica si `current` es un buffer que podemos reutilizar como salida
+        owned = current is not image or (inplace and image.flags.writeable)
+        luts = None
+        # Las cachés por imagen solo valen mientras `current` sea la entrada original
+        pristine = True
+
+        def flush(current, owned, luts):
+            if luts is None:
+                return current, owned
+            out = current if owned else None
+            if luts.shape[0] == 1:
+                result = ImageFilters.apply_lut(current, luts[0], out=out)
+            else:
+                result = ImageFilters.apply_channel_luts(current, luts, out=out)
+            return result, True
+
+        for filter_type, params in self.steps:
+            if self._is_fusable(filter_type, current, params):
+                if luts is None:
+                    channels = current.shape[2] if current.ndim == 3 else 1
+                    size = lut_size(current.dtype)
+                    luts = np.tile(np.arange(size, dtype=current.dtype), (channels, 1))
+                self._compose_step(luts, filter_type, params)
+            else:
+                if luts is not None:
+                    current, owned = flush(current, owned, luts)
+                    luts = None
+                    pristine = False
+                source_key = self.source_key if pristine else None
+                result = self._apply_step(current, filter_type, params, inplace=owned,
+                                          source_key=source_key)
+                pristine = False
+                # Si el filtro devolvió su entrada intacta, el dueño no cambia; las vistas de
+                # solo lectura (binarize_image con output='view') nunca se reutilizan como salida
+                owned = (owned or result is not current) and result.flags.writeable
+                current = result
+
+        current, owned = flush(current, owned, luts)
+        return current
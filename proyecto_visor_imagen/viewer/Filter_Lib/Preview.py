@@ -0,0 +1,61 @@
+import numpy as np
+
+from .Cache import LRUCache
+from .Resample import resize
+
+# Lado máximo por defecto de la versión reducida que se usa mientras se mueve un control
+PREVIEW_MAX_SIDE = 1280
+PREVIEW_MIN_SIDE = 64
+
+# Versiones reducidas por (clave de contenido de la imagen, lado máximo)
+PROXY_CACHE = LRUCache(max_items=32, max_bytes=128 * 1024 * 1024)
+
+
+def clamp_side(max_side):
+    """Limita el lado pedido por el cliente al rango admitido para previsualizaciones."""
+    try:
+        max_side = int(float(max_side))
+    except (TypeError, ValueError):
+        return PREVIEW_MAX_SIDE
+    return min(PREVIEW_MAX_SIDE, max(PREVIEW_MIN_SIDE, max_side))
+
+
+def proxy_shape(shape, max_side=PREVIEW_MAX_SIDE):
+    """
+    Tamaño de la versión reducida de una imagen, conservando la proporción.
+    :return: (alto, ancho)
+    """
+    height, width = shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    return max(1, round(height * scale)), max(1, round(width * scale))
+
+
+def make_proxy(image, max_side=PREVIEW_MAX_SIDE):
+    """
+    Reduce la imagen (promediando por áreas) para que su lado mayor no supere `max_side`.
+    :return: Imagen reducida, o la propia imagen si ya es suficientemente pequeña
+    """
+    shape = proxy_shape(image.shape, max_side)
+    if shape == image.shape[:2]:
+        return image
+    return resize(image, shape, mode='area')
+
+
+def get_proxy(key, max_side, loader):
+    """
+    Devuelve la versión reducida de una imagen, creándola solo la primera vez.
+    :param key: Clave de contenido de la imagen original (por ejemplo, la huella del fichero)
+    :param max_side: Lado máximo de la versión reducida
+    :param loader: Función sin argumentos que devuelve la imagen original; solo se llama
+                   si la versión reducida no está en caché (evita decodificar el fichero)
+    :return: Tupla (imagen reducida de solo lectura, escala respecto a la original)
+    """
+    def build():
+        image = loader()
+        proxy = np.ascontiguousarray(make_proxy(image, max_side))
+        if proxy is image:
+            proxy = image.copy()
+        proxy.flags.writeable = False
+        return proxy, proxy.shape[1] / image.shape[1]
+
+    return PROXY_CACHE.get_or_create(('proxy', key, max_side), build)
@@ -0,0 +1,224 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .Dtypes import WHITE, WORK_DTYPES, normalize
+
+# Precisión de los pesos de interpolación en punto fijo (8 bits: pesos de 0 a 256)
+WEIGHT_BITS = 8
+WEIGHT_ONE = 1 << WEIGHT_BITS
+
+RESAMPLE_MODES = ('nearest', 'bilinear', 'area')
+
+
+def _readonly(*arrays):
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays if len(arrays) > 1 else arrays[0]
+
+
+@lru_cache(maxsize=512)
+def axis_nearest(src_len, dst_len):
+    """
+    Índices de origen para un eje redimensionado por vecino más cercano.
+    :return: Array intp de longitud dst_len (solo lectura)
+    """
+    index = (np.arange(dst_len, dtype=np.int64) * src_len) // dst_len
+    return _readonly(np.minimum(index, src_len - 1).astype(np.intp))
+
+
+@lru_cache(maxsize=512)
+def axis_bilinear(src_len, dst_len):
+    """
+    Índices y pesos en punto fijo para un eje redimensionado con interpolación lineal.
+    :return: (índices inferiores, índices superiores, pesos uint16 del superior en [0, 256])
+    """
+    coords = (np.arange(dst_len, dtype=np.float64) + 0.5) * (src_len / dst_len) - 0.5
+    coords = np.clip(coords, 0, src_len - 1)
+    lower = np.floor(coords).astype(np.intp)
+    upper = np.minimum(lower + 1, src_len - 1)
+    weights = np.rint((coords - lower) * WEIGHT_ONE).astype(np.uint16)
+    return _readonly(lower, upper, weights)
+
+
+@lru_cache(maxsize=512)
+def axis_area(src_len, dst_len):
+    """
+    Límites de los bloques de origen que promedia cada píxel de salida (reducción por área).
+    :return: (inicios intp, tamaños de bloque uint32)
+    """
+    starts = (np.arange(dst_len, dtype=np.int64) * src_len) // dst_len
+    ends = (np.arange(1, dst_len + 1, dtype=np.int64) * src_len) // dst_len
+    ends = np.maximum(ends, starts + 1)
+    return _readonly(starts.astype(np.intp), (ends - starts).astype(np.uint32))
+
+
+def _resize_nearest(image, out_h, out_w):
+    rows = axis_nearest(image.shape[0], out_h)
+    cols = axis_nearest(image.shape[1], out_w)
+    # Una sola indexación combinada: cada píxel de salida se lee una vez
+    return image[rows[:, None], cols]
+
+
+def _resize_bilinear(image, out_h, out_w):
+    top, bottom, wy = axis_bilinear(image.shape[0], out_h)
+    left, right, wx = axis_bilinear(image.shape[1], out_w)
+    extra = (None,) * (image.ndim - 2)
+    wy = wy[(slice(None), None) + extra]
+    wx = wx[(slice(None),) + extra]
+
+    work = WORK_DTYPES.get(image.dtype)
+    if work is None:
+        # float32: los mismos pesos, sin escalas ni redondeos
+        wy = wy.astype(np.float32) / WEIGHT_ONE
+        wx = wx.astype(np.float32) / WEIGHT_ONE
+        rows = image[top] * (1 - wy)
+        rows += image[bottom] * wy
+        result = rows[:, left] * (1 - wx)
+        result += rows[:, right] * wx
+        return result
+
+    # Pasada vertical: resultado escalado por 256, cabe en el tipo de trabajo
+    # (255 * 256 = 65280 en uint16 para 8 bits, 65535 * 256 en uint32 para 16 bits)
+    wy = wy.astype(work)
+    rows = image[top].astype(work) * (WEIGHT_ONE - wy)
+    rows += image[bottom].astype(work) * wy
+
+    # Pasada horizontal con el doble de ancho y redondeo al volver al tipo original
+    wide = np.uint32 if image.dtype == np.uint8 else np.uint64
+    wx = wx.astype(wide)
+    result = rows[:, left].astype(wide) * (WEIGHT_ONE - wx)
+    result += rows[:, right].astype(wide) * wx
+    result += 1 << (2 * WEIGHT_BITS - 1)
+    result >>= 2 * WEIGHT_BITS
+    return result.astype(image.dtype)
+
+
+def _sum_dtype(dtype):
+    # uint32 basta para bloques de hasta 2^24 píxeles de 8 bits; 16 bits acumula en uint64
+    if dtype == np.uint8:
+        return np.uint32
+    return np.uint64 if dtype.kind in 'ui' else np.float64
+
+
+def _reduce_area(values, src_len, dst_len, axis, dtype):
+    """Suma por bloques en un eje (o vecino más cercano si el eje se amplía)."""
+    if dst_len >= src_len:
+        values = values.take(axis_nearest(src_len, dst_len), axis=axis)
+        return values.astype(dtype, copy=False), 1
+    starts, sizes = axis_area(src_len, dst_len)
+    sums = np.add.reduceat(values, starts, axis=axis, dtype=dtype)
+    shape = [1] * values.ndim
+    shape[axis] = dst_len
+    return sums, sizes.reshape(shape)
+
+
+def _resize_area(image, out_h, out_w):
+    # reduceat acumula directamente en el tipo ancho, sin copia ancha de la imagen completa
+    dtype = _sum_dtype(image.dtype)
+    sums, count_y = _reduce_area(image, image.shape[0], out_h, 0, dtype)
+    sums, count_x = _reduce_area(sums, image.shape[1], out_w, 1, dtype)
+    # Los ejes que se amplían cuentan 1 (un entero, no un array)
+    counts = np.asarray(count_y * count_x, dtype=dtype)
+    if image.dtype.kind == 'f':
+        sums /= counts
+        return sums.astype(np.float32)
+    # Media redondeada: (suma + n/2) // n
+    sums += counts // 2
+    sums //= counts
+    return sums.astype(image.dtype)
+
+
+def axis_area_weights(src_len, start, stop, dst_len):
+    """
+    Pesos de la reducción por área exacta del tramo [start, stop) de un eje, con extremos
+    fraccionarios: cada píxel de salida promedia los de origen que cubre, cada uno con el
+    peso de la fracción que cae dentro (sin el reparto en bloques enteros de `axis_area`).
+    :param src_len: Longitud del eje de origen
+    :param start: Inicio del tramo en píxeles de origen
+    :param stop: Final del tramo en píxeles de origen
+    :param dst_len: Longitud de salida
+    :return: (índices intp (dst_len, taps), pesos float32 (dst_len, taps) que suman 1)
+    """
+    step = (stop - start) / dst_len
+    lower = start + np.arange(dst_len, dtype=np.float64) * step
+    upper = lower + step
+    taps = int(np.ceil(step)) + 1
+    index = np.floor(lower).astype(np.intp)[:, None] + np.arange(taps)
+    weights = np.minimum(upper[:, None], index + 1) - np.maximum(lower[:, None], index)
+    weights = np.clip(weights, 0, None) / step
+    return np.clip(index, 0, src_len - 1), weights.astype(np.float32)
+
+
+def resize_area_region(image, output_shape, region=None, out=None):
+    """
+    Reduce por área exacta una región con extremos fraccionarios (por ejemplo, la de la
+    imagen original llevada a un nivel de la pirámide), en float32 y redondeando al tipo
+    de la imagen al final.
+    :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+    :param output_shape: Tamaño de salida (alto, ancho)
+    :param region: (y1, y2, x1, x2) en píxeles de la imagen (admite fracciones); por
+                   defecto la imagen completa
+    :param out: Array opcional donde escribir el resultado
+    :return: Región reducida (del tipo de la entrada)
+    """
+    image = normalize(image)
+    out_h, out_w = max(1, int(output_shape[0])), max(1, int(output_shape[1]))
+    y1, y2, x1, x2 = region if region is not None else (0, image.shape[0], 0, image.shape[1])
+    rows, wy = axis_area_weights(image.shape[0], y1, y2, out_h)
+    cols, wx = axis_area_weights(image.shape[1], x1, x2, out_w)
+    extra = (None,) * (image.ndim - 2)
+
+    # Pasada vertical solo sobre las columnas que usa la horizontal
+    left, right = int(cols.min()), int(cols.max()) + 1
+    band = image[:, left:right]
+    partial = np.zeros((out_h, right - left) + image.shape[2:], dtype=np.float32)
+    for tap in range(rows.shape[1]):
+        partial += wy[(slice(None), tap, None) + extra] * band[rows[:, tap]]
+
+    result = np.zeros((out_h, out_w) + image.shape[2:], dtype=np.float32)
+    cols = cols - left
+    for tap in range(cols.shape[1]):
+        result += wx[(None, slice(None), tap) + extra] * partial[:, cols[:, tap]]
+
+    if image.dtype.kind != 'f':
+        np.rint(result, out=result)
+        np.clip(result, 0, WHITE[image.dtype], out=result)
+    if out is None:
+        return result.astype(image.dtype, copy=False)
+    out[...] = result
+    return out
+
+
+_RESIZERS = {
+    'nearest': _resize_nearest,
+    'bilinear': _resize_bilinear,
+    'area': _resize_area,
+}
+
+
+def resize(image, output_shape, mode='bilinear', out=None):
+    """
+    Redimensiona una imagen con índices precalculados, sin pasar por float64.
+    uint8 y uint16 se interpolan en punto fijo y float32 en su propio tipo.
+    :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+    :param output_shape: Tamaño de salida (alto, ancho)
+    :param mode: 'nearest', 'bilinear' o 'area' (promedio de bloques, para reducir)
+    :param out: Array opcional (H', W'[, C]) donde escribir el resultado; puede ser
+                una vista dentro de un lienzo mayor
+    :return: Imagen redimensionada (del tipo de la entrada)
+    """
+    if mode not in _RESIZERS:
+        raise ValueError(f"Modo de remuestreo desconocido: {mode}")
+    out_h, out_w = max(1, int(output_shape[0])), max(1, int(output_shape[1]))
+    image = normalize(image)
+
+    if image.shape[:2] == (out_h, out_w):
+        result = image
+    else:
+        result = _RESIZERS[mode](image, out_h, out_w)
+
+    if out is None:
+        return result if result is not image else image.copy()
+    out[...] = result
+    return out
@@ -0,0 +1,226 @@
+import numpy as np
+
+from .Cache import LRUCache
+from .Dtypes import WORK_DTYPES, normalize
+from .Parallel import run_in_bands
+
+# Píxeles de salida procesados por bloque al muestrear (acota los temporales)
+SAMPLE_CHUNK = 1 << 18
+
+# Mapas inversos cacheados por (forma, ángulo, resize). Cada mapa ocupa 6 bytes por
+# píxel de salida (índice int32 + dos pesos uint8).
+MAP_CACHE = LRUCache(max_items=32, max_bytes=256 * 1024 * 1024)
+
+
+def rotation_geometry(shape, angle, resize=True):
+    """
+    Geometría de una rotación alrededor del centro (equivalente a skimage `rotate`).
+    :param shape: Forma de la imagen de entrada
+    :param angle: Ángulo en grados, en sentido antihorario
+    :param resize: Si es True, el lienzo se amplía para que no se recorte la imagen
+    :return: (forma de salida (H, W), matriz 2x3 que lleva (x, y) de salida a (x, y) de entrada)
+    """
+    rows, cols = shape[:2]
+    theta = np.deg2rad(angle)
+    cos, sin = np.cos(theta), np.sin(theta)
+    center_x, center_y = cols / 2.0 - 0.5, rows / 2.0 - 0.5
+
+    if resize:
+        # Las esquinas de la imagen rotadas en sentido inverso delimitan el nuevo lienzo
+        corners = np.array([[0, 0], [0, rows - 1], [cols - 1, rows - 1], [cols - 1, 0]],
+                           dtype=np.float64)
+        cx = corners[:, 0] - center_x
+        cy = corners[:, 1] - center_y
+        rotated_x = cos * cx + sin * cy + center_x
+        rotated_y = -sin * cx + cos * cy + center_y
+        min_x, min_y = rotated_x.min(), rotated_y.min()
+        out_rows = int(np.around(rotated_y.max() - min_y + 1))
+        out_cols = int(np.around(rotated_x.max() - min_x + 1))
+    else:
+        min_x, min_y = 0.0, 0.0
+        out_rows, out_cols = rows, cols
+
+    # Salida -> entrada: desplazamos al origen del lienzo, rotamos alrededor del centro
+    tx = min_x - center_x
+    ty = min_y - center_y
+    matrix = np.array([
+        [cos, -sin, cos * tx - sin * ty + center_x],
+        [sin, cos, sin * tx + cos * ty + center_y],
+    ])
+    return (out_rows, out_cols), matrix
+
+
+def _build_map(shape, angle, resize):
+    """
+    Calcula el mapa inverso de una rotación sobre la imagen con un píxel de relleno.
+    :return: (forma de salida, índice plano int32 del vecino superior izquierdo,
+              peso horizontal uint8, peso vertical uint8)
+    """
+    height, width = shape
+    out_shape, matrix = rotation_geometry(shape, angle, resize)
+    out_h, out_w = out_shape
+    padded_w = width + 2
+
+    index = np.empty(out_h * out_w, dtype=np.int32)
+    weight_x = np.empty(out_h * out_w, dtype=np.uint8)
+    weight_y = np.empty(out_h * out_w, dtype=np.uint8)
+
+    cols = np.arange(out_w, dtype=np.float64)
+    rows_per_chunk = max(1, SAMPLE_CHUNK // out_w)
+    for r0 in range(0, out_h, rows_per_chunk):
+        r1 = min(out_h, r0 + rows_per_chunk)
+        grid_y, grid_x = np.meshgrid(np.arange(r0, r1, dtype=np.float64), cols, indexing='ij')
+        # +1: coordenadas dentro de la imagen con un píxel de relleno a cval
+        xs = (matrix[0, 0] * grid_x + matrix[0, 1] * grid_y + matrix[0, 2] + 1).ravel()
+        ys = (matrix[1, 0] * grid_x + matrix[1, 1] * grid_y + matrix[1, 2] + 1).ravel()
+
+        # Fuera del marco relleno todos los vecinos serían cval: apuntamos a la esquina (0, 0).
+        # El margen de 1/512 garantiza que el peso redondeado del último píxel no llegue a 256.
+        edge = 1 - 1 / 512
+        outside = (xs < 0) | (xs >= width + edge) | (ys < 0) | (ys >= height + edge)
+        xs[outside] = 0
+        ys[outside] = 0
+
+        x0 = np.floor(xs)
+        y0 = np.floor(ys)
+        wx = np.rint((xs - x0) * 256)
+        wy = np.rint((ys - y0) * 256)
+        # Un peso que redondea a 256 equivale a empezar en el píxel siguiente con peso 0
+        carry_x = wx == 256
+        carry_y = wy == 256
+        x0 += carry_x
+        y0 += carry_y
+        wx[carry_x] = 0
+        wy[carry_y] = 0
+
+        chunk = slice(r0 * out_w, r1 * out_w)
+        index[chunk] = y0 * padded_w + x0
+        weight_x[chunk] = wx
+        weight_y[chunk] = wy
+
+    for array in (index, weight_x, weight_y):
+        array.flags.writeable = False
+    return out_shape, index, weight_x, weight_y
+
+
+def rotation_map(shape, angle, resize=True):
+    """
+    Devuelve (desde la caché LRU si es posible) el mapa inverso de una rotación.
+    :param shape: Forma (H, W) de la imagen de entrada
+    :param angle: Ángulo en grados
+    :param resize: Si el lienzo se amplía para no recortar la imagen
+    :return: Tupla (forma de salida, índice, peso x, peso y)
+    """
+    key = (tuple(shape[:2]), float(angle) % 360, bool(resize))
+    return MAP_CACHE.get_or_create(key, lambda: _build_map(key[0], key[1], key[2]))
+
+
+def _sample(padded, rotation, out):
+    """Interpolación bilineal (en punto fijo para enteros) siguiendo un mapa precalculado."""
+    _, index, weight_x, weight_y = rotation
+    padded_w = padded.shape[1]
+    channels = padded.shape[2] if padded.ndim == 3 else 1
+    flat = padded.reshape(-1, channels)
+    flat_out = out.reshape(-1, channels)
+
+    def band(band_start, band_stop):
+        for start in range(band_start, band_stop, SAMPLE_CHUNK):
+            _sample_chunk(flat, flat_out, index, weight_x, weight_y, padded_w, channels,
+                          start, min(band_stop, start + SAMPLE_CHUNK))
+
+    run_in_bands(band, index.size, channels)
+    return out
+
+
+def _sample_chunk(flat, flat_out, index, weight_x, weight_y, padded_w, channels, start, stop):
+    """Interpola los píxeles de salida [start, stop) de un mapa de rotación."""
+    i = index[start:stop]
+    work = WORK_DTYPES.get(flat.dtype)
+    # Pesos repetidos por canal: las operaciones elemento a elemento sin difusión
+    # son bastante más rápidas que multiplicar (N, 1) por (N, C)
+    wx = np.repeat(weight_x[start:stop], channels).reshape(-1, channels)
+    wy = np.repeat(weight_y[start:stop], channels).reshape(-1, channels)
+
+    if work is None:
+        # float32: misma interpolación con los pesos en [0, 1]
+        wx = wx.astype(np.float32) / 256
+        wy = wy.astype(np.float32) / 256
+        top = flat.take(i, axis=0) * (1 - wx)
+        top += flat.take(i + 1, axis=0) * wx
+        bottom = flat.take(i + padded_w, axis=0) * (1 - wx)
+        bottom += flat.take(i + padded_w + 1, axis=0) * wx
+        top *= 1 - wy
+        bottom *= wy
+        top += bottom
+        flat_out[start:stop] = top
+        return
+
+    wx = wx.astype(work)
+    wy = wy.astype(work)
+    inv_wx = 256 - wx
+    inv_wy = 256 - wy
+
+    # Todo cabe en el tipo de trabajo (255 * 256 + 128 en uint16, 65535 * 256 + 128 en
+    # uint32): interpolamos en horizontal, redondeamos a la precisión original y
+    # repetimos en vertical
+    top = flat.take(i, axis=0) * inv_wx
+    top += flat.take(i + 1, axis=0) * wx
+    top += 128
+    top >>= 8
+    bottom = flat.take(i + padded_w, axis=0) * inv_wx
+    bottom += flat.take(i + padded_w + 1, axis=0) * wx
+    bottom += 128
+    bottom >>= 8
+
+    top *= inv_wy
+    bottom *= wy
+    top += bottom
+    top += 128
+    top >>= 8
+    flat_out[start:stop] = top
+
+
+def _check_output(out, shape, dtype):
+    if out.shape != tuple(shape) or out.dtype != dtype:
+        raise ValueError(f"El buffer de salida debe ser {dtype} con forma {tuple(shape)}")
+
+
+def rotate(image, angle, resize=True, cval=0, out=None):
+    """
+    Rota una imagen (uint8, uint16 o float32) alrededor de su centro.
+
+    Los múltiplos de 90° se resuelven con transposiciones exactas; el resto usa un mapa
+    inverso cacheado y una interpolación bilineal en enteros, sin promover a float.
+    :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+    :param angle: Ángulo en grados, en sentido antihorario
+    :param resize: Si es True, el lienzo se amplía para que no se recorte la imagen
+    :param cval: Valor de relleno para las zonas fuera de la imagen original, en la escala
+                 del tipo de la imagen
+    :param out: Array opcional del tipo de la imagen con la forma del resultado
+    :return: Imagen rotada (del tipo de la entrada)
+    """
+    image = normalize(image)
+    angle = float(angle) % 360
+
+    quarter_turns, remainder = divmod(angle, 90)
+    if remainder == 0 and (resize or quarter_turns % 2 == 0 or image.shape[0] == image.shape[1]):
+        # Rotación exacta sin pérdidas: np.rot90 gira en el mismo sentido que skimage
+        result = np.rot90(image, int(quarter_turns))
+        if out is None:
+            return np.ascontiguousarray(result)
+        _check_output(out, result.shape, image.dtype)
+        out[...] = result
+        return out
+
+    rotation = rotation_map(image.shape, angle, resize)
+    out_shape = rotation[0] + image.shape[2:]
+    if out is None:
+        out = np.empty(out_shape, dtype=image.dtype)
+    _check_output(out, out_shape, image.dtype)
+
+    pad = ((1, 1), (1, 1)) + ((0, 0),) * (image.ndim - 2)
+    padded = np.pad(image, pad, mode='constant', constant_values=cval)
+    if not out.flags.c_contiguous:
+        out[...] = _sample(padded, rotation, np.empty(out_shape, dtype=image.dtype))
+        return out
+    return _sample(padded, rotation, out)
@@ -0,0 +1,219 @@
+"""
+Almacén de imágenes decodificadas por id: el cliente sube una imagen una vez y las
+peticiones siguientes solo envían su id, sin volver a transferir ni decodificar el fichero.
+Las imágenes viven en memoria dentro de un presupuesto de bytes; las menos usadas se
+vuelcan a disco (.npy) y se recuperan de allí si se vuelven a pedir.
+"""
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .Cache import LRUCache, image_digest
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_SPILL_MAX_BYTES = 4 * 1024 * 1024 * 1024
+DEFAULT_SPILL_DIR = os.path.join(tempfile.gettempdir(), 'visor_imagenes')
+
+# Los ids son huellas de contenido en hexadecimal (también nombran los ficheros en disco)
+_ID_PATTERN = re.compile(r'[0-9a-f]{16,64}')
+
+
+def valid_id(image_id):
+    return isinstance(image_id, str) and _ID_PATTERN.fullmatch(image_id) is not None
+
+
+class ImageStore:
+    """
+    Imágenes de solo lectura por id en dos niveles: una caché LRU en memoria acotada en
+    bytes y, opcionalmente, un directorio en disco (también LRU y acotado) al que van las
+    imágenes que salen de la memoria. Varios procesos pueden compartir el directorio: una
+    imagen volcada por uno la encuentran los demás (cada proceso aplica su presupuesto a
+    los ficheros que conoce).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=DEFAULT_SPILL_DIR,
+                 spill_max_bytes=DEFAULT_SPILL_MAX_BYTES):
+        """
+        :param max_bytes: Presupuesto en memoria
+        :param spill_dir: Directorio de volcado (None para no usar el disco)
+        :param spill_max_bytes: Presupuesto en disco
+        """
+        self.memory = LRUCache(max_bytes=max_bytes, on_evict=self._spill)
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.spills = 0
+        self.disk_hits = 0
+        self._disk = OrderedDict()  # id -> bytes del fichero, del menos al más reciente
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, image_id):
+        if not valid_id(image_id):
+            return False
+        return image_id in self.memory or self._path(image_id) is not None
+
+    def put(self, image, image_id=None):
+        """
+        Guarda una imagen.
+        :param image: Array numpy; se guarda de solo lectura (sin copia si ya es contiguo)
+        :param image_id: Id de la imagen (por ejemplo, la huella del fichero subido); por
+                         defecto, la huella de los píxeles
+        :return: Id de la imagen
+        """
+        image = np.ascontiguousarray(image)
+        image.flags.writeable = False
+        if image_id is None:
+            image_id = image_digest(image)
+        elif not valid_id(image_id):
+            raise ValueError(f"Id de imagen no válido: {image_id}")
+        if not self.memory.put(image_id, image):
+            # No cabe en memoria: directamente al disco
+            self._spill(image_id, image)
+        return image_id
+
+    def get(self, image_id):
+        """
+        Imagen guardada con ese id (de solo lectura), o None si no está en ningún nivel.
+        Las que se leen del disco vuelven a la memoria.
+        """
+        if not valid_id(image_id):
+            return None
+        image = self.memory.get(image_id)
+        if image is not None:
+            return image
+        path = self._path(image_id)
+        if path is None:
+            return None
+        try:
+            image = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            # Expulsado por otro proceso entre la comprobación y la lectura, o incompleto
+            self._forget(image_id)
+            return None
+        image.flags.writeable = False
+        self.disk_hits += 1
+        # El fichero se conserva: si la imagen vuelve a salir de la memoria no se reescribe
+        self.memory.put(image_id, image)
+        return image
+
+    def discard(self, image_id):
+        """Elimina una imagen de los dos niveles."""
+        if not valid_id(image_id):
+            return
+        self.memory.pop(image_id)
+        path = self._file(image_id)
+        self._forget(image_id)
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Vacía la memoria y borra los ficheros volcados por este proceso."""
+        self.memory.clear()
+        with self._lock:
+            image_ids = list(self._disk)
+        for image_id in image_ids:
+            self.discard(image_id)
+
+    def stats(self):
+        """Contadores de los dos niveles."""
+        stats = self.memory.stats()
+        with self._lock:
+            stats.update({
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'disk_max_bytes': self.spill_max_bytes if self.spill_dir else None,
+                'disk_hits': self.disk_hits,
+                'spills': self.spills,
+            })
+        return stats
+
+    def _file(self, image_id):
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, f'{image_id}.npy')
+
+    def _path(self, image_id):
+        # Fichero volcado de la imagen, si existe (marcándolo como reciente)
+        path = self._file(image_id)
+        if path is None or not os.path.exists(path):
+            self._forget(image_id)
+            return None
+        with self._lock:
+            if image_id in self._disk:
+                self._disk.move_to_end(image_id)
+            else:
+                # Volcado por otro proceso: pasa a contar en el presupuesto de este
+                nbytes = os.path.getsize(path)
+                self._disk[image_id] = nbytes
+                self._disk_bytes += nbytes
+        return path
+
+    def _forget(self, image_id):
+        with self._lock:
+            nbytes = self._disk.pop(image_id, None)
+            if nbytes is not None:
+                self._disk_bytes -= nbytes
+
+    def _spill(self, image_id, image):
+        """Vuelca al disco una imagen que sale de la memoria (si no estaba ya)."""
+        path = self._file(image_id)
+        if path is None or (self.spill_max_bytes is not None and image.nbytes > self.spill_max_bytes):
+            return
+        if self._path(image_id) is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            # Se escribe en un temporal y se renombra: nadie lee nunca un fichero a medias
+            partial = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(partial, 'wb') as handle:
+                    np.save(handle, image, allow_pickle=False)
+                os.replace(partial, path)
+            except OSError:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                return
+            with self._lock:
+                nbytes = os.path.getsize(path)
+                self._disk[image_id] = nbytes
+                self._disk_bytes += nbytes
+                self.spills += 1
+        self._trim()
+
+    def _trim(self):
+        # Borra los ficheros menos usados hasta volver al presupuesto de disco
+        removed = []
+        with self._lock:
+            while self._disk and self.spill_max_bytes is not None and self._disk_bytes > self.spill_max_bytes:
+                image_id, nbytes = self._disk.popitem(last=False)
+                self._disk_bytes -= nbytes
+                removed.append(image_id)
+        for image_id in removed:
+            try:
+                os.remove(self._file(image_id))
+            except OSError:
+                pass
+
+
+# Almacén compartido por las vistas (ver VIEWER_IMAGE_STORE_* en settings)
+IMAGE_STORE = ImageStore()
+
+
+def configure(max_bytes=None, spill_dir=None, spill_max_bytes=None):
+    """
+    Ajusta el almacén compartido.
+    :param max_bytes: Presupuesto en memoria (None deja el actual)
+    :param spill_dir: Directorio de volcado (None deja el actual; '' desactiva el disco)
+    :param spill_max_bytes: Presupuesto en disco (None deja el actual)
+    """
+    if max_bytes is not None:
+        IMAGE_STORE.memory.max_bytes = max(0, int(max_bytes))
+    if spill_dir is not None:
+        IMAGE_STORE.spill_dir = str(spill_dir) or None
+    if spill_max_bytes is not None:
+        IMAGE_STORE.spill_max_bytes = max(0, int(spill_max_bytes))
@@ -0,0 +1,191 @@
+"""
+Umbralización sobre la luminancia entera compartida (`ColorSpace.grayscale`): umbral
+manual, Otsu y multi-Otsu a partir del histograma de 256 niveles, y umbral adaptativo
+con las sumas por ventana de la imagen integral.
+"""
+import numpy as np
+
+from .ColorSpace import LUMA_SHIFT, grayscale, luma_accumulate
+from .Dtypes import convert, normalize, scale, white
+from .Integral import IntegralImage
+from .Parallel import run_in_bands
+
+THRESHOLD_METHODS = ('manual', 'otsu', 'adaptive')
+
+# Clases admitidas por multi-Otsu (la búsqueda es O(clases * 256^2))
+MAX_CLASSES = 5
+
+# Filas por bloque del umbral adaptativo (cada bloque construye su tabla con el margen)
+ADAPTIVE_ROWS = 256
+
+
+def otsu_threshold(counts):
+    """
+    Umbral de Otsu: el nivel t que maximiza la varianza entre las clases [0, t] y (t, 255].
+    Con los acumulados del histograma es O(256).
+    :param counts: Histograma de 256 niveles
+    :return: Umbral (los niveles mayores que él son la clase clara)
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    weight = np.cumsum(counts)
+    mass = np.cumsum(counts * np.arange(len(counts)))
+    total, total_mass = weight[-1], mass[-1]
+    below, above = weight[:-1], total - weight[:-1]
+    # Varianza entre clases (salvo el factor constante 1 / N^2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        between = (total_mass * below - total * mass[:-1]) ** 2 / (below * above)
+    between[~np.isfinite(between)] = -1
+    if total == 0 or between.max() < 0:
+        # Un único nivel presente: no hay dos clases que separar
+        return int(np.argmax(counts > 0))
+    return int(np.argmax(between))
+
+
+def multi_otsu_thresholds(counts, classes=3):
+    """
+    Umbrales de multi-Otsu por programación dinámica sobre los acumulados del histograma:
+    maximizar la varianza entre clases equivale a maximizar sum(S_k^2 / N_k), con N_k y
+    S_k el número de píxeles y la suma de niveles de cada clase.
+    :param counts: Histograma de 256 niveles
+    :param classes: Número de clases (2 a MAX_CLASSES)
+    :return: Lista ordenada de classes - 1 umbrales
+    """
+    classes = min(MAX_CLASSES, max(2, int(classes)))
+    counts = np.asarray(counts, dtype=np.float64)
+    length = len(counts)
+    weight = np.concatenate(([0.0], np.cumsum(counts)))
+    mass = np.concatenate(([0.0], np.cumsum(counts * np.arange(length))))
+
+    # score[a, b]: aportación de una clase con los niveles [a, b) (-inf si a >= b)
+    pixels = weight[None, :] - weight[:, None]
+    sums = mass[None, :] - mass[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score = np.where(pixels > 0, sums * sums / pixels, 0.0)
+    score[np.tril_indices(length + 1)] = -np.inf
+
+    best = score[0]
+    choices = []
+    for _ in range(classes - 1):
+        total = best[:, None] + score
+        choice = np.argmax(total, axis=0)
+        best = total[choice, np.arange(length + 1)]
+        choices.append(choice)
+
+    # Se reconstruyen los inicios de clase desde el final del histograma
+    bounds = []
+    stop = length
+    for choice in reversed(choices):
+        stop = int(choice[stop])
+        bounds.append(stop)
+    return sorted(bound - 1 for bound in bounds)
+
+
+def gray_levels(image):
+    """Luminancia cuantizada a 256 niveles (la escala de los histogramas y los umbrales)."""
+    return convert(grayscale(normalize(image)), np.uint8)
+
+
+def level_counts(levels):
+    return np.bincount(levels.reshape(-1), minlength=256)
+
+
+def classify(levels, thresholds):
+    """
+    Clase de cada píxel: el número de umbrales que supera su nivel.
+    :param levels: Niveles uint8 (H, W)
+    :param thresholds: Umbrales ordenados
+    :return: Array uint8 (H, W) con valores de 0 a len(thresholds)
+    """
+    table = np.searchsorted(np.asarray(thresholds), np.arange(256), side='left').astype(np.uint8)
+    return table[levels]
+
+
+def manual_mask(image, threshold):
+    """
+    Píxeles cuya luminancia supera el umbral (escala 0-255 para cualquier tipo).
+    En RGB la comparación se hace con el acumulador en punto fijo, sin truncar la luminancia.
+    :return: Máscara booleana (H, W)
+    """
+    image = normalize(image)
+    threshold = min(255.0, max(-1.0, float(threshold)))
+    if image.ndim == 3 and image.shape[2] >= 3 and image.dtype.kind in 'ui':
+        # gray > umbral <=> 65536 * gray > 65536 * umbral
+        return luma_accumulate(image[..., :3]) > round(threshold * scale(image.dtype) * (1 << LUMA_SHIFT))
+    return grayscale(image) > threshold * scale(image.dtype)
+
+
+def adaptive_mask(image, radius=15, offset=5.0):
+    """
+    Umbral local: un píxel es claro si su luminancia supera la media de su ventana
+    (2 * radius + 1)^2 menos `offset`. En los bordes la ventana se recorta a la imagen.
+    Cada bloque de filas construye la imagen integral de sus filas más el margen, así
+    que el coste no depende del radio.
+    :param image: Imagen (H, W) o (H, W, C)
+    :param radius: Radio de la ventana en píxeles
+    :param offset: Margen restado a la media (escala 0-255)
+    :return: Máscara booleana (H, W)
+    """
+    gray = grayscale(normalize(image))
+    height, width = gray.shape
+    radius = max(1, int(radius))
+    margin = float(offset) * scale(gray.dtype)
+    mask = np.empty((height, width), dtype=bool)
+    columns = np.arange(width)
+    left = np.maximum(columns - radius, 0)[None, :]
+    right = np.minimum(columns + radius + 1, width)[None, :]
+
+    def band(band_start, band_stop):
+        for start in range(band_start, band_stop, ADAPTIVE_ROWS):
+            stop = min(band_stop, start + ADAPTIVE_ROWS)
+            top, bottom = max(0, start - radius), min(height, stop + radius)
+            integral = IntegralImage(gray[top:bottom])
+            rows = np.arange(start, stop)
+            y1 = (np.maximum(rows - radius, 0) - top)[:, None]
+            y2 = (np.minimum(rows + radius + 1, height) - top)[:, None]
+            count = (y2 - y1) * (right - left)
+            # Sin dividir: gray > media - margen <=> gray * n > suma - margen * n
+            limit = integral.sum(y1, y2, left, right) - margin * count
+            np.greater(gray[start:stop] * count.astype(np.float64), limit, out=mask[start:stop])
+
+    run_in_bands(band, height, width)
+    return mask
+
+
+def threshold_map(image, method='manual', threshold=128, classes=2, radius=15, offset=5.0,
+                  counts=None):
+    """
+    Resultado de un solo canal de la umbralización.
+    :param image: Imagen (H, W) o (H, W, C) uint8, uint16 o float32
+    :param method: 'manual', 'otsu' o 'adaptive'
+    :param threshold: Umbral manual (escala 0-255)
+    :param classes: Clases de Otsu (con más de 2, un nivel de gris por clase)
+    :param radius: Radio del umbral adaptativo
+    :param offset: Margen del umbral adaptativo (escala 0-255)
+    :param counts: Histograma de luminancia ya calculado (opcional, para Otsu)
+    :return: (array (H, W) del tipo de la imagen, umbrales usados en la escala 0-255)
+    """
+    image = normalize(image)
+    top = white(image.dtype)
+    if method == 'manual':
+        mask, thresholds = manual_mask(image, threshold), [float(threshold)]
+    elif method == 'adaptive':
+        mask, thresholds = adaptive_mask(image, radius, offset), []
+    elif method == 'otsu':
+        levels = gray_levels(image)
+        if counts is None:
+            counts = level_counts(levels)
+        classes = min(MAX_CLASSES, max(2, int(classes)))
+        if classes == 2:
+            thresholds = [otsu_threshold(counts)]
+            mask = levels > thresholds[0]
+        else:
+            thresholds = multi_otsu_thresholds(counts, classes)
+            # Un nivel de gris por clase, repartidos entre 0 y el blanco
+            values = np.linspace(0, top, classes)
+            if image.dtype.kind in 'ui':
+                values = np.rint(values)
+            return values.astype(image.dtype)[classify(levels, thresholds)], thresholds
+    else:
+        raise ValueError(f"Método de umbralización desconocido: {method}")
+    result = mask.view(np.uint8) * np.array(top, dtype=image.dtype)
+    return result, thresholds
@@ -0,0 +1,243 @@
+import os
+
+import numpy as np
+
+from .Rotation import rotation_geometry
+
+
+class Tile:
+    """
+    Región de trabajo de una imagen dividida en teselas.
+
+    `read` son los cortes (filas, columnas) que se leen de la fuente, incluyendo el halo;
+    `write` son los cortes del destino que produce la tesela, e `inner` los cortes que,
+    dentro de la región leída, corresponden a `write` (es decir, la tesela sin halo).
+    """
+
+    __slots__ = ('read', 'write', 'inner')
+
+    def __init__(self, read, write, inner):
+        self.read = read
+        self.write = write
+        self.inner = inner
+
+
+def iter_tiles(shape, tile_rows, tile_cols=None, halo=0):
+    """
+    Recorre una imagen por teselas.
+    :param shape: Forma de la imagen (H, W, ...)
+    :param tile_rows: Alto de cada tesela en píxeles
+    :param tile_cols: Ancho de cada tesela (None para bandas de filas completas)
+    :param halo: Píxeles de solapamiento que se leen alrededor de cada tesela
+    :return: Generador de objetos Tile
+    """
+    height, width = shape[:2]
+    tile_rows = max(1, int(tile_rows))
+    tile_cols = width if tile_cols is None else max(1, int(tile_cols))
+    for y in range(0, height, tile_rows):
+        y_end = min(height, y + tile_rows)
+        ry0, ry1 = max(0, y - halo), min(height, y_end + halo)
+        for x in range(0, width, tile_cols):
+            x_end = min(width, x + tile_cols)
+            rx0, rx1 = max(0, x - halo), min(width, x_end + halo)
+            yield Tile(
+                read=(slice(ry0, ry1), slice(rx0, rx1)),
+                write=(slice(y, y_end), slice(x, x_end)),
+                inner=(slice(y - ry0, y_end - ry0), slice(x - rx0, x_end - rx0)),
+            )
+
+
+def open_source(source):
+    """
+    Devuelve un array indexable para la fuente sin cargarla completa en memoria.
+    :param source: Array numpy o ruta a un TIFF sin compresión (se abre como memmap)
+    :return: Array numpy o numpy.memmap
+    """
+    if isinstance(source, (str, os.PathLike)):
+        import tifffile
+        try:
+            return tifffile.memmap(source, mode='r')
+        except ValueError as e:
+            raise ValueError(
+                f"El TIFF {source} no se puede mapear en memoria (¿está comprimido?): {e}"
+            )
+    return np.asarray(source)
+
+
+def create_output(destination, shape, dtype):
+    """
+    Prepara el buffer de salida del motor por teselas.
+    :param destination: None (array en memoria), array numpy existente o ruta a un TIFF nuevo
+    :param shape: Forma de la imagen de salida
+    :param dtype: Tipo de dato de la imagen de salida
+    :return: Array numpy o numpy.memmap donde escribir el resultado
+    """
+    if destination is None:
+        return np.empty(shape, dtype=dtype)
+    if isinstance(destination, (str, os.PathLike)):
+        import tifffile
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        photometric = 'rgb' if len(shape) == 3 and shape[2] in (3, 4) else 'minisblack'
+        return tifffile.memmap(
+            destination, shape=shape, dtype=dtype, photometric=photometric,
+            bigtiff=nbytes > 2 ** 32 - 2 ** 25,
+        )
+    if destination.shape != tuple(shape):
+        raise ValueError(f"El buffer de salida tiene forma {destination.shape}, se esperaba {shape}")
+    return destination
+
+
+def _finish_output(out):
+    """Vuelca a disco la salida si es un memmap."""
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def _cast_like(values, dtype):
+    """Convierte los valores interpolados (float32) al tipo de la imagen."""
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'ui':
+        info = np.iinfo(dtype)
+        return np.clip(values + 0.5, info.min, info.max).astype(dtype)
+    return values.astype(dtype)
+
+
+def _sample_bilinear(window, ys, xs, cval=0):
+    """
+    Interpolación bilineal de `window` en las coordenadas (ys, xs), relativas a la ventana.
+    Los vecinos fuera de la ventana toman el valor `cval`.
+    """
+    height, width = window.shape[:2]
+    y0 = np.floor(ys)
+    x0 = np.floor(xs)
+    wy = (ys - y0).astype(np.float32)
+    wx = (xs - x0).astype(np.float32)
+    y0 = y0.astype(np.intp)
+    x0 = x0.astype(np.intp)
+    if window.ndim == 3:
+        wy = wy[..., None]
+        wx = wx[..., None]
+
+    result = np.zeros(ys.shape + window.shape[2:], dtype=np.float32)
+    neighbours = (
+        (0, 0, (1 - wy) * (1 - wx)),
+        (0, 1, (1 - wy) * wx),
+        (1, 0, wy * (1 - wx)),
+        (1, 1, wy * wx),
+    )
+    for dy, dx, weight in neighbours:
+        yy = y0 + dy
+        xx = x0 + dx
+        valid = (yy >= 0) & (yy < height) & (xx >= 0) & (xx < width)
+        values = window[np.clip(yy, 0, height - 1), np.clip(xx, 0, width - 1)]
+        if window.ndim == 3:
+            valid = valid[..., None]
+        result += np.where(valid, values, cval) * weight
+    return result
+
+
+class TiledProcessor:
+    """
+    Motor de ejecución por teselas: la memoria pico depende del tamaño de la tesela y no
+    del de la imagen. Las fuentes y destinos pueden ser arrays o TIFF mapeados en memoria.
+    """
+
+    def __init__(self, tile_rows=512, tile_cols=None, halo=0):
+        """
+        :param tile_rows: Alto de cada tesela en píxeles
+        :param tile_cols: Ancho de cada tesela (None para bandas de filas completas)
+        :param halo: Solapamiento por defecto para los filtros de vecindad
+        """
+        self.tile_rows = tile_rows
+        self.tile_cols = tile_cols
+        self.halo = halo
+
+    def process(self, source, func, out=None, halo=None):
+        """
+        Aplica un filtro que conserva la forma de la imagen tesela a tesela.
+        :param source: Array numpy o ruta a un TIFF
+        :param func: Función tesela -> tesela procesada, o un objeto con método `apply`
+                     (por ejemplo un FilterPipeline)
+        :param out: None, array de salida o ruta del TIFF de salida
+        :param halo: Solapamiento para filtros de vecindad (por defecto el del procesador)
+        :return: Imagen resultante (array o memmap)
+        """
+        if hasattr(func, 'apply'):
+            func = func.apply
+        src = open_source(source)
+        halo = self.halo if halo is None else halo
+        out = create_output(out, src.shape, src.dtype)
+
+        for tile in iter_tiles(src.shape, self.tile_rows, self.tile_cols, halo):
+            block = np.array(src[tile.read])
+            result = func(block)
+            out[tile.write] = result[tile.inner]
+        return _finish_output(out)
+
+    def resize(self, source, output_shape, out=None):
+        """
+        Redimensiona con interpolación bilineal leyendo solo la franja de origen de cada tesela.
+        :param source: Array numpy o ruta a un TIFF
+        :param output_shape: Tamaño de salida (H, W)
+        :param out: None, array de salida o ruta del TIFF de salida
+        :return: Imagen redimensionada
+        """
+        src = open_source(source)
+        height, width = src.shape[:2]
+        out_h, out_w = int(output_shape[0]), int(output_shape[1])
+        scale_y, scale_x = height / out_h, width / out_w
+        out = create_output(out, (out_h, out_w) + src.shape[2:], src.dtype)
+
+        for tile in iter_tiles(out.shape, self.tile_rows, self.tile_cols):
+            rows = np.arange(tile.write[0].start, tile.write[0].stop, dtype=np.float32)
+            cols = np.arange(tile.write[1].start, tile.write[1].stop, dtype=np.float32)
+            ys = np.clip((rows + 0.5) * scale_y - 0.5, 0, height - 1)
+            xs = np.clip((cols + 0.5) * scale_x - 0.5, 0, width - 1)
+
+            # Halo de un píxel: el vecino inferior/derecho de la interpolación
+            y0, y1 = int(ys[0]), min(height, int(ys[-1]) + 2)
+            x0, x1 = int(xs[0]), min(width, int(xs[-1]) + 2)
+            window = src[y0:y1, x0:x1]
+            grid_y, grid_x = np.meshgrid(ys - y0, xs - x0, indexing='ij')
+            # Con coordenadas recortadas al borde, el vecino extra replica el último píxel
+            grid_y = np.minimum(grid_y, window.shape[0] - 1)
+            grid_x = np.minimum(grid_x, window.shape[1] - 1)
+            values = _sample_bilinear(window, grid_y, grid_x)
+            out[tile.write] = _cast_like(values, src.dtype)
+        return _finish_output(out)
+
+    def rotate(self, source, angle, out=None, cval=0):
+        """
+        Rota con lienzo ajustado, leyendo para cada tesela solo el rectángulo de origen
+        que cubre su transformada inversa (más un píxel de halo).
+        :param source: Array numpy o ruta a un TIFF
+        :param angle: Ángulo en grados, en sentido antihorario
+        :param out: None, array de salida o ruta del TIFF de salida
+        :param cval: Valor para las zonas fuera de la imagen original
+        :return: Imagen rotada
+        """
+        src = open_source(source)
+        height, width = src.shape[:2]
+        out_shape, matrix = rotation_geometry(src.shape, angle)
+        out = create_output(out, out_shape + src.shape[2:], src.dtype)
+
+        for tile in iter_tiles(out.shape, self.tile_rows, self.tile_cols):
+            rows = np.arange(tile.write[0].start, tile.write[0].stop, dtype=np.float32)
+            cols = np.arange(tile.write[1].start, tile.write[1].stop, dtype=np.float32)
+            grid_y, grid_x = np.meshgrid(rows, cols, indexing='ij')
+            xs = matrix[0, 0] * grid_x + matrix[0, 1] * grid_y + matrix[0, 2]
+            ys = matrix[1, 0] * grid_x + matrix[1, 1] * grid_y + matrix[1, 2]
+
+            y0 = max(0, int(np.floor(ys.min())))
+            y1 = min(height, int(np.floor(ys.max())) + 2)
+            x0 = max(0, int(np.floor(xs.min())))
+            x1 = min(width, int(np.floor(xs.max())) + 2)
+            if y1 <= y0 or x1 <= x0:
+                # La tesela cae completamente fuera de la imagen original
+                out[tile.write] = cval
+                continue
+
+            values = _sample_bilinear(src[y0:y1, x0:x1], ys - y0, xs - x0, cval=cval)
+            out[tile.write] = _cast_like(values, src.dtype)
+        return _finish_output(out)
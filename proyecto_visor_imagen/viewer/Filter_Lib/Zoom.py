@@ -0,0 +1,149 @@
+import numpy as np
+
+from .Cache import LRUCache, sizeof
+from .Resample import resize, resize_area_region
+
+# Pirámides cacheadas por clave de contenido de la imagen original
+PYRAMID_CACHE = LRUCache(max_items=16, max_bytes=512 * 1024 * 1024)
+
+
+class ImagePyramid:
+    """
+    Pirámide multirresolución de una imagen: cada nivel es el anterior reducido a la
+    mitad promediando bloques de 2x2. El nivel 0 es la propia imagen (sin copia).
+    """
+
+    def __init__(self, image, min_size=64):
+        """
+        :param image: Imagen en formato numpy array (H, W, C) o (H, W)
+        :param min_size: Lado mínimo del nivel más pequeño
+        """
+        self.levels = [image]
+        level = image
+        while min(level.shape[:2]) // 2 >= min_size:
+            level = resize(level, (level.shape[0] // 2, level.shape[1] // 2), mode='area')
+            self.levels.append(level)
+
+    @property
+    def nbytes(self):
+        return sizeof(self.levels)
+
+    def level_for(self, region_shape, output_shape):
+        """
+        Nivel más reducido desde el que todavía queda al menos un factor 2 de reducción
+        hasta la salida: así el último paso promedia varios píxeles por cada uno de salida
+        en lugar de tomar bloques de 1 o 2 píxeles.
+        :param region_shape: Tamaño (alto, ancho) de la región en el nivel 0
+        :param output_shape: Tamaño (alto, ancho) de la salida
+        :return: Índice del nivel
+        """
+        ratio = min(region_shape[0] / output_shape[0], region_shape[1] / output_shape[1])
+        level = 0
+        while level + 1 < len(self.levels) and 2 ** (level + 2) <= ratio:
+            level += 1
+        return level
+
+
+def get_pyramid(image, key=None):
+    """
+    Devuelve la pirámide de la imagen, construyéndola solo la primera vez.
+    :param image: Imagen original
+    :param key: Clave de contenido (por ejemplo, la huella del fichero subido); sin clave
+                la pirámide no se cachea
+    :return: ImagePyramid
+    """
+    if key is None:
+        return ImagePyramid(image)
+    return PYRAMID_CACHE.get_or_create(('pyramid', key), lambda: ImagePyramid(image))
+
+
+def zoom_window(shape, x, y, scale):
+    """
+    Región que muestra un zoom centrado en (x, y): 1/scale del tamaño de la imagen,
+    desplazada si hace falta para que quede dentro de sus límites.
+    :param shape: Forma de la imagen
+    :param x: Coordenada x del centro de la región
+    :param y: Coordenada y del centro de la región
+    :param scale: Factor de escala del zoom (>1 para acercar, <1 para alejar)
+    :return: (y1, y2, x1, x2), o None si la región queda vacía
+    """
+    height, width = shape[:2]
+
+    # Convertir coordenadas a enteros
+    x = int(x)
+    y = int(y)
+
+    # Asegurar que scale sea positivo
+    scale = max(0.1, float(scale))
+
+    # Calculamos el tamaño de la región para el zoom
+    zoom_width = max(1, int(width / scale))
+    zoom_height = max(1, int(height / scale))
+
+    # Calculamos las coordenadas de la región
+    half_w = zoom_width // 2
+    half_h = zoom_height // 2
+
+    # Aseguramos que las coordenadas estén dentro de los límites
+    x = max(half_w, min(x, width - half_w))
+    y = max(half_h, min(y, height - half_h))
+
+    # Recortamos la región
+    x1, y1 = max(0, x - half_w), max(0, y - half_h)
+    x2, y2 = min(width, x + half_w), min(height, y + half_h)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return y1, y2, x1, x2
+
+
+def _is_integer_scale(src_len, dst_len):
+    return dst_len >= src_len and dst_len % src_len == 0
+
+
+def zoom_region(image, region, output_shape=None, pyramid=None, out=None, integral=None):
+    """
+    Amplía una región de la imagen a la resolución de salida.
+
+    Si la región se reduce en los dos ejes se promedia por área exacta desde el nivel de
+    la pirámide que deja al menos un factor 2 hasta la salida; si se amplía con escala
+    entera se replican píxeles y si no se usa el remuestreo bilineal separable cacheado.
+    :param image: Imagen original (nivel 0)
+    :param region: (y1, y2, x1, x2) en coordenadas de la imagen original
+    :param output_shape: Tamaño de salida (alto, ancho); por defecto el de la imagen
+    :param pyramid: ImagePyramid opcional de la imagen
+    :param out: Array opcional del tipo de la imagen con la forma de la salida
+    :param integral: IntegralImage opcional de la imagen. Si la región se reduce en los dos
+                     ejes, se promedia exactamente desde la tabla (sin pasar por la pirámide)
+    :return: Región ampliada (del tipo de la imagen)
+    """
+    y1, y2, x1, x2 = region
+    out_h, out_w = output_shape if output_shape is not None else image.shape[:2]
+    if integral is not None and y2 - y1 >= out_h and x2 - x1 >= out_w:
+        result = integral.resize_area((out_h, out_w), region)
+        if out is None:
+            return result
+        out[...] = result
+        return out
+
+    if y2 - y1 >= out_h and x2 - x1 >= out_w and (y2 - y1, x2 - x1) != (out_h, out_w):
+        # Reducción: área exacta desde el nivel elegido, con la región
+        # llevada a sus coordenadas sin redondear
+        source, factor = image, 1
+        if pyramid is not None:
+            level = pyramid.level_for((y2 - y1, x2 - x1), (out_h, out_w))
+            source, factor = pyramid.levels[level], 2 ** level
+        bounds = (y1 / factor, min(y2 / factor, source.shape[0]),
+                  x1 / factor, min(x2 / factor, source.shape[1]))
+        return resize_area_region(source, (out_h, out_w), bounds, out=out)
+
+    crop = image[y1:y2, x1:x2]
+    crop_h, crop_w = crop.shape[:2]
+    if _is_integer_scale(crop_h, out_h) and _is_integer_scale(crop_w, out_w):
+        # Escala entera: replicación de píxeles sin interpolar
+        result = np.repeat(np.repeat(crop, out_h // crop_h, axis=0), out_w // crop_w, axis=1)
+        if out is None:
+            return result
+        out[...] = result
+        return out
+
+    return resize(crop, (out_h, out_w), mode='bilinear', out=out)
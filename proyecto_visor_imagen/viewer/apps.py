@@ -4,3 +4,26 @@ from django.apps import AppConfig
 class ViewerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'viewer'
+
+    def ready(self):
+        # Pool de hilos compartido por los filtros (ver VIEWER_PARALLEL_* en settings)
+        from django.conf import settings
+        from .Filter_Lib import Parallel
+        Parallel.configure(
+            workers=getattr(settings, 'VIEWER_PARALLEL_WORKERS', None),
+            min_band_size=getattr(settings, 'VIEWER_PARALLEL_MIN_BAND_SIZE', None),
+        )
+        # Almacén de imágenes subidas (ver VIEWER_IMAGE_STORE_* en settings)
+        from .Filter_Lib import Store
+        Store.configure(
+            max_bytes=getattr(settings, 'VIEWER_IMAGE_STORE_MAX_BYTES', None),
+            spill_dir=getattr(settings, 'VIEWER_IMAGE_STORE_SPILL_DIR', None),
+            spill_max_bytes=getattr(settings, 'VIEWER_IMAGE_STORE_SPILL_MAX_BYTES', None),
+        )
+        # Caché de resultados codificados (ver VIEWER_RESULT_CACHE_* en settings)
+        from . import result_cache
+        result_cache.configure(
+            alias=getattr(settings, 'VIEWER_RESULT_CACHE_ALIAS', None),
+            max_bytes=getattr(settings, 'VIEWER_RESULT_CACHE_MAX_BYTES', None),
+            max_entry_bytes=getattr(settings, 'VIEWER_RESULT_CACHE_MAX_ENTRY_BYTES', None),
+        )
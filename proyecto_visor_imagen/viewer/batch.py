@@ -0,0 +1,261 @@
+"""
+Procesamiento por lotes: aplica un pipeline de filtros a todas las imágenes de un
+directorio o de un zip, repartiendo el trabajo en un pool de procesos.
+"""
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+from PIL import Image
+
+from .Filter_Lib import Parallel
+from .Filter_Lib.Dtypes import SUPPORTED, array_to_pil, pil_to_array
+from .Filter_Lib.Lazy import tile_halo
+from .Filter_Lib.Pipeline import FilterPipeline
+from .Filter_Lib.Tiling import TiledProcessor, open_source
+
+# Extensiones que se consideran imágenes al recorrer el origen
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+# Formatos de salida que no admiten canal alfa
+OPAQUE_FORMATS = ('jpeg', 'jpg', 'bmp')
+
+# Formatos de salida que conservan la escala de grises de 16 bits
+HIGH_DEPTH_FORMATS = ('png', 'tif', 'tiff')
+
+# Formatos TIFF: de entrada se pueden mapear en memoria y de salida escribirse por bandas
+TIFF_FORMATS = ('tif', 'tiff')
+
+# Los TIFF sin comprimir desde este tamaño (en píxeles) se procesan por bandas de TILE_ROWS filas
+TILED_MIN_PIXELS = 32 * 1024 * 1024
+TILE_ROWS = 1024
+
+# Estado de cada proceso del pool (se inicializa una vez por proceso)
+_worker = {}
+
+
+def load_steps(spec):
+    """
+    Interpreta la especificación del pipeline.
+    :param spec: Lista de pasos, cadena JSON con la lista o ruta a un fichero JSON
+                 (con los mismos campos que el parámetro `filters` de /process-image/)
+    :return: Lista de pasos validada
+    """
+    if isinstance(spec, str):
+        if os.path.isfile(spec):
+            with open(spec, encoding='utf-8') as handle:
+                spec = json.load(handle)
+        else:
+            spec = json.loads(spec)
+    if isinstance(spec, dict):
+        spec = [spec]
+    # Valida los pasos en el proceso principal para fallar antes de lanzar el pool
+    FilterPipeline(spec)
+    return spec
+
+
+def iter_tasks(source):
+    """
+    Recorre las imágenes del origen.
+    :param source: Directorio (se recorre recursivamente) o fichero .zip
+    :return: Generador de tuplas (origen, ruta relativa)
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                # Las rutas absolutas o con '..' escribirían fuera del directorio de salida
+                if os.path.isabs(name) or '..' in name.replace('\\', '/').split('/'):
+                    continue
+                if not info.is_dir() and name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield source, name
+        return
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield source, os.path.relpath(os.path.join(root, name), source)
+
+
+def output_path(output_dir, relative, fmt=None):
+    """Ruta de salida de una imagen, con la extensión del formato pedido si se indica."""
+    if fmt:
+        relative = os.path.splitext(relative)[0] + '.' + fmt.lower()
+    return os.path.join(output_dir, relative)
+
+
+def _init_worker(steps, output_dir, fmt, quality, tiled_min_pixels=TILED_MIN_PIXELS):
+    # Cada proceso ya es una unidad de paralelismo: los filtros no abren hilos propios
+    Parallel.configure(workers=1)
+    pipeline = FilterPipeline(steps)
+    _worker.update(
+        pipeline=pipeline, output_dir=output_dir, fmt=fmt, quality=quality,
+        archives={}, halo=tile_halo(pipeline.steps), tiled_min_pixels=tiled_min_pixels,
+    )
+
+
+def _open_source(source, relative):
+    if os.path.isdir(source):
+        return open(os.path.join(source, relative), 'rb')
+    archives = _worker['archives']
+    if source not in archives:
+        archives[source] = zipfile.ZipFile(source)
+    return archives[source].open(relative)
+
+
+def _open_tiled(source, relative):
+    """
+    TIFF sin comprimir mapeado en memoria, si la imagen se puede procesar por bandas:
+    está en un directorio, supera `tiled_min_pixels` y ningún paso depende de toda la
+    imagen. None en cualquier otro caso (se decodifica entera con PIL).
+    """
+    if (_worker['halo'] is None or not os.path.isdir(source)
+            or os.path.splitext(relative)[1][1:].lower() not in TIFF_FORMATS):
+        return None
+    try:
+        image = open_source(os.path.join(source, relative))
+    except (ImportError, ValueError):
+        # Sin tifffile, o un TIFF comprimido que no se puede mapear
+        return None
+    if image.dtype not in SUPPORTED or not (
+            image.ndim == 2 or (image.ndim == 3 and image.shape[2] in (3, 4))):
+        return None
+    if image.shape[0] * image.shape[1] < _worker['tiled_min_pixels']:
+        return None
+    return image
+
+
+def _write_atomic(target, write):
+    """
+    Escribe `target` con write(ruta) sobre un temporal del mismo directorio y lo renombra
+    al terminar: un lote interrumpido no deja ficheros a medias que la reanudación daría
+    por procesados.
+    """
+    temporary = f'{target}.{os.getpid()}.tmp'
+    try:
+        write(temporary)
+        os.replace(temporary, target)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def process_one(source, relative):
+    """
+    Procesa una imagen en un proceso del pool. Los TIFF grandes sin comprimir se filtran
+    por bandas con `TiledProcessor` (la memoria pico depende de la banda, no de la imagen)
+    y, si la salida también es TIFF, se escriben directamente en el fichero mapeado.
+    :return: Diccionario con la ruta, píxeles procesados, bytes escritos, tiempo y error
+    """
+    started = time.perf_counter()
+    target = output_path(_worker['output_dir'], relative, _worker['fmt'])
+    fmt = (_worker['fmt'] or os.path.splitext(relative)[1][1:]).lower()
+    try:
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        image = _open_tiled(source, relative)
+        if image is not None:
+            processor = TiledProcessor(tile_rows=TILE_ROWS, halo=_worker['halo'])
+            # Cada banda es una copia propia: el pipeline puede escribir sobre ella
+            apply = partial(_worker['pipeline'].apply, inplace=True)
+            if fmt in TIFF_FORMATS:
+                _write_atomic(target, lambda path: processor.process(image, apply, out=path))
+                return _result(relative, image, target, started)
+            result = processor.process(image, apply)
+        else:
+            with _open_source(source, relative) as handle:
+                with Image.open(handle) as img:
+                    # Paletas y CMYK pasan a RGB(A); los 16 bits se filtran en uint16
+                    image = pil_to_array(img)
+            result = _worker['pipeline'].lazy(image).compute(inplace=True)
+
+        if result.ndim == 3 and result.shape[2] == 4 and fmt in OPAQUE_FORMATS:
+            result = result[..., :3]
+        options = {'quality': _worker['quality']} if fmt in ('jpeg', 'jpg', 'webp') else {}
+        pil_image = array_to_pil(result, high_depth=fmt in HIGH_DEPTH_FORMATS)
+        # El temporal no tiene la extensión del formato: se indica explícitamente
+        _write_atomic(target, lambda path: pil_image.save(
+            path, format=Image.registered_extensions().get('.' + fmt), **options))
+        return _result(relative, image, target, started)
+    except Exception as e:
+        return {'path': relative, 'pixels': 0, 'bytes': 0,
+                'seconds': time.perf_counter() - started, 'error': str(e)}
+
+
+def _result(relative, image, target, started):
+    return {
+        'path': relative, 'pixels': int(image.shape[0] * image.shape[1]),
+        'bytes': os.path.getsize(target), 'seconds': time.perf_counter() - started,
+        'error': None,
+    }
+
+
+def run_batch(source, output_dir, steps, workers=None, max_in_flight=None, fmt=None,
+              quality=90, overwrite=False, progress=None, tiled_min_pixels=TILED_MIN_PIXELS):
+    """
+    Aplica el pipeline a todas las imágenes del origen y escribe los resultados.
+
+    Las tareas se envían al pool de forma incremental: nunca hay más de `max_in_flight`
+    imágenes pendientes, así que la memoria no crece con el tamaño del archivo. Solo se
+    envían rutas; cada proceso lee, filtra y guarda su imagen.
+    :param source: Directorio o fichero .zip con las imágenes
+    :param output_dir: Directorio de salida (se conserva la estructura relativa)
+    :param steps: Pasos del pipeline (ver `load_steps`)
+    :param workers: Procesos del pool (por defecto, uno por núcleo)
+    :param max_in_flight: Máximo de imágenes pendientes (por defecto, 2 por proceso)
+    :param fmt: Formato de salida ('png', 'jpeg'...); por defecto el de cada imagen
+    :param quality: Calidad JPEG/WebP
+    :param overwrite: Si es False, las imágenes ya procesadas se saltan (permite reanudar)
+    :param progress: Función opcional llamada con (resultado, estadísticas) por imagen
+    :param tiled_min_pixels: Tamaño desde el que los TIFF sin comprimir se procesan por bandas
+    :return: Diccionario de estadísticas (imágenes, errores, megapíxeles, tiempos y ritmo)
+    """
+    steps = load_steps(steps)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    stats = {'processed': 0, 'skipped': 0, 'errors': 0, 'pixels': 0, 'bytes': 0,
+             'failed': [], 'elapsed': 0.0}
+    started = time.perf_counter()
+
+    def collect(future):
+        result = future.result()
+        if result['error']:
+            stats['errors'] += 1
+            stats['failed'].append((result['path'], result['error']))
+        else:
+            stats['processed'] += 1
+            stats['pixels'] += result['pixels']
+            stats['bytes'] += result['bytes']
+        stats['elapsed'] = time.perf_counter() - started
+        if progress is not None:
+            progress(result, stats)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(steps, output_dir, fmt, quality, tiled_min_pixels)) as executor:
+        pending = set()
+        for task_source, relative in iter_tasks(source):
+            if not overwrite and os.path.exists(output_path(output_dir, relative, fmt)):
+                stats['skipped'] += 1
+                continue
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            pending.add(executor.submit(process_one, task_source, relative))
+        for future in pending:
+            collect(future)
+
+    stats['elapsed'] = time.perf_counter() - started
+    stats.update(throughput(stats))
+    return stats
+
+
+def throughput(stats):
+    """Ritmo medio de un lote: imágenes por segundo y megapíxeles por segundo."""
+    elapsed = max(stats['elapsed'], 1e-9)
+    return {
+        'images_per_second': stats['processed'] / elapsed,
+        'megapixels_per_second': stats['pixels'] / 1e6 / elapsed,
+    }
@@ -0,0 +1,272 @@
+"""
+Benchmark de la biblioteca de filtros: mide cada filtro de `ImageFilters` sobre imágenes
+sintéticas de distintos tamaños, canales y tipos de dato, y compara con una referencia.
+"""
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .Filter_Lib.Dtypes import convert
+from .Filter_Lib.Encoders import encode
+from .Filter_Lib.Filters import ImageFilters
+
+# Tamaños (alto, ancho) por megapíxeles nominales
+SIZES = {
+    '0.3': (480, 640),
+    '2': (1200, 1600),
+    '12': (3000, 4000),
+    '50': (6000, 8400),
+}
+
+# Disposición de canales: escala de grises 2D, RGB y RGBA
+LAYOUTS = {'gray': 0, 'rgb': 3, 'rgba': 4}
+
+DTYPES = ('uint8', 'uint16', 'float32')
+
+
+def _second(image):
+    """Segunda imagen para las operaciones de dos imágenes: la misma escena volteada."""
+    return np.ascontiguousarray(image[::-1])
+
+
+def _small(image):
+    """Imagen de un cuarto de lado, para la marca de agua."""
+    return np.ascontiguousarray(image[::4, ::4])
+
+
+# Filtros medidos: nombre -> (función(imagen, extra), preparación opcional de `extra`)
+CASES = {
+    'brightness': (lambda img, _: ImageFilters.adjust_brightness(img, 1.2), None),
+    'contrast': (lambda img, _: ImageFilters.adjust_contrast(img, 1.3), None),
+    'rotate': (lambda img, _: ImageFilters.rotate_image(img, 30), None),
+    'highlight': (lambda img, _: ImageFilters.highlight_zones(img, 'light'), None),
+    'rgb': (lambda img, _: ImageFilters.apply_rgb_filter(img, True, False, True), None),
+    'cmy': (lambda img, _: ImageFilters.apply_cmy_filter(img, True, False, True), None),
+    'negative': (lambda img, _: ImageFilters.negative_image(img), None),
+    'hue': (lambda img, _: ImageFilters.adjust_hue(img, 40), None),
+    'saturation': (lambda img, _: ImageFilters.adjust_saturation(img, 1.5), None),
+    'vibrance': (lambda img, _: ImageFilters.adjust_vibrance(img, 0.5), None),
+    'zoom': (lambda img, _: ImageFilters.zoom_image(img, img.shape[1] // 2, img.shape[0] // 2, 2.5), None),
+    'binary': (lambda img, _: ImageFilters.binarize_image(img, 128), None),
+    'otsu': (lambda img, _: ImageFilters.binarize_image(img, method='otsu'), None),
+    'adaptive': (lambda img, _: ImageFilters.binarize_image(img, method='adaptive', radius=25), None),
+    'blur': (lambda img, _: ImageFilters.blur_image(img, 3), None),
+    'blur_large': (lambda img, _: ImageFilters.blur_image(img, 40), None),
+    'box_blur': (lambda img, _: ImageFilters.blur_image(img, 25, 'box'), None),
+    'sharpen': (lambda img, _: ImageFilters.sharpen_image(img, 1.0), None),
+    'edges': (lambda img, _: ImageFilters.detect_edges(img), None),
+    'auto_levels': (lambda img, _: ImageFilters.auto_levels(img), None),
+    'equalize': (lambda img, _: ImageFilters.equalize_histogram(img), None),
+    'clahe': (lambda img, _: ImageFilters.clahe(img, 2.0), None),
+    'merge': (lambda img, other: ImageFilters.merge_images(img, other, 0.4), _second),
+    'watermark': (lambda img, other: ImageFilters.watermark_merge_images(img, other), _small),
+    'mosaic': (lambda img, other: ImageFilters.create_mosaic([img, other, img, other], tile_size=512),
+               _second),
+    'histogram': (lambda img, _: ImageFilters.generate_histogram(img), None),
+    # Codificación de la respuesta con cada formato y perfil
+    'encode_png': (lambda img, _: encode(img, 'png', 'export'), None),
+    'encode_png_fast': (lambda img, _: encode(img, 'png', 'preview'), None),
+    'encode_jpeg': (lambda img, _: encode(img, 'jpeg', 'preview'), None),
+    'encode_webp': (lambda img, _: encode(img, 'webp', 'preview'), None),
+    'encode_webp_lossless': (lambda img, _: encode(img, 'webp', 'export'), None),
+}
+
+
+def make_image(size, layout, dtype, seed=0):
+    """
+    Imagen sintética reproducible: degradados suaves con ruido (ni constante ni puro ruido,
+    para que filtros y compresión se comporten como con una foto).
+    :param size: Clave de SIZES o tupla (alto, ancho)
+    :param layout: 'gray', 'rgb' o 'rgba'
+    :param dtype: 'uint8', 'uint16' o 'float32' (la misma escena en la escala de cada
+                  tipo: 0-65535 o [0, 1])
+    """
+    height, width = SIZES[size] if isinstance(size, str) else size
+    channels = LAYOUTS[layout]
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    planes = []
+    for channel in range(max(channels, 1)):
+        plane = (y * (channel % 2) + x * (1 - channel % 2) + 40 * channel) % 256
+        plane = plane + rng.normal(0, 12, (height, width)).astype(np.float32)
+        planes.append(np.clip(plane, 0, 255).astype(np.uint8))
+    image = planes[0] if channels == 0 else np.dstack(planes)
+    return convert(image, dtype)
+
+
+def _reset_peak_rss():
+    """Reinicia el pico de memoria residente del proceso (Linux); False si no es posible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as handle:
+            handle.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """Pico de memoria residente en MB (VmHWM en Linux, ru_maxrss en otros sistemas)."""
+    try:
+        with open('/proc/self/status') as handle:
+            for line in handle:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as handle:
+            for line in handle:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def case_key(name, size, layout, dtype):
+    return f"{name}/{size}MP/{layout}/{dtype}"
+
+
+def run_case(name, image, repeat=3, warmup=1):
+    """
+    Mide un filtro sobre una imagen.
+    :return: Diccionario con tiempos (mínimo y mediana), MP/s, pico de RSS, RSS extra y
+             pico de memoria reservada, o con 'error' si el filtro no admite esa entrada
+    """
+    func, prepare = CASES[name]
+    extra = prepare(image) if prepare else None
+    megapixels = image.shape[0] * image.shape[1] / 1e6
+    times = []
+    try:
+        for _ in range(warmup):
+            func(image, extra)
+        gc.collect()
+        base_rss = _rss_mb()
+        exact_peak = _reset_peak_rss()
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(image, extra)
+            times.append(time.perf_counter() - started)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+    peak = _peak_rss_mb()
+
+    # Una pasada más, fuera de la medida de tiempo, para el pico de memoria reservada
+    # (NumPy informa de sus buffers a tracemalloc; la RSS no ve la memoria reutilizada)
+    tracemalloc.start()
+    try:
+        func(image, extra)
+        allocated = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+    best = min(times)
+    return {
+        'seconds': best,
+        'median_seconds': statistics.median(times),
+        'megapixels': megapixels,
+        'mp_per_s': megapixels / best if best > 0 else float('inf'),
+        'peak_rss_mb': round(peak, 1),
+        # Memoria extra que el filtro llegó a usar (solo exacta si se pudo reiniciar el pico)
+        'extra_rss_mb': round(max(0.0, peak - base_rss), 1) if exact_peak else None,
+        'peak_alloc_mb': round(allocated, 1),
+    }
+
+
+def environment():
+    """Datos de la máquina que acompañan a los resultados."""
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_suite(names=None, sizes=None, layouts=None, dtypes=None, repeat=3, progress=None):
+    """
+    Ejecuta el benchmark completo (o el subconjunto pedido).
+    :param names: Filtros a medir (por defecto, todos los de CASES)
+    :param sizes: Claves de SIZES
+    :param layouts: Claves de LAYOUTS
+    :param dtypes: Tipos de dato de entrada
+    :param repeat: Repeticiones medidas por caso (se queda la más rápida)
+    :param progress: Función opcional llamada con (clave, resultado) tras cada caso
+    :return: Diccionario {'environment': ..., 'results': {clave: resultado}}
+    """
+    names = names or list(CASES)
+    results = {}
+    for size in sizes or list(SIZES):
+        for layout in layouts or list(LAYOUTS):
+            for dtype in dtypes or list(DTYPES):
+                # Una imagen por combinación, compartida por todos los filtros
+                image = make_image(size, layout, dtype)
+                for name in names:
+                    key = case_key(name, size, layout, dtype)
+                    results[key] = run_case(name, image, repeat=repeat)
+                    if progress is not None:
+                        progress(key, results[key])
+                del image
+                gc.collect()
+    return {'environment': environment(), 'results': results}
+
+
+def compare(current, baseline, tolerance=0.15, min_seconds=1e-3):
+    """
+    Compara unos resultados con una referencia.
+    :param current: Resultado de `run_suite`
+    :param baseline: Resultado guardado previamente
+    :param tolerance: Aumento relativo de tiempo admitido antes de marcar una regresión
+    :param min_seconds: Por debajo de este tiempo las diferencias se consideran ruido
+    :return: Lista de diccionarios {'key', 'baseline', 'current', 'ratio', 'status'} donde
+             status es 'regression', 'improvement', 'ok', 'new' o 'broken'
+    """
+    rows = []
+    previous = baseline.get('results', {})
+    for key, result in current.get('results', {}).items():
+        old = previous.get(key)
+        if 'error' in result:
+            status = 'broken' if old and 'error' not in old else 'ok'
+            rows.append({'key': key, 'baseline': old and old.get('seconds'), 'current': None,
+                         'ratio': None, 'status': status})
+            continue
+        if not old or 'error' in old:
+            rows.append({'key': key, 'baseline': None, 'current': result['seconds'],
+                         'ratio': None, 'status': 'new'})
+            continue
+        ratio = result['seconds'] / old['seconds'] if old['seconds'] > 0 else 1.0
+        if max(result['seconds'], old['seconds']) < min_seconds:
+            status = 'ok'
+        elif ratio > 1 + tolerance:
+            status = 'regression'
+        elif ratio < 1 / (1 + tolerance):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append({'key': key, 'baseline': old['seconds'], 'current': result['seconds'],
+                     'ratio': ratio, 'status': status})
+    return rows
+
+
+def save(results, path):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.batch import TILED_MIN_PIXELS, load_steps, run_batch, throughput
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica un pipeline de filtros a todas las imágenes de un directorio o zip "
+        "usando un pool de procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Directorio o fichero .zip con las imágenes")
+        parser.add_argument('output', help="Directorio de salida")
+        parser.add_argument(
+            '--pipeline', required=True,
+            help='Pasos del pipeline en JSON (como el campo "filters" de /process-image/) '
+                 'o ruta a un fichero JSON',
+        )
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Procesos del pool (por defecto, uno por núcleo)")
+        parser.add_argument('--max-in-flight', type=int, default=None,
+                            help="Máximo de imágenes pendientes (por defecto, 2 por proceso)")
+        parser.add_argument('--format', default=None,
+                            help="Formato de salida (png, jpeg, webp...); por defecto el original")
+        parser.add_argument('--quality', type=int, default=90, help="Calidad JPEG/WebP")
+        parser.add_argument('--overwrite', action='store_true',
+                            help="Reprocesa también las imágenes que ya tienen salida")
+        parser.add_argument('--tiled-min-pixels', type=int, default=TILED_MIN_PIXELS,
+                            help="Píxeles desde los que un TIFF sin comprimir se procesa por "
+                                 "bandas mapeadas en memoria")
+        parser.add_argument('--report-every', type=int, default=100,
+                            help="Muestra el progreso cada N imágenes (0 para no mostrarlo)")
+
+    def handle(self, *args, **options):
+        try:
+            steps = load_steps(options['pipeline'])
+        except (ValueError, TypeError) as e:
+            raise CommandError(f"Pipeline no válido: {e}")
+
+        every = options['report_every']
+
+        def progress(result, stats):
+            if result['error']:
+                self.stderr.write(f"Error en {result['path']}: {result['error']}")
+            done = stats['processed'] + stats['errors']
+            if every and done % every == 0:
+                rate = throughput(stats)
+                self.stdout.write(
+                    f"{done} imágenes ({stats['errors']} errores) - "
+                    f"{rate['images_per_second']:.1f} img/s, "
+                    f"{rate['megapixels_per_second']:.1f} Mpx/s"
+                )
+
+        stats = run_batch(
+            options['source'], options['output'], steps,
+            workers=options['workers'], max_in_flight=options['max_in_flight'],
+            fmt=options['format'], quality=options['quality'],
+            overwrite=options['overwrite'], progress=progress,
+            tiled_min_pixels=options['tiled_min_pixels'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Procesadas {stats['processed']} imágenes, {stats['skipped']} saltadas, "
+            f"{stats['errors']} errores en {stats['elapsed']:.1f} s "
+            f"({stats['images_per_second']:.1f} img/s, "
+            f"{stats['megapixels_per_second']:.1f} Mpx/s, "
+            f"{stats['bytes'] / 1e6:.1f} MB escritos)"
+        ))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer import benchmark
+
+
+def _split(value, valid, label):
+    if not value:
+        return None
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    unknown = [item for item in items if item not in valid]
+    if unknown:
+        raise CommandError(f"{label} desconocidos: {', '.join(unknown)} "
+                           f"(disponibles: {', '.join(valid)})")
+    return items
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el rendimiento de los filtros (MP/s, tiempo y pico de memoria) y, opcionalmente, "
+        "lo compara con una referencia guardada en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filters', help="Filtros separados por comas (por defecto, todos)")
+        parser.add_argument('--sizes', help="Megapíxeles separados por comas: "
+                                            + ', '.join(benchmark.SIZES))
+        parser.add_argument('--layouts', help="gray, rgb, rgba (por defecto, todos)")
+        parser.add_argument('--dtypes', help="uint8, uint16, float32 (por defecto, todos)")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Repeticiones medidas por caso (se toma la más rápida)")
+        parser.add_argument('--output', help="Fichero JSON donde guardar los resultados")
+        parser.add_argument('--baseline', help="Resultados de referencia (JSON) para comparar")
+        parser.add_argument('--tolerance', type=float, default=0.15,
+                            help="Aumento relativo de tiempo admitido antes de marcar regresión")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Termina con error si hay regresiones")
+
+    def handle(self, *args, **options):
+        names = _split(options['filters'], list(benchmark.CASES), "Filtros")
+        sizes = _split(options['sizes'], list(benchmark.SIZES), "Tamaños")
+        layouts = _split(options['layouts'], list(benchmark.LAYOUTS), "Canales")
+        dtypes = _split(options['dtypes'], list(benchmark.DTYPES), "Tipos")
+        baseline = benchmark.load(options['baseline']) if options['baseline'] else None
+
+        def progress(key, result):
+            if 'error' in result:
+                self.stdout.write(f"{key:<36} no soportado ({result['error']})")
+                return
+            extra = result['extra_rss_mb']
+            self.stdout.write(
+                f"{key:<36} {result['seconds'] * 1000:9.1f} ms {result['mp_per_s']:9.1f} MP/s "
+                f"pico {result['peak_rss_mb']:8.1f} MB"
+                + (f" (+{extra:.1f} MB)" if extra is not None else "")
+                + f" reservado {result['peak_alloc_mb']:7.1f} MB"
+            )
+
+        results = benchmark.run_suite(names, sizes, layouts, dtypes,
+                                      repeat=options['repeat'], progress=progress)
+        if options['output']:
+            benchmark.save(results, options['output'])
+            self.stdout.write(f"Resultados guardados en {options['output']}")
+
+        if baseline is None:
+            return
+        rows = benchmark.compare(results, baseline, options['tolerance'])
+        flagged = [row for row in rows if row['status'] in ('regression', 'broken')]
+        for row in rows:
+            if row['status'] in ('regression', 'improvement'):
+                line = (f"{row['key']:<36} {row['baseline'] * 1000:9.1f} -> "
+                        f"{row['current'] * 1000:9.1f} ms (x{row['ratio']:.2f})")
+                style = self.style.ERROR if row['status'] == 'regression' else self.style.SUCCESS
+                self.stdout.write(style(line))
+            elif row['status'] == 'broken':
+                self.stdout.write(self.style.ERROR(f"{row['key']:<36} ya no funciona"))
+        self.stdout.write(f"{len(flagged)} regresiones de {len(rows)} casos "
+                          f"(tolerancia {options['tolerance']:.0%})")
+        if flagged and options['fail_on_regression']:
+            raise CommandError("Se detectaron regresiones de rendimiento")
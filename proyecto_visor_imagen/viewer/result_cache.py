@@ -0,0 +1,174 @@
+"""
+Caché de resultados de /process-image/: guarda la imagen ya codificada por (huella de la
+imagen de origen, firma de los filtros, codificación pedida), sobre cualquier backend del
+framework de caché de Django (locmem, ficheros, memcached...). Repetir unos ajustes ya
+vistos (activar y desactivar el negativo, volver al umbral 128...) se responde sin
+decodificar la imagen ni tocar NumPy.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.core.cache import InvalidCacheBackendError, caches
+
+# Cambiarla invalida todas las entradas guardadas (por ejemplo, si cambia un filtro)
+KEY_VERSION = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_ENTRY_BYTES = 32 * 1024 * 1024
+
+
+class ResultCache:
+    """
+    Resultados codificados sobre un alias de `settings.CACHES`.
+
+    Los backends de Django limitan el número de entradas o su caducidad, pero no los bytes:
+    cada proceso lleva un índice LRU de las entradas que ha escrito y borra las menos usadas
+    al superar `max_bytes`. Con un backend compartido (ficheros, memcached), cada proceso
+    aplica el presupuesto a sus propias entradas y todos aprovechan las de los demás.
+    """
+
+    def __init__(self, alias='default', max_bytes=DEFAULT_MAX_BYTES,
+                 max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES, timeout=None):
+        """
+        :param alias: Alias de la caché en settings.CACHES (None desactiva la caché)
+        :param max_bytes: Presupuesto en bytes de las entradas de este proceso
+        :param max_entry_bytes: Tamaño máximo de una entrada (las mayores no se guardan)
+        :param timeout: Caducidad en segundos (None usa la del alias)
+        """
+        self.alias = alias
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.timeout = timeout
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+        self.evictions = 0
+        self._index = OrderedDict()  # clave -> bytes, del menos al más reciente
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        """Backend de Django del alias, o None si la caché está desactivada o no existe."""
+        if not self.alias:
+            return None
+        try:
+            return caches[self.alias]
+        except InvalidCacheBackendError:
+            return None
+
+    @staticmethod
+    def key(source_key, signature, encoding):
+        """
+        Clave de una entrada (corta y sin espacios, válida también para memcached).
+        :param source_key: Huella de la imagen de origen
+        :param signature: Firma de los filtros (`FilterPipeline.signature()`)
+        :param encoding: Diccionario con todo lo que decide los bytes de salida (perfil,
+                         formato, calidad, Accept, tamaño de la previsualización...)
+        :return: Cadena
+        """
+        parts = json.dumps([KEY_VERSION, source_key, signature, encoding], sort_keys=True, default=str)
+        return 'viewer-result:' + hashlib.blake2b(parts.encode(), digest_size=20).hexdigest()
+
+    def get(self, key):
+        """Entrada guardada para la clave, o None."""
+        backend = self.backend
+        if backend is None:
+            return None
+        entry = backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                # El backend la expulsó por su cuenta (caducidad o MAX_ENTRIES)
+                nbytes = self._index.pop(key, None)
+                if nbytes is not None:
+                    self.current_bytes -= nbytes
+                return None
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """
+        Guarda una entrada (un diccionario con los bytes codificados en 'data').
+        :return: True si se guardó
+        """
+        backend = self.backend
+        if backend is None:
+            return False
+        nbytes = len(entry['data'])
+        if nbytes > self.max_entry_bytes or nbytes > self.max_bytes:
+            with self._lock:
+                self.rejected += 1
+            return False
+        if self.timeout is None:
+            backend.set(key, entry)
+        else:
+            backend.set(key, entry, self.timeout)
+        with self._lock:
+            self.current_bytes -= self._index.pop(key, 0)
+            self._index[key] = nbytes
+            self.current_bytes += nbytes
+            self.stores += 1
+            evicted = []
+            while self.current_bytes > self.max_bytes:
+                old_key, old_bytes = self._index.popitem(last=False)
+                self.current_bytes -= old_bytes
+                evicted.append(old_key)
+            self.evictions += len(evicted)
+        if evicted:
+            backend.delete_many(evicted)
+        return True
+
+    def clear(self):
+        """Borra las entradas escritas por este proceso."""
+        with self._lock:
+            keys = list(self._index)
+            self._index.clear()
+            self.current_bytes = 0
+        backend = self.backend
+        if backend is not None and keys:
+            backend.delete_many(keys)
+
+    def stats(self):
+        """Contadores de uso de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'alias': self.alias if self.backend is not None else None,
+                'entries': len(self._index),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None,
+                'stores': self.stores,
+                'rejected': self.rejected,
+                'evictions': self.evictions,
+            }
+
+
+# Caché compartida por las vistas (ver VIEWER_RESULT_CACHE_* en settings)
+RESULT_CACHE = ResultCache()
+
+
+def configure(alias=None, max_bytes=None, max_entry_bytes=None, timeout=None):
+    """
+    Ajusta la caché de resultados.
+    :param alias: Alias de settings.CACHES (None deja el actual; '' desactiva la caché)
+    :param max_bytes: Presupuesto en bytes (None deja el actual)
+    :param max_entry_bytes: Tamaño máximo de una entrada (None deja el actual)
+    :param timeout: Caducidad en segundos (None deja la actual)
+    """
+    if alias is not None:
+        RESULT_CACHE.alias = alias or None
+    if max_bytes is not None:
+        RESULT_CACHE.max_bytes = max(0, int(max_bytes))
+    if max_entry_bytes is not None:
+        RESULT_CACHE.max_entry_bytes = max(0, int(max_entry_bytes))
+    if timeout is not None:
+        RESULT_CACHE.timeout = int(timeout)
@@ -1,3 +1,619 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import BytesIO
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+from PIL import Image
+
+from .Filter_Lib.Blend import ALPHA_ONE, blend
+from .Filter_Lib.Convolution import convolve, convolve_separable, gaussian_kernel
+from .Filter_Lib.Encoders import negotiate
+from .Filter_Lib.Enhancement import clahe, equalize_curve, levels_curve
+from .Filter_Lib.Filters import ImageFilters
+from .Filter_Lib.Lazy import tile_halo
+from .Filter_Lib.Pipeline import FilterPipeline
+from .Filter_Lib.Resample import resize
+from .Filter_Lib.Rotation import rotate, rotation_geometry
+from .Filter_Lib.Store import ImageStore
+from .Filter_Lib.Threshold import multi_otsu_thresholds, otsu_threshold
+from .Filter_Lib.Tiling import TiledProcessor
+from .batch import TILED_MIN_PIXELS, run_batch
+from .result_cache import RESULT_CACHE
+
+
+def _formula(op, values, **params):
+    """Fórmula de cada operación puntual en la escala 0-255 (brillo y contraste en float32)."""
+    if op == 'brightness':
+        return np.clip(values.astype(np.float32) * params['factor'], 0, 255)
+    if op == 'contrast':
+        return np.clip((values.astype(np.float32) - 128) * params['factor'] + 128, 0, 255)
+    if op == 'negative':
+        return 255 - values
+    if op == 'highlight':
+        return np.where(values > 128, np.clip(values * 1.5, 0, 255), values)
+    raise ValueError(op)
+
+
+POINT_CASES = (
+    ('brightness', {'factor': 1.3}),
+    ('brightness', {'factor': 0.6}),
+    ('contrast', {'factor': 1.4}),
+    ('contrast', {'factor': 0.5}),
+    ('negative', {}),
+    ('highlight', {'mode': 'light'}),
+)
+
+
+class PointOperationTests(SimpleTestCase):
+    """Las LUT de 8 y 16 bits y la evaluación directa en float32 siguen las fórmulas."""
+
+    def test_uint8(self):
+        image = np.arange(256, dtype=np.uint8).reshape(16, 16)
+        for op, params in POINT_CASES:
+            with self.subTest(op=op, **params):
+                # La tabla de 8 bits trunca al guardar en uint8
+                expected = _formula(op, image.astype(np.float64), **params).astype(np.uint8)
+                result = ImageFilters.apply_point(image, op, **params)
+                np.testing.assert_array_equal(result, expected)
+
+    def test_uint16(self):
+        image = np.arange(65536, dtype=np.uint16).reshape(256, 256)
+        for op, params in POINT_CASES:
+            with self.subTest(op=op, **params):
+                expected = np.rint(_formula(op, image / 257, **params) * 257).astype(np.uint16)
+                result = ImageFilters.apply_point(image, op, **params)
+                np.testing.assert_array_equal(result, expected)
+
+    def test_float32(self):
+        image = np.linspace(0, 1, 4096, dtype=np.float32).reshape(64, 64)
+        for op, params in POINT_CASES:
+            with self.subTest(op=op, **params):
+                expected = _formula(op, image.astype(np.float64) * 255, **params) / 255
+                result = ImageFilters.apply_point(image, op, **params)
+                self.assertEqual(result.dtype, np.float32)
+                np.testing.assert_allclose(result, expected, atol=1e-5)
+
+
+class AreaResizeTests(SimpleTestCase):
+    """Reducción por área en los tres tipos, también con ejes que se amplían."""
+
+    def _image(self, dtype):
+        image = np.random.default_rng(3).random((60, 80, 3))
+        if dtype == np.float32:
+            return image.astype(np.float32)
+        return (image * (255 if dtype == np.uint8 else 65535)).astype(dtype)
+
+    def test_upscale_both_axes(self):
+        # Al ampliar, cada píxel de salida promedia un único píxel: igual que el vecino
+        for dtype in (np.uint8, np.uint16, np.float32):
+            with self.subTest(dtype=dtype.__name__):
+                image = self._image(dtype)
+                result = resize(image, (120, 200), mode='area')
+                self.assertEqual(result.dtype, dtype)
+                np.testing.assert_array_equal(result, resize(image, (120, 200), mode='nearest'))
+
+    def test_mixed_axes(self):
+        for dtype in (np.uint8, np.uint16, np.float32):
+            with self.subTest(dtype=dtype.__name__):
+                image = self._image(dtype)
+                # Filas duplicadas y columnas promediadas de dos en dos
+                result = resize(image, (120, 40), mode='area')
+                pairs = image.astype(np.float64).reshape(60, 40, 2, 3).sum(axis=2)
+                if dtype == np.float32:
+                    expected = np.repeat(pairs / 2, 2, axis=0)
+                    np.testing.assert_allclose(result, expected, atol=1e-6)
+                else:
+                    expected = np.repeat((pairs + 1) // 2, 2, axis=0).astype(dtype)
+                    np.testing.assert_array_equal(result, expected)
+                # Y al revés: filas promediadas y columnas ampliadas
+                self.assertEqual(resize(image, (30, 160), mode='area').shape, (30, 160, 3))
+
+    def test_area_mosaic_with_small_tiles(self):
+        tile = self._image(np.uint8)
+        mosaic = ImageFilters.create_mosaic([tile] * 4, tile_size=300, mode='area')
+        self.assertEqual(mosaic.dtype, np.uint8)
+        self.assertGreater(mosaic.shape[0], 600)
+
+
+class ResizeModeTests(SimpleTestCase):
+    """Los tres modos de `Resample.resize` frente a su definición directa."""
+
+    def setUp(self):
+        self.image = np.random.default_rng(5).integers(0, 256, (12, 18, 3)).astype(np.uint8)
+
+    def test_nearest_integer_factor(self):
+        result = resize(self.image, (24, 54), mode='nearest')
+        np.testing.assert_array_equal(result, self.image.repeat(2, axis=0).repeat(3, axis=1))
+
+    def test_bilinear(self):
+        constant = np.full((10, 15, 3), 77, dtype=np.uint8)
+        np.testing.assert_array_equal(resize(constant, (23, 7), mode='bilinear'), 77)
+        # Una rampa lineal sigue siendo lineal por dentro (los extremos replican el borde)
+        ramp = np.tile(np.arange(0, 200, 10, dtype=np.float32) / 255, (6, 1))
+        result = resize(ramp, (6, 40), mode='bilinear')
+        np.testing.assert_allclose(np.diff(result[:, 1:-1], axis=1), 5 / 255, atol=1e-6)
+
+    def test_area_block_mean(self):
+        # Reducir por un factor entero es la media redondeada de cada bloque 2x3
+        for dtype, scale in ((np.uint8, 1), (np.uint16, 257), (np.float32, 1 / 255)):
+            with self.subTest(dtype=dtype.__name__):
+                image = (self.image.astype(np.float64) * scale).astype(dtype)
+                result = resize(image, (6, 6), mode='area')
+                means = image.astype(np.float64).reshape(6, 2, 6, 3, 3).mean(axis=(1, 3))
+                self.assertEqual(result.dtype, dtype)
+                if dtype == np.float32:
+                    np.testing.assert_allclose(result, means, atol=1e-6)
+                else:
+                    np.testing.assert_array_equal(result, np.floor(means + 0.5))
+
+    def test_area_upscale(self):
+        result = resize(self.image, (24, 54), mode='area')
+        np.testing.assert_array_equal(result, self.image.repeat(2, axis=0).repeat(3, axis=1))
+
+    def test_mosaic_frame(self):
+        tiles = [np.full((8, 8, 3), 100 + i, dtype=np.uint8) for i in range(4)]
+        mosaic = ImageFilters.create_mosaic(tiles, color_frame='red', frame_size=2, tile_size=8)
+        self.assertEqual(mosaic.shape, (22, 22, 3))
+        np.testing.assert_array_equal(mosaic[0, 0], (255, 0, 0))
+        np.testing.assert_array_equal(mosaic[2:10, 2:10], 100)
+        np.testing.assert_array_equal(mosaic[12:20, 12:20], 103)
+
+
+class RotationTests(SimpleTestCase):
+    """Giros exactos de 90° y ángulos arbitrarios con el mapa inverso."""
+
+    def setUp(self):
+        self.image = np.random.default_rng(6).integers(0, 256, (12, 18, 3)).astype(np.uint8)
+
+    def test_quarter_turns(self):
+        for dtype, scale in ((np.uint8, 1), (np.uint16, 257), (np.float32, 1 / 255)):
+            image = (self.image.astype(np.float64) * scale).astype(dtype)
+            for angle in (0, 90, 180, 270):
+                with self.subTest(dtype=dtype.__name__, angle=angle):
+                    result = rotate(image, angle)
+                    self.assertEqual(result.dtype, dtype)
+                    np.testing.assert_array_equal(result, np.rot90(image, angle // 90))
+        np.testing.assert_array_equal(rotate(self.image, 360), self.image)
+
+    def test_arbitrary_angle(self):
+        constant = np.full((20, 30, 3), 200, dtype=np.uint8)
+        for angle in (30, 45, -110):
+            with self.subTest(angle=angle):
+                result = rotate(constant, angle, cval=7)
+                self.assertEqual(result.shape[:2], rotation_geometry(constant.shape, angle)[0])
+                # Las esquinas del lienzo quedan fuera de la imagen; el centro, dentro
+                np.testing.assert_array_equal(result[0, 0], 7)
+                np.testing.assert_array_equal(result[-1, -1], 7)
+                center_y, center_x = result.shape[0] // 2, result.shape[1] // 2
+                np.testing.assert_array_equal(result[center_y - 3:center_y + 3,
+                                                     center_x - 3:center_x + 3], 200)
+
+    def test_round_trip(self):
+        # Girar y deshacer el giro recupera el centro salvo el redondeo de la interpolación
+        rows, cols = np.mgrid[0:40, 0:50]
+        image = (cols * 3 + rows * 2).astype(np.uint8)
+        result = rotate(rotate(image, 30, resize=False), -30, resize=False)
+        np.testing.assert_allclose(result[12:28, 15:35], image[12:28, 15:35], atol=1)
+
+
+def _reference_convolve(image, kernel):
+    """Convolución en float64 con bordes reflejados (sin repetir el borde)."""
+    kernel = np.asarray(kernel, dtype=np.float64)[::-1, ::-1]
+    ry, rx = kernel.shape[0] // 2, kernel.shape[1] // 2
+    padded = np.pad(image.astype(np.float64), ((ry, ry), (rx, rx)), mode='reflect')
+    height, width = image.shape
+    return sum(kernel[i, j] * padded[i:i + height, j:j + width]
+               for i in range(kernel.shape[0]) for j in range(kernel.shape[1]))
+
+
+class ConvolutionTests(SimpleTestCase):
+    """Las rutas directa, separable y FFT de `Convolution` calculan la misma convolución."""
+
+    def setUp(self):
+        self.image = np.random.default_rng(14).random((20, 25)).astype(np.float32)
+
+    def test_separable_matches_direct(self):
+        taps = gaussian_kernel(1.0, 2)
+        kernel = np.outer(taps, taps)
+        separable = convolve_separable(self.image, taps, taps, dtype=np.float32)
+        np.testing.assert_allclose(separable, _reference_convolve(self.image, kernel), atol=1e-6)
+        np.testing.assert_array_equal(convolve(self.image, kernel, dtype=np.float32), separable)
+        # Con un kernel 3x3 `convolve` no separa: la ruta directa debe coincidir con la separable
+        taps = np.array([1.0, 2.0, 1.0]) / 4
+        direct = convolve(self.image, np.outer(taps, [1.0, 0.0, -1.0]), dtype=np.float32)
+        np.testing.assert_allclose(
+            direct, convolve_separable(self.image, taps, [1.0, 0.0, -1.0], dtype=np.float32),
+            atol=1e-6)
+
+    def test_direct_and_fft_match_reference(self):
+        rng = np.random.default_rng(15)
+        for size in (3, 9):
+            with self.subTest(size=size):
+                # Kernels asimétricos y no separables: 3x3 va por la ruta directa y 9x9 por FFT
+                kernel = rng.random((size, size))
+                kernel /= kernel.sum()
+                result = convolve(self.image, kernel, dtype=np.float32)
+                np.testing.assert_allclose(result, _reference_convolve(self.image, kernel),
+                                           atol=1e-5)
+
+    def test_uint8_rounding(self):
+        image = (self.image * 255).astype(np.uint8)
+        taps = gaussian_kernel(1.5)
+        result = convolve_separable(image, taps, taps)
+        self.assertEqual(result.dtype, np.uint8)
+        expected = _reference_convolve(image, np.outer(taps, taps))
+        np.testing.assert_allclose(result, np.floor(expected + 0.5), atol=1)
+
+
+class BlendTests(SimpleTestCase):
+    """Mezcla en punto fijo: alfa cuantizado a 1/256 y redondeo al entero más cercano."""
+
+    def test_blend(self):
+        rng = np.random.default_rng(9)
+        base = rng.integers(0, 256, (10, 12, 3)).astype(np.float64)
+        overlay = rng.integers(0, 256, (10, 12, 3)).astype(np.float64)
+        weight = round(0.3 * ALPHA_ONE) / ALPHA_ONE
+        for dtype, scale in ((np.uint8, 1), (np.uint16, 257), (np.float32, 1 / 255)):
+            with self.subTest(dtype=dtype.__name__):
+                a, b = (base * scale).astype(dtype), (overlay * scale).astype(dtype)
+                np.testing.assert_array_equal(blend(a, b, 0), a)
+                np.testing.assert_array_equal(blend(a, b, 1), b)
+                result = blend(a, b, 0.3)
+                self.assertEqual(result.dtype, dtype)
+                if dtype == np.float32:
+                    expected = a * np.float32(0.7) + b * np.float32(0.3)
+                    np.testing.assert_allclose(result, expected, atol=1e-6)
+                else:
+                    expected = a * (1 - weight) + b.astype(np.float64) * weight
+                    np.testing.assert_array_equal(result, np.floor(expected + 0.5))
+
+    def test_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            blend(np.zeros((4, 4, 3), np.uint8), np.zeros((4, 5, 3), np.uint8), 0.5)
+
+
+class EnhancementTests(SimpleTestCase):
+    """Curvas de niveles y ecualización, y CLAHE con una sola tesela sin recorte."""
+
+    def setUp(self):
+        self.gray = np.random.default_rng(18).integers(60, 140, (64, 64)).astype(np.uint8)
+        self.counts = np.bincount(self.gray.reshape(-1), minlength=256)
+
+    def test_curves(self):
+        levels = levels_curve(self.counts, clip=0)
+        self.assertEqual((levels[60], levels[139]), (0, 255))
+        equalized = equalize_curve(self.counts)
+        self.assertEqual((equalized[60], equalized[139]), (0, 255))
+        self.assertTrue(np.all(np.diff(equalized) >= 0))
+        # Un solo nivel no tiene rango que estirar: ambas curvas son la identidad
+        flat = np.bincount([128], minlength=256)
+        np.testing.assert_array_equal(equalize_curve(flat), np.arange(256))
+        np.testing.assert_array_equal(levels_curve(flat), np.arange(256))
+
+    def test_clahe_single_tile_is_global_equalization(self):
+        table = np.cumsum(self.counts) * (255 / self.gray.size)
+        expected = np.floor(table[self.gray] + 0.5)
+        out = np.empty_like(self.gray)
+        clahe(self.gray, out, tiles=1, clip_limit=1000)
+        np.testing.assert_array_equal(out, expected)
+        # En color la diferencia de luminancia se suma a los tres canales por igual
+        color = np.repeat(self.gray[..., None], 3, axis=2)
+        out = np.empty_like(color)
+        clahe(color, out, tiles=1, clip_limit=1000)
+        np.testing.assert_allclose(out, np.repeat(expected[..., None], 3, axis=2), atol=1)
+
+
+class PipelineTests(SimpleTestCase):
+    """Los pasos fusionados en una LUT dan lo mismo que aplicarlos uno a uno."""
+
+    STEPS = [
+        {'type': 'brightness', 'brightness_factor': 1.2},
+        {'type': 'contrast', 'contrast_factor': 0.8},
+        {'type': 'rgb', 'red': 'false'},
+        {'type': 'highlight', 'highlight_mode': 'dark'},
+        {'type': 'negative'},
+    ]
+
+    def _one_by_one(self, image):
+        image = ImageFilters.adjust_brightness(image, 1.2)
+        image = ImageFilters.adjust_contrast(image, 0.8)
+        image = ImageFilters.apply_rgb_filter(image, red=False)
+        image = ImageFilters.highlight_zones(image, 'dark')
+        return ImageFilters.negative_image(image)
+
+    def test_fused_matches_steps(self):
+        rng = np.random.default_rng(0)
+        for dtype, top in ((np.uint8, 256), (np.uint16, 65536)):
+            with self.subTest(dtype=dtype.__name__):
+                image = rng.integers(0, top, (40, 50, 3)).astype(dtype)
+                result = FilterPipeline(self.STEPS).apply(image.copy())
+                np.testing.assert_array_equal(result, self._one_by_one(image))
+
+    def test_float32_matches_steps(self):
+        image = np.random.default_rng(1).random((40, 50, 3), dtype=np.float32)
+        result = FilterPipeline(self.STEPS).apply(image.copy())
+        np.testing.assert_allclose(result, self._one_by_one(image), atol=1e-5)
+
+    def test_signature_ignores_spelling(self):
+        first = FilterPipeline([{'type': 'brightness', 'brightness_factor': '1.20'}])
+        second = FilterPipeline([('brightness', {'brightness_factor': 1.2})])
+        self.assertEqual(first.signature(), second.signature())
+
+
+class BinaryViewTests(SimpleTestCase):
+    """La máscara de solo lectura de output='view' se puede encadenar con otros pasos."""
+
+    def test_step_after_view(self):
+        image = np.random.default_rng(4).integers(0, 256, (30, 40, 3)).astype(np.uint8)
+        steps = [{'type': 'binary', 'binary_output': 'view'}, {'type': 'negative'},
+                 {'type': 'blur', 'blur_radius': 1.0}]
+        mask = ImageFilters.binarize_image(image, output='view')
+        self.assertFalse(mask.flags.writeable)
+        expected = ImageFilters.blur_image(ImageFilters.negative_image(np.array(mask)), 1.0)
+        pipeline = FilterPipeline(steps)
+        np.testing.assert_array_equal(pipeline.apply(image.copy(), inplace=True), expected)
+        np.testing.assert_array_equal(pipeline.lazy(image).compute(), expected)
+
+
+class LazyImageTests(SimpleTestCase):
+    """El grafo diferido (con el recorte adelantado) coincide con la ejecución directa."""
+
+    def test_lazy_matches_eager(self):
+        image = np.random.default_rng(2).integers(0, 256, (120, 160, 3)).astype(np.uint8)
+        cases = (
+            [{'type': 'brightness', 'brightness_factor': 1.3}, {'type': 'negative'}],
+            [{'type': 'contrast', 'contrast_factor': 1.5},
+             {'type': 'zoom', 'zoom_scale': 2.0, 'zoom_x': 60, 'zoom_y': 50}],
+            [{'type': 'blur', 'blur_radius': 2.0},
+             {'type': 'zoom', 'zoom_scale': 3.0, 'zoom_x': 40, 'zoom_y': 90}],
+        )
+        for steps in cases:
+            with self.subTest(steps=[step['type'] for step in steps]):
+                pipeline = FilterPipeline(steps)
+                eager = pipeline.apply(image.copy())
+                lazy = pipeline.lazy(image).compute()
+                np.testing.assert_array_equal(lazy, eager)
+
+
+class TiledProcessorTests(SimpleTestCase):
+    """Procesar por teselas da lo mismo que procesar la imagen completa."""
+
+    TILINGS = ((7, None), (9, 11), (1000, None))
+
+    def setUp(self):
+        self.image = np.random.default_rng(3).integers(0, 256, (40, 50, 3)).astype(np.uint8)
+
+    def test_process_matches_pipeline(self):
+        cases = (
+            [{'type': 'blur', 'blur_radius': 1.5}],
+            [{'type': 'blur', 'blur_radius': 2, 'blur_mode': 'box'}, {'type': 'sharpen'}],
+            [{'type': 'brightness', 'brightness_factor': 1.2}, {'type': 'edges'}],
+        )
+        for steps in cases:
+            pipeline = FilterPipeline(steps)
+            expected = pipeline.apply(self.image.copy())
+            for tile_rows, tile_cols in self.TILINGS:
+                with self.subTest(steps=[step['type'] for step in steps], tile_rows=tile_rows,
+                                  tile_cols=tile_cols):
+                    processor = TiledProcessor(tile_rows, tile_cols)
+                    result = processor.process(self.image, pipeline, halo=tile_halo(pipeline.steps))
+                    np.testing.assert_array_equal(result, expected)
+
+    def test_resize_and_rotate_independent_of_tiling(self):
+        whole = TiledProcessor(1000)
+        resized = whole.resize(self.image, (23, 71))
+        rotated = whole.rotate(self.image, 30)
+        # El motor por teselas interpola en float32 y el de memoria en enteros: 1 nivel
+        np.testing.assert_allclose(resized, resize(self.image, (23, 71), mode='bilinear'), atol=1)
+        np.testing.assert_allclose(rotated, rotate(self.image, 30), atol=1)
+        for tile_rows, tile_cols in self.TILINGS[:2]:
+            with self.subTest(tile_rows=tile_rows, tile_cols=tile_cols):
+                processor = TiledProcessor(tile_rows, tile_cols)
+                np.testing.assert_array_equal(processor.resize(self.image, (23, 71)), resized)
+                np.testing.assert_array_equal(processor.rotate(self.image, 30), rotated)
+
+    def test_tiff_source_and_destination(self):
+        try:
+            import tifffile
+        except ImportError:
+            self.skipTest('tifffile no está instalado')
+        with tempfile.TemporaryDirectory() as directory:
+            source = f'{directory}/source.tif'
+            tifffile.imwrite(source, self.image, photometric='rgb')
+            pipeline = FilterPipeline([{'type': 'blur', 'blur_radius': 1.0}])
+            TiledProcessor(8).process(source, pipeline, out=f'{directory}/out.tif',
+                                      halo=tile_halo(pipeline.steps))
+            np.testing.assert_array_equal(tifffile.imread(f'{directory}/out.tif'),
+                                          pipeline.apply(self.image.copy()))
+
+
+class BatchTests(SimpleTestCase):
+    """El lote da lo mismo por bandas que con la imagen completa y se puede reanudar."""
+
+    STEPS = [{'type': 'blur', 'blur_radius': 1.0}, {'type': 'negative'}]
+
+    def test_tiled_matches_full(self):
+        try:
+            import tifffile
+        except ImportError:
+            self.skipTest('tifffile no está instalado')
+        image = np.random.default_rng(15).integers(0, 256, (40, 50, 3)).astype(np.uint8)
+        expected = FilterPipeline(self.STEPS).apply(image.copy())
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'source')
+            os.makedirs(os.path.join(source, 'sub'))
+            tifffile.imwrite(os.path.join(source, 'scan.tif'), image, photometric='rgb')
+            Image.fromarray(image).save(os.path.join(source, 'sub', 'photo.png'))
+
+            for name, tiled_min_pixels in (('full', TILED_MIN_PIXELS), ('tiled', 1)):
+                with self.subTest(mode=name):
+                    output = os.path.join(directory, name)
+                    stats = run_batch(source, output, self.STEPS, workers=1,
+                                      tiled_min_pixels=tiled_min_pixels)
+                    self.assertEqual((stats['processed'], stats['errors']), (2, 0))
+                    np.testing.assert_array_equal(
+                        tifffile.imread(os.path.join(output, 'scan.tif')), expected)
+                    with Image.open(os.path.join(output, 'sub', 'photo.png')) as result:
+                        np.testing.assert_array_equal(np.asarray(result), expected)
+                    # Sin temporales a medias, y al reanudar no se repite nada
+                    leftovers = [file_name for _, _, files in os.walk(output)
+                                 for file_name in files if file_name.endswith('.tmp')]
+                    self.assertEqual(leftovers, [])
+                    stats = run_batch(source, output, self.STEPS, workers=1)
+                    self.assertEqual((stats['processed'], stats['skipped']), (0, 2))
+
+
+class OtsuTests(SimpleTestCase):
+    """Otsu y multi-Otsu frente a una búsqueda exhaustiva sobre un histograma fijo."""
+
+    @staticmethod
+    def _histogram():
+        levels = np.arange(256)
+        peaks = ((40, 12, 3000), (120, 18, 2000), (200, 10, 2500))
+        counts = sum(weight * np.exp(-0.5 * ((levels - mean) / sigma) ** 2)
+                     for mean, sigma, weight in peaks)
+        return np.rint(counts).astype(np.int64)
+
+    @staticmethod
+    def _between_class(counts, thresholds):
+        # sum(S_k^2 / N_k) de las clases [0, t1], (t1, t2], ..., (tn, 255]
+        levels = np.arange(len(counts))
+        bounds = [0] + [t + 1 for t in thresholds] + [len(counts)]
+        score = 0.0
+        for start, stop in zip(bounds, bounds[1:]):
+            pixels = counts[start:stop].sum()
+            if pixels == 0:
+                return -np.inf
+            score += (counts[start:stop] * levels[start:stop]).sum() ** 2 / pixels
+        return score
+
+    def test_otsu(self):
+        counts = self._histogram()
+        expected = max(range(255), key=lambda t: self._between_class(counts, [t]))
+        self.assertEqual(otsu_threshold(counts), expected)
+
+    def test_multi_otsu(self):
+        counts = self._histogram()
+        expected = max(((a, b) for a in range(255) for b in range(a + 1, 255)),
+                       key=lambda pair: self._between_class(counts, list(pair)))
+        self.assertEqual(multi_otsu_thresholds(counts, classes=3), list(expected))
+        self.assertEqual(multi_otsu_thresholds(counts, classes=2), [otsu_threshold(counts)])
+
+
+class OtsuCacheTests(SimpleTestCase):
+    """Con clave (histograma cacheado) y sin ella, Otsu usa la misma luminancia."""
+
+    def test_same_threshold_with_and_without_key(self):
+        rng = np.random.default_rng(6)
+        for dtype, top in ((np.uint8, 255), (np.uint16, 65535)):
+            for classes in (2, 3):
+                with self.subTest(dtype=dtype.__name__, classes=classes):
+                    image = (rng.beta(2, 5, (90, 120, 3)) * top).astype(dtype)
+                    key = f'otsu-test-{dtype.__name__}-{classes}'
+                    self.assertEqual(ImageFilters.threshold_levels(image, classes, key=key),
+                                     ImageFilters.threshold_levels(image, classes))
+                    np.testing.assert_array_equal(
+                        ImageFilters.binarize_image(image, method='otsu', classes=classes, key=key),
+                        ImageFilters.binarize_image(image, method='otsu', classes=classes))
+
+
+class ImageStoreTests(SimpleTestCase):
+    """Las imágenes que salen de la memoria se vuelcan a disco y se recuperan iguales."""
+
+    def test_spill_round_trip(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            first = np.arange(64 * 64 * 3, dtype=np.uint16).reshape(64, 64, 3)
+            second = np.full((64, 64, 3), 7, dtype=np.uint16)
+            store = ImageStore(max_bytes=first.nbytes + 1, spill_dir=spill_dir)
+            first_id = store.put(first, 'a' * 32)
+            store.put(second, 'b' * 32)
+
+            self.assertEqual(store.stats()['spills'], 1)
+            self.assertIn(first_id, store)
+            restored = store.get(first_id)
+            np.testing.assert_array_equal(restored, first)
+            self.assertEqual(restored.dtype, np.uint16)
+            self.assertFalse(restored.flags.writeable)
+            self.assertEqual(store.stats()['disk_hits'], 1)
+            self.assertIsNone(store.get('c' * 32))
+
+
+class EncoderNegotiationTests(SimpleTestCase):
+
+    def test_negotiate(self):
+        cases = (
+            # (Accept, perfil, alfa, formato esperado)
+            (None, 'preview', False, 'jpeg'),
+            (None, 'export', False, 'png'),
+            ('*/*', 'preview', False, 'jpeg'),
+            ('image/webp,image/*;q=0.8', 'preview', False, 'webp'),
+            ('image/png', 'preview', False, 'png'),
+            ('image/jpeg', 'export', True, 'png'),
+            ('image/webp;q=0, text/html', 'export', False, 'png'),
+            ('image/jpeg;q=0.5, image/webp;q=0.9', 'export', False, 'webp'),
+        )
+        for accept, profile, alpha, expected in cases:
+            with self.subTest(accept=accept, profile=profile, alpha=alpha):
+                self.assertEqual(negotiate(accept, profile, alpha), expected)
+
+
+class ProcessImageViewTests(SimpleTestCase):
+
+    def setUp(self):
+        RESULT_CACHE.clear()
+        buffered = BytesIO()
+        Image.new('RGB', (32, 24), (200, 80, 20)).save(buffered, format='PNG')
+        self.png = buffered.getvalue()
+
+    def _post_raw(self, query):
+        return self.client.post(f'/process-image/?{query}', data=self.png, content_type='image/png')
+
+    def test_result_cache_miss_then_hit(self):
+        first = self._post_raw('filter_type=negative')
+        second = self._post_raw('filter_type=negative')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json()['processed_image'], second.json()['processed_image'])
+        # Otros ajustes son otra entrada
+        self.assertEqual(self._post_raw('filter_type=brightness&brightness_factor=1.5')['X-Cache'], 'MISS')
+
+    def test_unknown_image_id(self):
+        response = self.client.post('/process-image/', {'image_id': 'f' * 32, 'filter_type': 'negative'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_binary_response(self):
+        response = self._post_raw('filter_type=negative&response=binary&format=png')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        pixels = np.asarray(Image.open(BytesIO(response.content)))
+        np.testing.assert_array_equal(pixels[0, 0], (55, 175, 235))
+
+    def test_malformed_filter_parameters(self):
+        queries = (
+            'filter_type=pipeline&filters=[{"type":',
+            'filter_type=pipeline&filters=[{"type":"sepia"}]',
+            'filter_type=pipeline&filters=[{"type":"brightness","brightness_factor":"x"}]',
+            'filter_type=pipeline&filters=5',
+            'filter_type=brightness&brightness_factor=bright',
+            'filter_type=4mosaic&mosaic_rows=two',
+            'filter_type=4mosaic&resample=cubic',
+            'filter_type=4mosaic&frame_color=nocolor',
+            'filter_type=merge&alpha=half',
+        )
+        for query in queries:
+            with self.subTest(query=query):
+                response = self._post_raw(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_area_mosaic(self):
+        response = self._post_raw('filter_type=4mosaic&resample=area&tile_size=100')
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_encoding(self):
+        for query in ('format=gif', 'profile=print', 'png_strategy=best', 'quality=high',
+                      'png_compress_level=9.5'):
+            with self.subTest(query=query):
+                response = self._post_raw(f'filter_type=negative&{query}')
+                self.assertEqual(response.status_code, 400)
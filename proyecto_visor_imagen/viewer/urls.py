@@ -6,4 +6,7 @@ urlpatterns = [
     path('editor/', views.editor, name='editor'),
     path('process-image/', views.process_image, name='process_image'),
     path('generate-histogram/', views.generate_histogram, name='generate_histogram'),
+    path('region-stats/', views.region_stats, name='region_stats'),
+    path('upload-image/', views.upload_image, name='upload_image'),
+    path('stats/', views.server_stats, name='server_stats'),
 ]
\ No newline at end of file
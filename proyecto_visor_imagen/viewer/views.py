@@ -1,14 +1,156 @@
 import os
 import base64
 import json
-import numpy as np
-import matplotlib.pyplot as plt
 from io import BytesIO
 from PIL import Image
 from django.shortcuts import render
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from .Filter_Lib.Cache import bytes_digest
+from .Filter_Lib.Dtypes import pil_to_array
+from .Filter_Lib.Encoders import FORMATS, PNG_STRATEGIES, PROFILES, encode, encoder_stats, negotiate
 from .Filter_Lib.Filters import ImageFilters
+from .Filter_Lib.Mosaic import frame_color_rgb
+from .Filter_Lib.Pipeline import FilterPipeline, FILTER_PARAMS
+from .Filter_Lib.Preview import PREVIEW_MAX_SIDE, clamp_side, get_proxy
+from .Filter_Lib.Resample import RESAMPLE_MODES
+from .Filter_Lib.Store import IMAGE_STORE
+from .result_cache import RESULT_CACHE
+
+# Tipos de contenido que el cliente puede enviar como cuerpo de la petición (la imagen
+# tal cual, sin formulario); los parámetros del filtro van entonces en la URL
+RAW_IMAGE_TYPES = ('image/', 'application/octet-stream')
+
+# Tipos de respuesta que entiende /process-image/: JSON con la imagen en base64 (por
+# defecto) o el propio fichero de imagen con los metadatos en cabeceras
+RESPONSE_TYPES = ('application/json',) + tuple(mime_type for _, mime_type in FORMATS.values())
+
+
+def _is_raw_upload(request):
+    """True si el cuerpo de la petición es directamente el fichero de imagen."""
+    return request.content_type.startswith(RAW_IMAGE_TYPES)
+
+
+def _request_params(request):
+    """Campos del filtro: los del formulario o, si la imagen llega como cuerpo, los de la URL."""
+    return request.GET if _is_raw_upload(request) else request.POST
+
+
+def _image_bytes(request, params, field='image_data'):
+    """
+    Bytes del fichero de imagen enviado en un campo de la petición, en cualquiera de sus
+    formas: fichero de un formulario multipart, cuerpo de la petición (solo el campo
+    principal) o data URL en base64.
+    :param request: Petición
+    :param params: Campos del filtro (`_request_params`)
+    :param field: Nombre del campo
+    :return: bytes del fichero, o None si la petición no lo incluye
+    """
+    if field == 'image_data' and _is_raw_upload(request):
+        return request.body or None
+    upload = request.FILES.get(field)
+    if upload is not None:
+        return upload.read()
+    image_data = params.get(field)
+    if not image_data:
+        return None
+    # data:image/png;base64,... (se admite también el base64 sin prefijo)
+    _, _, imgstr = image_data.rpartition(';base64,')
+    return base64.b64decode(imgstr)
+
+
+class _UnknownImage(LookupError):
+    """Id de imagen que no está en el almacén (expulsada o de otra instancia)."""
+
+
+def _load_image(request, params, field='image_data'):
+    """
+    Imagen de un campo de la petición: por su id en el almacén (`image_data` -> `image_id`,
+    `second_image_data` -> `second_image_id`, `image_data_N` -> `image_id_N`) o por el
+    fichero enviado. La decodificación se aplaza hasta que se necesitan los píxeles.
+    :return: (huella de la imagen, función que devuelve el array, True si el array es
+             nuevo y se puede modificar), o None si la petición no incluye la imagen
+    :raises _UnknownImage: si el id no está en el almacén
+    """
+    image_id = params.get(field.replace('image_data', 'image_id'))
+    if image_id:
+        if image_id not in IMAGE_STORE:
+            raise _UnknownImage(image_id)
+
+        def load():
+            image = IMAGE_STORE.get(image_id)
+            if image is None:
+                raise _UnknownImage(image_id)
+            return image
+
+        # Las imágenes del almacén son de solo lectura: los filtros escriben en otro buffer
+        return image_id, load, False
+    img_data = _image_bytes(request, params, field)
+    if not img_data:
+        return None
+    # Huella del fichero subido: identifica la imagen para las cachés por imagen (por
+    # ejemplo, la pirámide del zoom) sin tener que recorrer los píxeles
+    return bytes_digest(img_data), lambda: pil_to_array(Image.open(BytesIO(img_data))), True
+
+
+def _unknown_image(error):
+    return JsonResponse({'error': 'Unknown image id', 'image_id': str(error.args[0])}, status=404)
+
+
+def _encoded_response(entry, filter_type, binary, store, cache_status=None):
+    """
+    Respuesta de /process-image/ para un resultado codificado (recién calculado o de la
+    caché de resultados).
+    :param entry: Diccionario con los bytes ('data'), el tipo MIME, el formato, el perfil,
+                  las dimensiones, el tiempo de codificación y el id en el almacén
+    :param filter_type: Filtro aplicado
+    :param binary: Si es True, el propio fichero con los metadatos en cabeceras; si no,
+                   el JSON con el data URL
+    :param store: Si el cliente pidió guardar el resultado (se devuelve su id)
+    :param cache_status: 'HIT' o 'MISS' para la cabecera X-Cache (None si no se cachea)
+    """
+    if cache_status == 'HIT':
+        timing = 'cache;desc="hit"'
+    else:
+        timing = f'encode;dur={entry["seconds"] * 1000:.1f};desc="{entry["format"]}/{entry["profile"]}"'
+    
+    if binary:
+        # El fichero tal cual, sin base64 (un tercio menos de datos y sin la copia
+        # de la codificación); los metadatos van en las cabeceras
+        response = HttpResponse(entry['data'], content_type=entry['content_type'])
+        response['Content-Length'] = len(entry['data'])
+        response['X-Filter-Applied'] = filter_type
+        response['X-Image-Width'] = entry['width']
+        response['X-Image-Height'] = entry['height']
+        response['X-Image-Channels'] = entry['channels']
+        response['X-Image-Format'] = entry['format']
+        if store:
+            response['X-Image-Id'] = entry['image_id']
+    else:
+        # Convertir a base64 para devolver al cliente
+        img_str = base64.b64encode(entry['data']).decode('utf-8')
+        data = {
+            'processed_image': f'data:{entry["content_type"]};base64,{img_str}',
+            'filter_applied': filter_type,
+            'image_format': entry['format']
+        }
+        if store:
+            data['image_id'] = entry['image_id']
+        response = JsonResponse(data)
+    
+    response['Server-Timing'] = timing
+    if cache_status is not None:
+        response['X-Cache'] = cache_status
+    return response
+
+
+def _wants_binary(request, params):
+    """True si el cliente pide el fichero de imagen en lugar del JSON con base64."""
+    if params.get('response') in ('binary', 'json'):
+        return params['response'] == 'binary'
+    # Con Accept: */* (lo que envía fetch por defecto) se mantiene el JSON
+    return request.get_preferred_type(RESPONSE_TYPES) not in (None, 'application/json')
+
 
 def index(request):
     """Vista principal que muestra la página de carga de imágenes."""
@@ -18,129 +160,209 @@ def index(request):
 def process_image(request):
     """Vista para procesar la imagen y aplicar filtros."""
     if request.method == 'POST':
-        # Obtener imagen en base64 del formulario
-        image_data = request.POST.get('image_data')
+        # La imagen llega como id del almacén (`image_id`, tras subirla con /upload-image/),
+        # como fichero multipart, como cuerpo de la petición (con su Content-Type y los
+        # parámetros en la URL) o como data URL en base64
+        params = _request_params(request)
         
-        if not image_data:
-            return JsonResponse({'error': 'No image data provided'}, status=400)
+        # Codificación de la respuesta: perfil 'preview' (rápida; por defecto con
+        # mode=preview) o 'export' (sin pérdidas; por defecto), y formato opcional
+        profile = params.get('profile') or ('preview' if params.get('mode') == 'preview' else 'export')
+        output_format = params.get('format', '').lower().replace('jpg', 'jpeg') or None
+        if (profile not in PROFILES or (output_format is not None and output_format not in FORMATS)
+                or params.get('png_strategy', 'default') not in PNG_STRATEGIES):
+            return JsonResponse({'error': 'Unknown output profile, format or PNG strategy'}, status=400)
+        for field in ('quality', 'png_compress_level'):
+            if params.get(field) and not params[field].strip().isdigit():
+                return JsonResponse({'error': f'{field} must be an integer'}, status=400)
         
         try:
-            # Decodificar la imagen en base64
-            format, imgstr = image_data.split(';base64,')
-            ext = format.split('/')[-1]
+            source = _load_image(request, params)
+            if source is None:
+                return JsonResponse({'error': 'No image data provided'}, status=400)
+            source_key, load_image, owned = source
             
-            # Convertir a imagen PIL
-            img_data = base64.b64decode(imgstr)
-            img = Image.open(BytesIO(img_data))
+            # Procesar la imagen según los filtros seleccionados
+            filter_type = params.get('filter_type', '')
             
-            # Convertir a array numpy para procesamiento
-            img_array = np.array(img)
+            # Los filtros de pipeline admiten mode=preview: mientras se mueve un control se
+            # aplican sobre una versión reducida cacheada (acotada por el tamaño del visor)
+            # y solo el "Apply" final procesa la imagen a resolución completa
+            # Los campos del cliente se interpretan antes de tocar la imagen: un JSON mal
+            # formado, un filtro desconocido o un número que no lo es se responden con 400
+            # (json.JSONDecodeError es un ValueError)
+            try:
+                if filter_type == 'pipeline':
+                    # Lista ordenada de pasos en JSON, por ejemplo:
+                    # [{"type": "brightness", "brightness_factor": 1.2}, {"type": "negative"}]
+                    # Los pasos puntuales consecutivos se fusionan en una sola pasada
+                    steps = json.loads(params.get('filters', '[]'))
+                    pipeline = FilterPipeline(steps, source_key=source_key)
+                elif filter_type in FILTER_PARAMS:
+                    # Un filtro simple es un pipeline de un solo paso con los campos del formulario
+                    pipeline = FilterPipeline([(filter_type, params)], source_key=source_key)
+                else:
+                    pipeline = None
+                
+                if filter_type == 'merge':
+                    alpha = float(params.get('alpha', 0.5))
+                    offset = None
+                    if params.get('watermark_y') and params.get('watermark_x'):
+                        offset = (int(params['watermark_y']), int(params['watermark_x']))
+                elif filter_type == '4mosaic':
+                    # Mosaico de filas x columnas (2x2 por defecto, hasta 16x16)
+                    rows = min(16, max(1, int(params.get('mosaic_rows', 2))))
+                    cols = min(16, max(1, int(params.get('mosaic_cols', 2))))
+                    frame_color = params.get('frame_color', 'red')
+                    frame_color_rgb(frame_color)
+                    frame_size = int(params.get('frame_size', 9))
+                    tile_size = min(1024, max(8, int(params.get('tile_size', 300))))
+                    resample = params.get('resample', 'nearest')
+                    if resample not in RESAMPLE_MODES:
+                        raise ValueError(f"Unknown resample mode: {resample}")
+            except (ValueError, TypeError) as e:
+                return JsonResponse({'error': f'Invalid filter parameters: {e}'}, status=400)
             
-            # Procesar la imagen según los filtros seleccionados
-            filter_type = request.POST.get('filter_type', '')
+            preview = pipeline is not None and params.get('mode') == 'preview'
+            max_side = clamp_side(params.get('preview_max_side', PREVIEW_MAX_SIDE)) if preview else None
+            binary = _wants_binary(request, params)
+            store = params.get('store') in ('1', 'true')
+            
+            # Los pipelines se cachean ya codificados por (imagen, filtros, codificación):
+            # repetir unos ajustes se responde sin decodificar la imagen ni aplicar filtros
+            cache_key = None
+            if pipeline is not None:
+                cache_key = RESULT_CACHE.key(source_key, pipeline.signature(), {
+                    'preview': max_side,
+                    'profile': profile,
+                    'format': output_format,
+                    # La cabecera Accept solo elige el formato si la respuesta es la imagen
+                    'accept': request.headers.get('Accept') if binary and output_format is None else None,
+                    'quality': params.get('quality'),
+                    'png_compress_level': params.get('png_compress_level'),
+                    'png_strategy': params.get('png_strategy'),
+                })
+                cached = RESULT_CACHE.get(cache_key)
+                # Con store=1 el resultado también tiene que seguir en el almacén
+                if cached is not None and (not store or cached['image_id'] in IMAGE_STORE):
+                    return _encoded_response(cached, filter_type, binary, store, 'HIT')
+            
+            if not preview:
+                # Convertir a imagen PIL y a array numpy para procesamiento: los ficheros de
+                # 16 bits llegan a los filtros en uint16 y las paletas se expanden a RGB(A)
+                img_array = load_image()
             
             # Aplicar filtro según el tipo solicitado
-            if filter_type == 'brightness':
-                factor = float(request.POST.get('brightness_factor', 1.0))
-                result = ImageFilters.adjust_brightness(img_array, factor)
-            elif filter_type == 'contrast':
-                factor = float(request.POST.get('contrast_factor', 1.0))
-                result = ImageFilters.adjust_contrast(img_array, factor)
-            elif filter_type == 'rotate':
-                angle = float(request.POST.get('rotation_angle', 0))
-                result = ImageFilters.rotate_image(img_array, angle)
-            elif filter_type == 'highlight':
-                mode = request.POST.get('highlight_mode', 'light')
-                result = ImageFilters.highlight_zones(img_array, mode)
-            elif filter_type == 'rgb':
-                red = request.POST.get('red', 'true') == 'true'
-                green = request.POST.get('green', 'true') == 'true'
-                blue = request.POST.get('blue', 'true') == 'true'
-                result = ImageFilters.apply_rgb_filter(img_array, red, green, blue)
-            elif filter_type == 'cmy':
-                cyan = request.POST.get('cyan', 'true') == 'true'
-                magenta = request.POST.get('magenta', 'true') == 'true'
-                yellow = request.POST.get('yellow', 'true') == 'true'
-                result = ImageFilters.apply_cmy_filter(img_array, cyan, magenta, yellow)
-            elif filter_type == 'negative':
-                result = ImageFilters.negative_image(img_array)
-            elif filter_type == 'zoom':
-                x = int(request.POST.get('zoom_x', img_array.shape[1] // 2))
-                y = int(request.POST.get('zoom_y', img_array.shape[0] // 2))
-                scale = float(request.POST.get('zoom_scale', 2.0))
-                result = ImageFilters.zoom_image(img_array, x, y, scale)
-            elif filter_type == 'binary':
-                threshold = int(request.POST.get('threshold', 128))
-                result = ImageFilters.binarize_image(img_array, threshold)
+            if preview:
+                # Con la versión reducida en caché ni siquiera se decodifica el fichero
+                proxy, scale = get_proxy(source_key, max_side, load_image)
+                pipeline = pipeline.scaled(scale, source_key=f'{source_key}:preview:{max_side}')
+                # La versión reducida es de solo lectura: el pipeline escribe en un buffer nuevo
+                result = pipeline.lazy(proxy).compute()
+            elif pipeline is not None:
+                # El grafo diferido adelanta el recorte del zoom: los filtros anteriores solo
+                # procesan la región que se va a devolver
+                result = pipeline.lazy(img_array).compute(inplace=owned)
             elif filter_type == 'merge':
                 # Si hay una segunda imagen para fusionar
-                second_image_data = request.POST.get('second_image_data')
-                if second_image_data:
-                    _, imgstr2 = second_image_data.split(';base64,')
-                    img_data2 = base64.b64decode(imgstr2)
-                    img2 = Image.open(BytesIO(img_data2))
-                    img_array2 = np.array(img2)
+                second = _load_image(request, params, 'second_image_data')
+                if second is not None:
+                    overlay_key, load_second, _ = second
+                    img_array2 = load_second()
                     
                     # Determinar el tipo de fusión
-                    merge_type = request.POST.get('merge_type', 'alpha')
+                    merge_type = params.get('merge_type', 'alpha')
                     
                     if merge_type == 'watermark':
-                        # Usar el método de marca de agua
-                        result = ImageFilters.watermark_merge_images(img_array, img_array2)
+                        # Usar el método de marca de agua. Si la imagen actual ya tiene la
+                        # forma del resultado, solo se modifican los píxeles del logotipo
+                        canvas = (max(img_array.shape[0], img_array2.shape[0]),
+                                  max(img_array.shape[1], img_array2.shape[1]), 3)
+                        result = ImageFilters.watermark_merge_images(
+                            img_array, img_array2, offset=offset,
+                            inplace=owned and img_array.dtype == img_array2.dtype and img_array.shape == canvas
+                        )
                     else:
                         # Usar el método de fusión con transparencia
-                        alpha = float(request.POST.get('alpha', 0.5))
-                        result = ImageFilters.merge_images(img_array, img_array2, alpha)
+                        # La imagen decodificada es nuestra: fusionamos sobre ella sin otra copia
+                        # La segunda imagen redimensionada se cachea por la huella de su
+                        # fichero, así que mover el deslizador de alpha solo repite la mezcla
+                        result = ImageFilters.merge_images(
+                            img_array, img_array2, alpha,
+                            inplace=owned,
+                            overlay_key=overlay_key
+                        )
                 else:
                     result = img_array
             elif filter_type == '4mosaic':
-                # Crear un mosaico con 4 imágenes
+                # Crear el mosaico con las filas y columnas ya validadas
                 images = [img_array]  # La imagen actual es la primera
                 
-                # Obtener las otras 3 imágenes
-                for i in range(1, 4):
-                    image_data_key = f'image_data_{i}'
-                    image_data = request.POST.get(image_data_key)
-                    
-                    if image_data:
-                        try:
-                            _, imgstr = image_data.split(';base64,')
-                            img_data = base64.b64decode(imgstr)
-                            img = Image.open(BytesIO(img_data))
-                            img_array_i = np.array(img)
+                # Obtener el resto de imágenes
+                for i in range(1, rows * cols):
+                    try:
+                        tile = _load_image(request, params, f'image_data_{i}')
+                        if tile is not None:
+                            img_array_i = tile[1]()
                             images.append(img_array_i)
-                        except Exception as e:
-                            print(f"Error al procesar imagen {i}: {e}")
-                            # Si hay un error, usar la imagen actual como reemplazo
+                        else:
+                            # Si no se proporciona una imagen, usar la imagen actual
                             images.append(img_array)
-                    else:
-                        # Si no se proporciona una imagen, usar la imagen actual
+                    except _UnknownImage:
+                        # Un id que ya no está en el almacén se responde con 404 para que
+                        # el cliente vuelva a subir la imagen
+                        raise
+                    except Exception as e:
+                        print(f"Error al procesar imagen {i}: {e}")
+                        # Si hay un error, usar la imagen actual como reemplazo
                         images.append(img_array)
                 
-                # Obtener el color del marco y el tamaño
-                frame_color = request.POST.get('frame_color', 'red')
-                frame_size = int(request.POST.get('frame_size', 9))
-                
                 # Crear el mosaico
-                result = ImageFilters.create_mosaic(images, frame_color, frame_size)
+                result = ImageFilters.create_mosaic(
+                    images, frame_color, frame_size,
+                    rows=rows, cols=cols, tile_size=tile_size, mode=resample
+                )
             else:
                 # Si no se especifica filtro, devolver la imagen original
                 result = img_array
             
-            # Convertir el resultado a imagen PIL
-            result_img = Image.fromarray(result)
+            # Con store=1 el resultado queda en el almacén: el cliente encadena la siguiente
+            # operación enviando solo su id, sin volver a subir la imagen
+            result_id = IMAGE_STORE.put(result) if store else None
             
-            # Convertir a base64 para devolver al cliente
-            buffered = BytesIO()
-            result_img.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            # Codificar el resultado (PNG de 16 bits si es escala de grises uint16). Sin
+            # formato explícito, la cabecera Accept elige entre los que admite el perfil
+            # cuando la respuesta es la propia imagen; en el JSON manda el perfil
+            if output_format is None:
+                alpha = result.ndim == 3 and result.shape[2] in (2, 4)
+                accept = request.headers.get('Accept') if binary else None
+                output_format = negotiate(accept, profile, alpha)
+            encoded, content_type, seconds = encode(
+                result, output_format, profile,
+                compress_level=params.get('png_compress_level'),
+                strategy=params.get('png_strategy'),
+                quality=params.get('quality'),
+            )
+            entry = {
+                'data': encoded,
+                'content_type': content_type,
+                'format': output_format,
+                'profile': profile,
+                'width': result.shape[1],
+                'height': result.shape[0],
+                'channels': result.shape[2] if result.ndim == 3 else 1,
+                'seconds': seconds,
+                'image_id': result_id,
+            }
+            if cache_key is not None:
+                RESULT_CACHE.put(cache_key, entry)
             
             # Devolver la imagen procesada y datos adicionales
-            return JsonResponse({
-                'processed_image': f'data:image/png;base64,{img_str}',
-                'filter_applied': filter_type
-            })
+            return _encoded_response(entry, filter_type, binary, store,
+                                     'MISS' if cache_key is not None else None)
             
+        except _UnknownImage as e:
+            return _unknown_image(e)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -150,63 +372,131 @@ def process_image(request):
 def generate_histogram(request):
     """Vista para generar el histograma de la imagen."""
     if request.method == 'POST':
-        image_data = request.POST.get('image_data')
-        
-        if not image_data:
-            return JsonResponse({'error': 'No image data provided'}, status=400)
+        params = _request_params(request)
         
         try:
-            # Decodificar la imagen en base64
-            format, imgstr = image_data.split(';base64,')
-            img_data = base64.b64decode(imgstr)
-            img = Image.open(BytesIO(img_data))
+            source = _load_image(request, params)
+            if source is None:
+                return JsonResponse({'error': 'No image data provided'}, status=400)
+            source_key, load_image, _ = source
             
-            # Convertir a array numpy
-            img_array = np.array(img)
+            # Convertir a array numpy (los histogramas cuantizan 16 bits a 256 niveles)
+            img_array = load_image()
             
-            # Generar histograma
-            fig = ImageFilters.generate_histogram(img_array)
+            # Conteos de intensidad y de cada canal en una sola pasada sobre los píxeles,
+            # cacheados por la huella del fichero: los filtros de mejora automática de la
+            # misma imagen los reutilizan
+            histograms = ImageFilters.compute_histograms(img_array, key=source_key)
             
-            # Convertir figura a imagen
+            # El gráfico se dibuja directamente en un buffer uint8, sin matplotlib
+            chart = ImageFilters.generate_histogram(img_array, histograms=histograms)
             buf = BytesIO()
-            fig.savefig(buf, format='png', bbox_inches='tight')
-            plt.close(fig)
-            buf.seek(0)
+            Image.fromarray(chart).save(buf, format='PNG')
             
             # Codificar en base64
             img_str = base64.b64encode(buf.getvalue()).decode('utf-8')
             
-            # Calcular datos del histograma para la visualización
+            # Datos del histograma para la visualización (listas vacías si no hay canal)
             hist_data = {
-                'red': [],
-                'green': [],
-                'blue': [],
-                'luminance': []
+                name: counts.tolist() if counts is not None else []
+                for name, counts in histograms.items()
             }
             
-            # Calcular histogramas
-            if len(img_array.shape) == 3 and img_array.shape[2] == 3:
-                # Calcular luminancia
-                luminance = np.dot(img_array[..., :3], [0.2989, 0.5870, 0.1140])
-                hist_data['luminance'] = np.histogram(luminance, bins=256, range=(0, 256))[0].tolist()
-                
-                # Calcular histograma para cada canal
-                hist_data['red'] = np.histogram(img_array[..., 0], bins=256, range=(0, 256))[0].tolist()
-                hist_data['green'] = np.histogram(img_array[..., 1], bins=256, range=(0, 256))[0].tolist()
-                hist_data['blue'] = np.histogram(img_array[..., 2], bins=256, range=(0, 256))[0].tolist()
-            else:
-                hist_data['luminance'] = np.histogram(img_array, bins=256, range=(0, 256))[0].tolist()
-            
             return JsonResponse({
                 'histogram_image': f'data:image/png;base64,{img_str}',
                 'histogram_data': hist_data
             })
             
+        except _UnknownImage as e:
+            return _unknown_image(e)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Invalid request method'}, status=400)
 
+@csrf_exempt
+def region_stats(request):
+    """Vista que devuelve la media y la desviación típica de regiones rectangulares."""
+    if request.method == 'POST':
+        params = _request_params(request)
+        
+        try:
+            # Lista de rectángulos en JSON: [{"x": 0, "y": 0, "width": 10, "height": 10}, ...]
+            regions = json.loads(params.get('regions', '[]'))
+            if isinstance(regions, dict):
+                regions = [regions]
+            if len(regions) > 10000:
+                return JsonResponse({'error': 'Too many regions'}, status=400)
+            rects = [(int(r['x']), int(r['y']), int(r['width']), int(r['height'])) for r in regions]
+        except (ValueError, KeyError, TypeError) as e:
+            return JsonResponse({'error': f'Invalid regions: {e}'}, status=400)
+        
+        try:
+            source = _load_image(request, params)
+            if source is None:
+                return JsonResponse({'error': 'No image data provided'}, status=400)
+            source_key, load_image, _ = source
+            img_array = load_image()
+            
+            # La imagen integral se cachea por la huella del fichero: las siguientes
+            # consultas sobre la misma imagen solo leen cuatro esquinas por región
+            stats = ImageFilters.region_stats(img_array, rects, key=source_key)
+            
+            return JsonResponse({
+                'width': img_array.shape[1],
+                'height': img_array.shape[0],
+                'regions': [dict(region, **item) for region, item in zip(regions, stats)]
+            })
+            
+        except _UnknownImage as e:
+            return _unknown_image(e)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Invalid request method'}, status=400)
+
+@csrf_exempt
+def upload_image(request):
+    """Vista que guarda una imagen en el almacén y devuelve su id."""
+    if request.method == 'POST':
+        params = _request_params(request)
+        
+        try:
+            img_data = _image_bytes(request, params)
+            if not img_data:
+                return JsonResponse({'error': 'No image data provided'}, status=400)
+            
+            # El id es la huella del fichero: si la imagen ya está guardada (en memoria o en
+            # disco) no se vuelve a decodificar
+            image_id = bytes_digest(img_data)
+            img_array = IMAGE_STORE.get(image_id)
+            if img_array is None:
+                img_array = pil_to_array(Image.open(BytesIO(img_data)))
+                IMAGE_STORE.put(img_array, image_id)
+                if image_id not in IMAGE_STORE:
+                    return JsonResponse({'error': 'Image too large for the image store'}, status=413)
+            
+            return JsonResponse({
+                'image_id': image_id,
+                'width': img_array.shape[1],
+                'height': img_array.shape[0],
+                'channels': img_array.shape[2] if img_array.ndim == 3 else 1,
+                'dtype': str(img_array.dtype)
+            })
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Invalid request method'}, status=400)
+
+def server_stats(request):
+    """Vista con los contadores de las cachés y los tiempos de codificación del proceso."""
+    return JsonResponse({
+        'result_cache': RESULT_CACHE.stats(),
+        'image_store': IMAGE_STORE.stats(),
+        'encoders': encoder_stats()
+    })
+
 def editor(request):
     """Vista para la página del editor de imágenes."""
     return render(request, 'viewer/editor.html')
\ No newline at end of file